@@ -4,6 +4,8 @@ CLI command groups.
 
 from .sandbox import sandbox
 from .files import files
-from .exec import exec
+from .exec import exec, exec_batch, exec_many
+from .process import process
+from .git import git
 
-__all__ = ["sandbox", "files", "exec"]
+__all__ = ["sandbox", "files", "exec", "exec_batch", "exec_many", "process", "git"]
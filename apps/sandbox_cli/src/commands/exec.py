@@ -2,11 +2,45 @@
 Advanced command execution with full E2B SDK features.
 """
 
+import json
+import signal
+import sys
+from contextlib import contextmanager
+
 import click
-from rich.console import Console
+from rich.table import Table
 from ..modules import commands as cmd_module
+from .. import output
+from ..output import console
+
+
+@contextmanager
+def _kill_remote_on_signal(sandbox_id=None):
+    """
+    Kill the remote command(s) when this process is interrupted or terminated
+    (Ctrl-C, or the MCP server cancelling a call), instead of leaving them
+    running in the sandbox. Yields the callback that records started PIDs
+    (with their sandbox ID when running on several sandboxes).
+    """
+    started = []
 
-console = Console()
+    def record(pid, pid_sandbox_id=sandbox_id):
+        started.append((pid_sandbox_id, pid))
+
+    def handler(signum, frame):
+        for pid_sandbox_id, pid in started:
+            try:
+                cmd_module.kill_process(pid_sandbox_id, pid)
+            except Exception:
+                pass
+        sys.exit(128 + signum)
+
+    previous = {sig: signal.signal(sig, handler) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        yield record
+    finally:
+        for sig, old in previous.items():
+            signal.signal(sig, old)
 
 
 @click.command()
@@ -20,7 +54,13 @@ console = Console()
 @click.option("--timeout", default=60, type=int, help="Command timeout in seconds (0 for unlimited)")
 @click.option("--background", is_flag=True, help="Run in background")
 @click.option("--stdin", is_flag=True, help="Enable stdin for the command")
-def exec(sandbox_id, command, cwd, user, root, shell, env, timeout, background, stdin):
+@click.option(
+    "--max-output",
+    default=0,
+    type=int,
+    help="Keep the head and tail of longer output, the rest goes to a file in the sandbox (0 for full output)",
+)
+def exec(sandbox_id, command, cwd, user, root, shell, env, timeout, background, stdin, max_output):
     r"""
     Execute a command with full control over execution environment.
 
@@ -32,6 +72,7 @@ def exec(sandbox_id, command, cwd, user, root, shell, env, timeout, background,
     - Background execution (--background)
     - Stdin support (--stdin)
     - Timeout control (--timeout)
+    - Output compaction for huge logs (--max-output)
 
     Examples:
         # Basic execution
@@ -52,6 +93,9 @@ def exec(sandbox_id, command, cwd, user, root, shell, env, timeout, background,
         # Background with no timeout
         sbx exec $SANDBOX_ID "long-running-task" --background --timeout 0
 
+        # Head and tail of a verbose build, full log spilled to a sandbox file
+        sbx exec $SANDBOX_ID "npm run build" --cwd /home/user/app --max-output 20000
+
         # Complex privileged operation
         sbx exec $SANDBOX_ID "apt-get update && apt-get install -y nginx" --root --timeout 300
     """
@@ -92,19 +136,37 @@ def exec(sandbox_id, command, cwd, user, root, shell, env, timeout, background,
                 envs=envs if envs else None,
                 timeout=timeout if timeout > 0 else None,
             )
+            if output.is_machine():
+                output.emit(result)
+                return
             console.print(f"\n[green]✓ Background command started[/green]")
             console.print(f"[cyan]PID: {result['pid']}[/cyan]")
             console.print(f"[dim]Process is running in background[/dim]")
+            console.print(
+                f"[dim]Follow it with: sbx process output {sandbox_id} {result['pid']}[/dim]"
+            )
             return  # Exit early for background commands
         else:
-            result = cmd_module.run_command(
-                sandbox_id,
-                actual_command,
-                cwd=cwd,
-                envs=envs if envs else None,
-                timeout=timeout if timeout > 0 else None,
-            )
+            with _kill_remote_on_signal(sandbox_id) as on_start:
+                result = cmd_module.run_command(
+                    sandbox_id,
+                    actual_command,
+                    cwd=cwd,
+                    envs=envs if envs else None,
+                    timeout=timeout if timeout > 0 else None,
+                    on_start=on_start,
+                    max_output=max_output if max_output > 0 else None,
+                )
+            if output.is_machine():
+                output.emit(result)
+                return
             console.print(f"\n[cyan]Exit code: {result['exit_code']}[/cyan]")
+            for stream in ("stdout", "stderr"):
+                if result.get(f"{stream}_file"):
+                    console.print(
+                        f"[dim]Full {stream} ({result[f'{stream}_bytes']:,} bytes, "
+                        f"{result[f'{stream}_lines']:,} lines): {result[f'{stream}_file']}[/dim]"
+                    )
 
         if result["stdout"]:
             console.print("\n[green]STDOUT:[/green]")
@@ -114,6 +176,196 @@ def exec(sandbox_id, command, cwd, user, root, shell, env, timeout, background,
             console.print("\n[red]STDERR:[/red]")
             console.print(result["stderr"])
 
+        # With --max-output a failed command is returned, not raised
+        if result["exit_code"]:
+            sys.exit(result["exit_code"])
+
+    except Exception as e:
+        output.fail(e)
+
+
+@click.command(name="exec-batch")
+@click.argument("sandbox_id")
+@click.argument("steps")
+@click.option(
+    "--continue-on-failure",
+    is_flag=True,
+    help="Keep running the remaining steps after a step fails",
+)
+@click.option(
+    "--max-output",
+    default=2000,
+    type=int,
+    help="Maximum characters of stdout/stderr kept per step",
+)
+def exec_batch(sandbox_id, steps, continue_on_failure, max_output):
+    r"""
+    Execute an ordered list of commands in one call.
+
+    STEPS is a JSON array (or "-" to read it from stdin). Each step is an
+    object with "cmd" and optional "cwd", "envs" and "timeout" (seconds,
+    0 for unlimited). All steps share one sandbox connection.
+
+    Examples:
+        # Stop at the first failure (default)
+        sbx exec-batch $SANDBOX_ID '[{"cmd": "npm ci", "cwd": "/home/user/app", "timeout": 300},
+                                     {"cmd": "npm test", "cwd": "/home/user/app"}]'
+
+        # Run every step regardless of failures, reading steps from a file
+        sbx exec-batch $SANDBOX_ID - --continue-on-failure < steps.json
+    """
+    try:
+        step_list = json.loads(sys.stdin.read() if steps == "-" else steps)
+
+        console.print(f"[yellow]Executing {len(step_list)} steps...[/yellow]")
+
+        with _kill_remote_on_signal(sandbox_id) as on_start:
+            result = cmd_module.run_batch(
+                sandbox_id,
+                step_list,
+                stop_on_failure=not continue_on_failure,
+                max_output=max_output,
+                on_start=on_start,
+            )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        table = Table(title=f"Batch Results ({len(result['steps'])}/{len(step_list)} run)")
+        table.add_column("#", style="dim", justify="right")
+        table.add_column("Command", style="cyan")
+        table.add_column("Exit", justify="right")
+        table.add_column("Duration", style="yellow", justify="right")
+
+        for step in result["steps"]:
+            exit_style = "green" if step["exit_code"] == 0 else "red"
+            table.add_row(
+                str(step["index"]),
+                step["cmd"],
+                f"[{exit_style}]{step['exit_code']}[/{exit_style}]",
+                f"{step['duration']:.2f}s",
+            )
+
+        console.print(table)
+
+        for step in result["steps"]:
+            if step["exit_code"] != 0:
+                console.print(f"\n[red]Step {step['index']} failed: {step['cmd']}[/red]")
+                if step.get("error"):
+                    console.print(step["error"])
+                if step["stdout"]:
+                    console.print(step["stdout"])
+                if step["stderr"]:
+                    console.print(step["stderr"])
+
+        if result["skipped"]:
+            console.print(f"[dim]Skipped {result['skipped']} remaining steps[/dim]")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@click.command(name="exec-many")
+@click.argument("command")
+@click.option("--sandbox", "-s", "sandbox_ids", multiple=True, help="Sandbox ID (repeatable)")
+@click.option("--metadata", "-m", multiple=True, help="Select running sandboxes by metadata (KEY=VALUE)")
+@click.option("--cwd", default=None, help="Working directory")
+@click.option("--env", "-e", multiple=True, help="Environment variables (KEY=VALUE)")
+@click.option("--timeout", default=60, type=int, help="Command timeout per sandbox in seconds (0 for unlimited)")
+@click.option(
+    "--parallel",
+    "-p",
+    default=cmd_module.DEFAULT_FANOUT,
+    type=int,
+    help="Sandboxes running the command at once",
+)
+@click.option(
+    "--max-output",
+    default=2000,
+    type=int,
+    help="Maximum characters of stdout/stderr kept per sandbox",
+)
+@click.option("--limit", default=100, type=int, help="Maximum number of sandboxes selected by metadata")
+def exec_many(command, sandbox_ids, metadata, cwd, env, timeout, parallel, max_output, limit):
+    r"""
+    Execute one command on many sandboxes concurrently.
+
+    Give the sandboxes with --sandbox, or select running sandboxes whose
+    metadata contains every --metadata pair. Each sandbox gets its own
+    timeout; one failing does not stop the others.
+
+    Examples:
+        # Same command on two sandboxes
+        sbx exec-many "git status --short" -s $SANDBOX_A -s $SANDBOX_B --cwd /home/user/repo
+
+        # Health check on every sandbox of an experiment, 16 at a time
+        sbx exec-many "curl -sf localhost:3000/health" -m experiment=forks --parallel 16
+    """
+    try:
+        envs = {}
+        for e in env:
+            if "=" in e:
+                key, value = e.split("=", 1)
+                envs[key] = value
+
+        meta = {}
+        for m in metadata:
+            if "=" in m:
+                key, value = m.split("=", 1)
+                meta[key] = value
+
+        target = f"{len(sandbox_ids)} sandboxes" if sandbox_ids else f"sandboxes matching {meta}"
+        console.print(f"[yellow]Executing on {target}: {command}[/yellow]")
+
+        with _kill_remote_on_signal() as on_start:
+            result = cmd_module.run_on_many(
+                command,
+                sandbox_ids=list(sandbox_ids) or None,
+                metadata=meta or None,
+                cwd=cwd,
+                envs=envs if envs else None,
+                timeout=timeout if timeout > 0 else None,
+                max_parallel=parallel,
+                max_output=max_output,
+                limit=limit,
+                on_start=on_start,
+            )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        table = Table(title=f"Results ({result['succeeded']}/{result['sandboxes']} succeeded)")
+        table.add_column("Sandbox ID", style="cyan")
+        table.add_column("Exit", justify="right")
+        table.add_column("Duration", style="yellow", justify="right")
+        table.add_column("Output")
+
+        for item in result["results"]:
+            exit_style = "green" if item["exit_code"] == 0 else "red"
+            text = item.get("error") or item["stderr"] or item["stdout"]
+            lines = text.strip().splitlines()
+            table.add_row(
+                item["sandbox_id"],
+                f"[{exit_style}]{item['exit_code']}[/{exit_style}]",
+                f"{item['duration']:.2f}s",
+                lines[-1] if lines else "",
+            )
+
+        console.print(table)
+
+        for item in result["results"]:
+            if item["exit_code"] != 0:
+                console.print(f"\n[red]{item['sandbox_id']} failed[/red]")
+                if item.get("error"):
+                    console.print(item["error"])
+                if item["stdout"]:
+                    console.print(item["stdout"])
+                if item["stderr"]:
+                    console.print(item["stderr"])
+
+        console.print(f"[dim]Finished in {result['duration']:.2f}s[/dim]")
+
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
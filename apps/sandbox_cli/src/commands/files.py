@@ -2,12 +2,15 @@
 File operations commands.
 """
 
+import json
+import sys
+
 import click
-from rich.console import Console
+from rich.markup import escape
 from rich.table import Table
 from ..modules import files as files_module
-
-console = Console()
+from .. import output
+from ..output import console
 
 
 @click.group()
@@ -20,12 +23,50 @@ def files():
 @click.argument("sandbox_id")
 @click.argument("path", default="/")
 @click.option("--depth", "-d", default=1, help="Directory depth to traverse")
-def ls(sandbox_id, path, depth):
-    """List files in a directory."""
+@click.option("--compact", is_flag=True, help="Columnar listing with interned directories (JSON)")
+@click.option(
+    "--max-entries",
+    type=int,
+    default=files_module.DEFAULT_LIST_BUDGET,
+    help="Entries per page with --compact (0 for no limit)",
+)
+@click.option("--cursor", default=None, help="next_cursor of the previous --compact page")
+@click.option("--permissions", is_flag=True, help="Include permissions with --compact")
+def ls(sandbox_id, path, depth, compact, max_entries, cursor, permissions):
+    """
+    List files in a directory.
+
+    With --compact, entries come as columns (dirs are listed once and
+    referenced by index, permissions only with --permissions), at most
+    --max-entries per page; pass the reported next_cursor as --cursor to
+    get the next page.
+
+    Examples:
+        sbx files ls $SANDBOX_ID /home/user
+        sbx --json files ls $SANDBOX_ID /home/user/repo --depth 10 --compact
+    """
     try:
         console.print(f"[yellow]Listing files in {path}...[/yellow]")
 
-        file_list = files_module.list_files(sandbox_id, path, depth)
+        if compact:
+            listing = files_module.list_files_compact(
+                sandbox_id,
+                path,
+                depth,
+                max_entries=max_entries,
+                cursor=cursor,
+                permissions=permissions,
+            )
+            if output.is_machine():
+                output.emit(listing)
+                return
+            file_list = files_module.expand_compact(listing)
+        elif output.is_machine():
+            rows = files_module.iter_files(sandbox_id, path, depth)
+            output.emit_rows(rows, "files", meta={"path": path})
+            return
+        else:
+            file_list = files_module.list_files(sandbox_id, path, depth)
 
         table = Table(title=f"Files in {path}")
         table.add_column("Type", style="cyan")
@@ -37,34 +78,126 @@ def ls(sandbox_id, path, depth):
             type_icon = "📁" if f["type"] == "dir" else "📄"
             table.add_row(
                 type_icon,
-                f["name"],
+                f["path"] if compact else f["name"],
                 str(f["size"]),
-                f["permissions"],
+                f.get("permissions", ""),
             )
 
         console.print(table)
 
+        if compact and listing["next_cursor"]:
+            console.print(
+                f"[dim]{listing['count']} of {listing['total']} entries; "
+                f"next page: --cursor {escape(listing['next_cursor'])}[/dim]"
+            )
+
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
 @click.argument("sandbox_id")
 @click.argument("path")
-def read(sandbox_id, path):
-    """Read a file."""
+@click.option("--offset", type=int, default=None, help="Byte offset to start reading at")
+@click.option("--length", type=int, default=None, help="Number of bytes to read")
+@click.option("--start-line", type=int, default=None, help="First line to read (1-based)")
+@click.option("--end-line", type=int, default=None, help="Last line to read (inclusive)")
+@click.option(
+    "--max-bytes",
+    type=int,
+    default=None,
+    help=f"Content budget per call (default {files_module.DEFAULT_READ_BUDGET} when ranged)",
+)
+def read(sandbox_id, path, offset, length, start_line, end_line, max_bytes):
+    """
+    Read a file.
+
+    With any of --offset/--length/--start-line/--end-line/--max-bytes, only
+    that window is read (cut sandbox-side) and a continuation cursor is
+    reported when more remains.
+    """
     try:
         console.print(f"[yellow]Reading {path}...[/yellow]")
 
-        content = files_module.read_file(sandbox_id, path)
+        ranged = any(
+            value is not None for value in (offset, length, start_line, end_line, max_bytes)
+        )
+
+        if ranged:
+            result = files_module.read_file_range(
+                sandbox_id,
+                path,
+                offset=offset,
+                length=length,
+                start_line=start_line,
+                end_line=end_line,
+                max_bytes=max_bytes or files_module.DEFAULT_READ_BUDGET,
+            )
+        else:
+            result = {"path": path, "content": files_module.read_file(sandbox_id, path)}
+
+        if output.is_machine():
+            output.emit(result)
+            return
 
         console.print(f"\n[cyan]Content of {path}:[/cyan]")
-        console.print(content)
+        console.print(result["content"])
+
+        if result.get("next_offset") is not None:
+            console.print(f"\n[dim]More content: --offset {result['next_offset']}[/dim]")
+        if result.get("next_start_line") is not None:
+            console.print(f"\n[dim]More lines: --start-line {result['next_start_line']}[/dim]")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@files.command()
+@click.argument("sandbox_id")
+@click.argument("pattern")
+@click.option("--path", "-p", default="/home/user", help="File or directory to search")
+@click.option("--glob", "-g", multiple=True, help="File name glob to include, or exclude with a leading ! (repeatable)")
+@click.option("--ignore-case", "-i", is_flag=True, help="Case-insensitive search")
+@click.option("--fixed-strings", "-F", is_flag=True, help="Treat PATTERN as literal text")
+@click.option("--context", "-C", default=0, help="Lines of context around each match")
+@click.option("--max-matches", default=100, help="Stop after this many matching lines")
+@click.option("--no-ignore", is_flag=True, help="Also search .git, node_modules, etc.")
+def search(sandbox_id, pattern, path, glob, ignore_case, fixed_strings, context, max_matches, no_ignore):
+    """
+    Search file contents with a regex (ripgrep, or grep as fallback).
+
+    Put a PATTERN starting with "-" after "--":
+        sbx files search --path /home/user/repo -- $SANDBOX_ID "->"
+    """
+    try:
+        console.print(f"[yellow]Searching {path} for {escape(pattern)}...[/yellow]")
+
+        result = files_module.search_files(
+            sandbox_id,
+            pattern,
+            path=path,
+            globs=list(glob),
+            ignore_case=ignore_case,
+            fixed_strings=fixed_strings,
+            context=context,
+            max_matches=max_matches,
+            no_ignore=no_ignore,
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        if result["results"]:
+            console.print(result["results"], markup=False, highlight=False)
+
+        summary = f"{result['matches']} matches ({result['engine']})"
+        if result["truncated"]:
+            summary += f", truncated at --max-matches {max_matches}"
+        console.print(f"\n[dim]{summary}[/dim]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -78,11 +211,14 @@ def write(sandbox_id, path, content):
 
         info = files_module.write_file(sandbox_id, path, content)
 
+        if output.is_machine():
+            output.emit(info)
+            return
+
         console.print(f"[green]✓ File written: {info['path']}[/green]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -93,14 +229,17 @@ def exists(sandbox_id, path):
     try:
         exists = files_module.file_exists(sandbox_id, path)
 
+        if output.is_machine():
+            output.emit({"path": path, "exists": exists})
+            return
+
         if exists:
             console.print(f"[green]✓ {path} exists[/green]")
         else:
             console.print(f"[red]✗ {path} does not exist[/red]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -113,6 +252,10 @@ def info(sandbox_id, path):
 
         info = files_module.get_file_info(sandbox_id, path)
 
+        if output.is_machine():
+            output.emit(info)
+            return
+
         table = Table(title=f"File Info: {path}")
         table.add_column("Field", style="cyan")
         table.add_column("Value", style="green")
@@ -126,8 +269,7 @@ def info(sandbox_id, path):
         console.print(table)
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -140,11 +282,14 @@ def rm(sandbox_id, path):
 
         files_module.remove_file(sandbox_id, path)
 
+        if output.is_machine():
+            output.emit({"path": path, "removed": True})
+            return
+
         console.print(f"[green]✓ Removed: {path}[/green]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -157,14 +302,17 @@ def mkdir(sandbox_id, path):
 
         created = files_module.make_directory(sandbox_id, path)
 
+        if output.is_machine():
+            output.emit({"path": path, "created": created})
+            return
+
         if created:
             console.print(f"[green]✓ Directory created: {path}[/green]")
         else:
             console.print(f"[yellow]! Directory already exists: {path}[/yellow]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -178,11 +326,14 @@ def mv(sandbox_id, old_path, new_path):
 
         info = files_module.rename_file(sandbox_id, old_path, new_path)
 
+        if output.is_machine():
+            output.emit(info)
+            return
+
         console.print(f"[green]✓ Renamed to: {info['path']}[/green]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -197,8 +348,7 @@ def upload(sandbox_id, local_path, remote_path):
         local_file = Path(local_path)
 
         if not local_file.exists():
-            console.print(f"[red]✗ Local file not found: {local_path}[/red]")
-            raise click.Abort()
+            raise FileNotFoundError(f"Local file not found: {local_path}")
 
         console.print(f"[yellow]Uploading {local_path} to {remote_path}...[/yellow]")
 
@@ -209,12 +359,15 @@ def upload(sandbox_id, local_path, remote_path):
         # Upload to sandbox
         info = files_module.write_file_bytes(sandbox_id, remote_path, data)
 
+        if output.is_machine():
+            output.emit({"path": info["path"], "size": file_size})
+            return
+
         console.print(f"[green]✓ File uploaded: {info['path']}[/green]")
         console.print(f"[dim]Size: {file_size} bytes[/dim]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @files.command()
@@ -237,9 +390,297 @@ def download(sandbox_id, remote_path, local_path):
         local_file.parent.mkdir(parents=True, exist_ok=True)
         local_file.write_bytes(data)
 
+        if output.is_machine():
+            output.emit({"path": local_path, "size": file_size})
+            return
+
         console.print(f"[green]✓ File downloaded: {local_path}[/green]")
         console.print(f"[dim]Size: {file_size} bytes[/dim]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
+
+
+def _dir_filters(include, exclude, no_default_excludes):
+    """Turn --include/--exclude options into upload_dir/download_dir arguments."""
+    excludes = list(exclude)
+    if not no_default_excludes:
+        excludes = list(files_module.DEFAULT_EXCLUDES) + excludes
+    return list(include) or None, excludes
+
+
+def _print_transfer(result, verb):
+    console.print(
+        f"[green]✓ {verb} {result['files']} files "
+        f"({result['bytes']} bytes, {result['archive_bytes']} compressed)[/green]"
+    )
+    throughput = result["throughput_mb_s"]
+    console.print(
+        f"[dim]Duration: {result['duration']}s"
+        + (f", {throughput} MB/s" if throughput is not None else "")
+        + "[/dim]"
+    )
+    for entry in result.get("skipped", []):
+        console.print(f"[yellow]Skipped {entry['path']}: {entry['reason']}[/yellow]")
+
+
+@files.command()
+@click.argument("sandbox_id")
+@click.argument("patch_file", required=False)
+@click.option("--edits", default=None, help='JSON array of {"path", "old", "new", "all"} replacements, or "-" for stdin')
+@click.option("--cwd", default="/home/user", help="Directory relative paths are resolved against")
+@click.option("--dry-run", is_flag=True, help="Only check whether everything would apply")
+def patch(sandbox_id, patch_file, edits, cwd, dry_run):
+    """
+    Apply a unified diff or exact replacements sandbox-side.
+
+    PATCH_FILE is a local unified diff ("-" reads it from stdin). Use --edits
+    instead for exact string replacements. Nothing is written unless
+    everything applies.
+    """
+    try:
+        if (patch_file is None) == (edits is None):
+            raise click.UsageError("Pass either PATCH_FILE or --edits")
+
+        if edits is not None:
+            edit_list = json.loads(sys.stdin.read() if edits == "-" else edits)
+            console.print(f"[yellow]Applying {len(edit_list)} edits...[/yellow]")
+            result = files_module.apply_patch(
+                sandbox_id, edits=edit_list, cwd=cwd, dry_run=dry_run
+            )
+        else:
+            diff = sys.stdin.read() if patch_file == "-" else open(patch_file).read()
+            console.print(f"[yellow]Applying {patch_file}...[/yellow]")
+            result = files_module.apply_patch(
+                sandbox_id, patch=diff, cwd=cwd, dry_run=dry_run
+            )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        for f in result.get("files", []):
+            colour = "green" if f["status"] in ("applied", "ok") else "red"
+            console.print(f"[{colour}]{f['path']}: {f['status']}[/{colour}]")
+            for number, hunk in enumerate(f["hunks"], start=1):
+                console.print(f"[dim]  hunk #{number}: {hunk}[/dim]")
+            for error in f.get("errors", []):
+                console.print(f"[red]  {escape(error)}[/red]")
+
+        for e in result.get("edits", []):
+            colour = "green" if e["status"] in ("applied", "ok") else "red"
+            where = f" (line {e['line']})" if "line" in e else ""
+            detail = f": {e['error']}" if "error" in e else ""
+            console.print(f"[{colour}]#{e['index']} {e['path']}: {e['status']}{where}{detail}[/{colour}]")
+
+        if not result["success"]:
+            if "output" in result:
+                console.print(result["output"], markup=False)
+            console.print("[red]✗ Nothing was written[/red]")
+            raise click.Abort()
+        if dry_run:
+            console.print("[green]✓ Everything applies (dry run)[/green]")
+
+    except click.Abort:
+        raise
+    except Exception as e:
+        output.fail(e)
+
+
+@files.command(name="hash")
+@click.argument("sandbox_id")
+@click.argument("paths", nargs=-1, required=True)
+@click.option(
+    "--algorithm",
+    "-a",
+    type=click.Choice(files_module.HASH_ALGORITHMS),
+    default="sha256",
+    help="Hash algorithm",
+)
+@click.option("--stat", is_flag=True, help="Also report size and mtime")
+@click.option("--include", "-i", multiple=True, help="Inside directories, only hash files whose relative path or name matches this glob (repeatable)")
+@click.option("--exclude", "-x", multiple=True, help="Skip paths matching this glob (repeatable)")
+@click.option("--no-default-excludes", is_flag=True, help="Also hash .git, node_modules, __pycache__ and .venv")
+@click.option(
+    "--max-files",
+    type=int,
+    default=files_module.DEFAULT_HASH_BUDGET,
+    help="Stop after this many files",
+)
+def hash_(sandbox_id, paths, algorithm, stat, include, exclude, no_default_excludes, max_files):
+    """
+    Hash files and directory trees sandbox-side.
+
+    Only the digests are transferred, so comparing them with earlier ones
+    shows which files changed without reading them.
+
+    Examples:
+        sbx files hash $SANDBOX_ID /home/user/repo --include "*.py"
+        sbx --json files hash $SANDBOX_ID app.py package.json --stat
+    """
+    try:
+        console.print(f"[yellow]Hashing {len(paths)} paths...[/yellow]")
+
+        includes, excludes = _dir_filters(include, exclude, no_default_excludes)
+        result = files_module.file_checksums(
+            sandbox_id,
+            list(paths),
+            algorithm=algorithm,
+            stat=stat,
+            include=includes,
+            exclude=excludes,
+            max_files=max_files,
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        table = Table(title=f"{algorithm} checksums ({result['count']} files)")
+        table.add_column("Hash", style="cyan")
+        table.add_column("Path", style="green")
+        if stat:
+            table.add_column("Size", style="yellow", justify="right")
+
+        for path, entry in result["files"].items():
+            if stat:
+                table.add_row(entry["hash"][:16], escape(path), str(entry["size"]))
+            else:
+                table.add_row(entry[:16], escape(path))
+
+        console.print(table)
+        console.print(f"[dim]{result['bytes']:,} bytes hashed in {result['duration']}s[/dim]")
+
+        for path in result["missing"]:
+            console.print(f"[red]Not found: {escape(path)}[/red]")
+        for path, error in result["errors"].items():
+            console.print(f"[red]{escape(path)}: {escape(error)}[/red]")
+        if result["truncated"]:
+            console.print(f"[yellow]Stopped after {max_files} files (--max-files)[/yellow]")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@files.command(name="upload-dir")
+@click.argument("sandbox_id")
+@click.argument("local_dir")
+@click.argument("remote_dir")
+@click.option("--include", "-i", multiple=True, help="Only transfer paths matching this glob (repeatable)")
+@click.option("--exclude", "-x", multiple=True, help="Skip paths matching this glob (repeatable)")
+@click.option("--no-default-excludes", is_flag=True, help="Also transfer .git, node_modules, __pycache__ and .venv")
+def upload_dir(sandbox_id, local_dir, remote_dir, include, exclude, no_default_excludes):
+    """Upload a directory as a single tar archive."""
+    try:
+        console.print(f"[yellow]Uploading {local_dir} to {remote_dir}...[/yellow]")
+
+        includes, excludes = _dir_filters(include, exclude, no_default_excludes)
+        result = files_module.upload_dir(
+            sandbox_id, local_dir, remote_dir, include=includes, exclude=excludes
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        _print_transfer(result, "Uploaded")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@files.command(name="download-dir")
+@click.argument("sandbox_id")
+@click.argument("remote_dir")
+@click.argument("local_dir")
+@click.option("--include", "-i", multiple=True, help="Only transfer paths matching this glob (repeatable)")
+@click.option("--exclude", "-x", multiple=True, help="Skip paths matching this glob (repeatable)")
+@click.option("--no-default-excludes", is_flag=True, help="Also transfer .git, node_modules, __pycache__ and .venv")
+def download_dir(sandbox_id, remote_dir, local_dir, include, exclude, no_default_excludes):
+    """Download a directory as a single tar archive."""
+    try:
+        console.print(f"[yellow]Downloading {remote_dir} to {local_dir}...[/yellow]")
+
+        includes, excludes = _dir_filters(include, exclude, no_default_excludes)
+        result = files_module.download_dir(
+            sandbox_id, remote_dir, local_dir, include=includes, exclude=excludes
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        _print_transfer(result, "Downloaded")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@files.command(name="read-many")
+@click.argument("sandbox_id")
+@click.argument("paths", nargs=-1, required=True)
+@click.option(
+    "--max-workers",
+    default=files_module.DEFAULT_TRANSFER_WORKERS,
+    help="Maximum number of concurrent reads",
+)
+def read_many(sandbox_id, paths, max_workers):
+    """Read several files at once."""
+    try:
+        console.print(f"[yellow]Reading {len(paths)} files...[/yellow]")
+
+        results = files_module.read_files(
+            sandbox_id, list(paths), max_workers=max_workers
+        )
+
+        if output.is_machine():
+            output.emit({"files": results})
+            return
+
+        for result in results:
+            if result["success"]:
+                console.print(f"\n[cyan]Content of {result['path']}:[/cyan]")
+                console.print(result["content"])
+            else:
+                console.print(f"\n[red]✗ {result['path']}: {result['error']}[/red]")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@files.command(name="write-many")
+@click.argument("sandbox_id")
+@click.argument("files_json")
+@click.option(
+    "--max-workers",
+    default=files_module.DEFAULT_TRANSFER_WORKERS,
+    help="Maximum number of concurrent writes",
+)
+def write_many(sandbox_id, files_json, max_workers):
+    """
+    Write several files at once.
+
+    FILES_JSON is a JSON array of {"path": ..., "content": ...} objects,
+    or "-" to read it from stdin.
+    """
+    try:
+        file_list = json.loads(sys.stdin.read() if files_json == "-" else files_json)
+
+        console.print(f"[yellow]Writing {len(file_list)} files...[/yellow]")
+
+        results = files_module.write_files(
+            sandbox_id, file_list, max_workers=max_workers
+        )
+
+        if output.is_machine():
+            output.emit({"files": results})
+            return
+
+        for result in results:
+            if result["success"]:
+                console.print(f"[green]✓ File written: {result['path']}[/green]")
+            else:
+                console.print(f"[red]✗ {result['path']}: {result['error']}[/red]")
+
+    except Exception as e:
+        output.fail(e)
@@ -0,0 +1,77 @@
+"""
+Git repository commands.
+"""
+
+import click
+from ..modules import git as git_module
+from .. import output
+from ..output import console
+
+
+@click.group()
+def git():
+    """Git operations inside a sandbox."""
+    pass
+
+
+@git.command()
+@click.argument("sandbox_id")
+@click.argument("repo_url")
+@click.argument("path", default=git_module.DEFAULT_REPO_DIR)
+@click.option("--branch", "-b", default=None, help="Branch to check out (created if the remote lacks it)")
+@click.option("--depth", default=0, type=int, help="Fetch only this many commits per branch (0 for full history)")
+@click.option(
+    "--filter",
+    "filter_",
+    default=git_module.DEFAULT_FILTER,
+    help="Partial clone filter (blobs are fetched on demand by default)",
+)
+@click.option("--no-filter", is_flag=True, help="Full clone, no partial clone filter")
+@click.option("--sparse", "-s", multiple=True, help="Only check out this directory (repeatable)")
+@click.option("--reference", default=None, help="Bare repository in the sandbox to borrow objects from")
+@click.option("--no-mirror", is_flag=True, help="Ignore a mirror baked into the template")
+@click.option("--timeout", default=600, type=int, help="Clone timeout in seconds (0 for unlimited)")
+def clone(sandbox_id, repo_url, path, branch, depth, filter_, no_filter, sparse, reference, no_mirror, timeout):
+    """
+    Clone a repository into the sandbox, fetching as little as possible.
+
+    Partial (blob:none) by default. A bare mirror baked into the template at
+    ~/.git-mirrors/<host>/<owner>/<repo>.git is used automatically, so only
+    newer objects are fetched.
+
+    Examples:
+        sbx git clone $SANDBOX_ID https://github.com/disler/agent-sandboxes.git
+        sbx git clone $SANDBOX_ID $REPO_URL /home/user/repo --branch feature --sparse apps/sandbox_cli
+    """
+    try:
+        console.print(f"[yellow]Cloning {repo_url} to {path}...[/yellow]")
+
+        result = git_module.clone_repo(
+            sandbox_id,
+            repo_url,
+            path,
+            branch=branch,
+            depth=depth,
+            filter=None if no_filter else filter_,
+            sparse=list(sparse) or None,
+            reference=reference,
+            use_mirror=not no_mirror,
+            timeout=timeout if timeout > 0 else None,
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        created = " (created)" if result["branch_created"] else ""
+        console.print(
+            f"[green]✓ Cloned {result['branch']}{created} at {result['commit'][:12]}[/green]"
+        )
+        if result["mirror"]:
+            console.print(f"[dim]Objects borrowed from mirror {result['mirror']}[/dim]")
+        console.print(
+            f"[dim]Fetched {result['bytes_fetched']:,} bytes in {result['duration']}s[/dim]"
+        )
+
+    except Exception as e:
+        output.fail(e)
@@ -0,0 +1,184 @@
+"""
+Background process commands.
+"""
+
+from datetime import datetime
+
+import click
+from rich.markup import escape
+from rich.table import Table
+from ..modules import commands as cmd_module
+from .. import output
+from ..output import console
+
+
+@click.group()
+def process():
+    """Monitor and control background processes (started with exec --background)."""
+    pass
+
+
+@process.command(name="list")
+@click.argument("sandbox_id")
+def list_(sandbox_id):
+    """
+    List running processes and exited background processes.
+
+    Example:
+        sbx process list $SANDBOX_ID
+    """
+    try:
+        console.print("[yellow]Listing processes...[/yellow]")
+
+        processes = cmd_module.list_processes(sandbox_id)
+
+        if output.is_machine():
+            output.emit_rows(processes, "processes")
+            return
+
+        if not processes:
+            console.print("[dim]No processes found[/dim]")
+            return
+
+        table = Table(title=f"Processes ({len(processes)})")
+        table.add_column("PID", style="cyan", justify="right")
+        table.add_column("Status")
+        table.add_column("Started", style="yellow")
+        table.add_column("Output", style="dim", justify="right")
+        table.add_column("Command", style="green")
+
+        for proc in processes:
+            if proc["running"]:
+                status = "[green]running[/green]"
+            elif proc["exit_code"] is None:
+                status = "[red]killed[/red]"
+            else:
+                style = "green" if proc["exit_code"] == 0 else "red"
+                status = f"[{style}]exit {proc['exit_code']}[/{style}]"
+            started = (
+                datetime.fromtimestamp(proc["started_at"]).strftime("%H:%M:%S")
+                if proc["started_at"] else "-"
+            )
+            table.add_row(
+                str(proc["pid"]),
+                status,
+                started,
+                f"{proc['output_bytes']:,} B" if proc["tracked"] else "-",
+                escape(proc["cmd"]),
+            )
+
+        console.print(table)
+
+    except Exception as e:
+        output.fail(e)
+
+
+def _print_output(result):
+    """Render a get_process_output / wait_process result."""
+    if not result["tracked"]:
+        console.print("[yellow]Output not captured (not started with exec --background)[/yellow]")
+    elif result["dropped_bytes"]:
+        console.print(f"[dim]... {result['dropped_bytes']:,} bytes no longer buffered[/dim]")
+
+    if result.get("output"):
+        console.print(escape(result["output"]), end="" if result["output"].endswith("\n") else "\n")
+
+    if result["running"]:
+        console.print(f"\n[cyan]Running[/cyan] [dim](next offset: {result.get('next_offset', 0)})[/dim]")
+    elif result["exit_code"] is None:
+        console.print("\n[red]Process is gone (killed or not found)[/red]")
+    else:
+        console.print(f"\n[cyan]Exit code: {result['exit_code']}[/cyan]")
+
+    if result.get("more"):
+        console.print(f"[dim]More output available from offset {result['next_offset']}[/dim]")
+
+
+@process.command(name="output")
+@click.argument("sandbox_id")
+@click.argument("pid", type=int)
+@click.option("--since", default=0, type=int, help="Byte offset to read from (-1 for the tail)")
+@click.option("--max-bytes", default=10000, type=int, help="Maximum bytes of output returned")
+def output_(sandbox_id, pid, since, max_bytes):
+    """
+    Show the buffered output of a background process.
+
+    Pass the previous next_offset as --since to get only new output.
+
+    Examples:
+        sbx process output $SANDBOX_ID 1234
+        sbx process output $SANDBOX_ID 1234 --since -1 --max-bytes 2000
+    """
+    try:
+        result = cmd_module.get_process_output(
+            sandbox_id, pid, since_offset=since, max_bytes=max_bytes
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        _print_output(result)
+
+    except Exception as e:
+        output.fail(e)
+
+
+@process.command()
+@click.argument("sandbox_id")
+@click.argument("pid", type=int)
+@click.option("--timeout", default=30, type=float, help="Seconds to wait for the process to exit")
+@click.option("--since", default=-1, type=int, help="Byte offset of the output shown (-1 for the tail)")
+@click.option("--max-bytes", default=10000, type=int, help="Maximum bytes of output returned")
+def wait(sandbox_id, pid, timeout, since, max_bytes):
+    """
+    Wait for a background process to exit and show its output.
+
+    Returns when the process exits or after --timeout with it still running.
+
+    Example:
+        sbx process wait $SANDBOX_ID 1234 --timeout 300
+    """
+    try:
+        console.print(f"[yellow]Waiting up to {timeout:g}s for process {pid}...[/yellow]")
+
+        result = cmd_module.wait_process(
+            sandbox_id, pid, timeout=timeout, since_offset=since, max_bytes=max_bytes
+        )
+
+        if output.is_machine():
+            output.emit(result)
+            return
+
+        _print_output(result)
+        if result["timed_out"]:
+            console.print(f"[yellow]Still running after {result['waited']:.1f}s[/yellow]")
+
+    except Exception as e:
+        output.fail(e)
+
+
+@process.command()
+@click.argument("sandbox_id")
+@click.argument("pid", type=int)
+def kill(sandbox_id, pid):
+    """
+    Kill a process (SIGKILL).
+
+    Example:
+        sbx process kill $SANDBOX_ID 1234
+    """
+    try:
+        killed = cmd_module.kill_process(sandbox_id, pid)
+
+        if output.is_machine():
+            output.emit({"pid": pid, "killed": killed})
+            return
+
+        if killed:
+            console.print(f"[green]✓ Process {pid} killed[/green]")
+        else:
+            console.print(f"[yellow]Process {pid} not found[/yellow]")
+
+    except Exception as e:
+        output.fail(e)
@@ -2,13 +2,14 @@
 Sandbox management commands.
 """
 
+import time
+
 import click
-from rich.console import Console
 from rich.table import Table
 from rich import print as rprint
 from ..modules import sandbox as sbx_module
-
-console = Console()
+from .. import output
+from ..output import console
 
 
 @click.group()
@@ -50,6 +51,15 @@ def create(template, timeout, env, metadata, auto_pause):
             auto_pause=auto_pause,
         )
 
+        if output.is_machine():
+            output.emit({
+                "sandbox_id": sbx.sandbox_id,
+                "template": template or "base",
+                "timeout": timeout,
+                "auto_pause": auto_pause,
+            })
+            return
+
         console.print(f"[green]✓ Sandbox created: {sbx.sandbox_id}[/green]")
         console.print(f"[dim]Template: {template or 'base'}[/dim]")
         console.print(f"[dim]Timeout: {timeout}s[/dim]")
@@ -60,8 +70,7 @@ def create(template, timeout, env, metadata, auto_pause):
         console.print(f"\n[cyan]Export for reuse:[/cyan] export SANDBOX_ID={sbx.sandbox_id}")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @sandbox.command()
@@ -75,6 +84,10 @@ def connect(sandbox_id, timeout):
         sbx = sbx_module.get_sandbox(sandbox_id, timeout=timeout)
         is_running = sbx.is_running()
 
+        if output.is_machine():
+            output.emit({"sandbox_id": sandbox_id, "running": is_running})
+            return
+
         if is_running:
             console.print(f"[green]✓ Connected to sandbox: {sandbox_id}[/green]")
             console.print(f"[dim]Status: Running[/dim]")
@@ -82,8 +95,7 @@ def connect(sandbox_id, timeout):
             console.print(f"[red]✗ Sandbox not running[/red]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @sandbox.command()
@@ -95,14 +107,17 @@ def kill(sandbox_id):
 
         killed = sbx_module.kill_sandbox(sandbox_id)
 
+        if output.is_machine():
+            output.emit({"sandbox_id": sandbox_id, "killed": killed})
+            return
+
         if killed:
             console.print(f"[green]✓ Sandbox killed[/green]")
         else:
             console.print(f"[red]✗ Sandbox not found[/red]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @sandbox.command()
@@ -114,6 +129,10 @@ def info(sandbox_id):
 
         info = sbx_module.get_sandbox_info(sandbox_id)
 
+        if output.is_machine():
+            output.emit(info)
+            return
+
         table = Table(title=f"Sandbox Info: {sandbox_id}")
         table.add_column("Field", style="cyan")
         table.add_column("Value", style="green")
@@ -128,8 +147,7 @@ def info(sandbox_id):
         console.print(table)
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @sandbox.command()
@@ -141,12 +159,37 @@ def pause(sandbox_id):
 
         sbx_module.pause_sandbox(sandbox_id)
 
+        if output.is_machine():
+            output.emit({"sandbox_id": sandbox_id, "paused": True})
+            return
+
         console.print(f"[green]✓ Sandbox paused[/green]")
-        console.print(f"[dim]Use 'connect' to resume[/dim]")
+        console.print(f"[dim]Use 'resume' to resume[/dim]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
+
+
+@sandbox.command()
+@click.argument("sandbox_id")
+@click.option("--timeout", default=None, type=int, help="Timeout for the resumed sandbox in seconds")
+def resume(sandbox_id, timeout):
+    """Resume a paused sandbox."""
+    try:
+        console.print(f"[yellow]Resuming sandbox: {sandbox_id}[/yellow]")
+
+        start = time.monotonic()
+        sbx_module.resume_sandbox(sandbox_id, timeout=timeout)
+        duration = round(time.monotonic() - start, 3)
+
+        if output.is_machine():
+            output.emit({"sandbox_id": sandbox_id, "resumed": True, "duration": duration})
+            return
+
+        console.print(f"[green]✓ Sandbox resumed in {duration}s[/green]")
+
+    except Exception as e:
+        output.fail(e)
 
 
 @sandbox.command()
@@ -156,14 +199,17 @@ def status(sandbox_id):
     try:
         is_running = sbx_module.is_sandbox_running(sandbox_id)
 
+        if output.is_machine():
+            output.emit({"sandbox_id": sandbox_id, "running": is_running})
+            return
+
         if is_running:
             console.print(f"[green]✓ Sandbox {sandbox_id} is running[/green]")
         else:
             console.print(f"[red]✗ Sandbox {sandbox_id} is not running[/red]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @sandbox.command(name="get-host")
@@ -177,6 +223,10 @@ def get_host(sandbox_id, port):
         host = sbx_module.get_host(sandbox_id, port)
         url = f"https://{host}"
 
+        if output.is_machine():
+            output.emit({"sandbox_id": sandbox_id, "port": port, "host": host, "url": url})
+            return
+
         console.print(f"[green]✓ Public URL: {url}[/green]")
         console.print(f"[dim]Sandbox: {sandbox_id}[/dim]")
         console.print(f"[dim]Port: {port}[/dim]")
@@ -185,8 +235,7 @@ def get_host(sandbox_id, port):
         rprint(url)
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 @sandbox.command()
@@ -198,6 +247,10 @@ def list(limit):
 
         sandboxes = sbx_module.list_sandboxes(limit=limit)
 
+        if output.is_machine():
+            output.emit_rows(sandboxes, "sandboxes")
+            return
+
         if not sandboxes:
             console.print("[dim]No running sandboxes found[/dim]")
             return
@@ -220,5 +273,4 @@ def list(limit):
         console.print(table)
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
@@ -7,7 +7,6 @@ A comprehensive CLI for managing E2B sandboxes and performing operations.
 import click
 from pathlib import Path
 from dotenv import load_dotenv
-from rich.console import Console
 
 # Load environment variables
 root_dir = Path(__file__).parent.parent.parent.parent
@@ -16,14 +15,28 @@ load_dotenv(root_dir / ".env")
 # Import command groups
 from .commands.sandbox import sandbox
 from .commands.files import files
-from .commands.exec import exec
-
-console = Console()
+from .commands.exec import exec, exec_batch, exec_many
+from .commands.process import process
+from .commands.git import git
+from . import output
+from .output import console
 
 
 @click.group()
 @click.version_option(version="0.1.0")
-def cli():
+@click.option(
+    "--json",
+    "output_mode",
+    flag_value=output.JSON,
+    help="Emit machine-readable JSON instead of Rich output",
+)
+@click.option(
+    "--ndjson",
+    "output_mode",
+    flag_value=output.NDJSON,
+    help="Like --json, but stream list results one JSON object per line",
+)
+def cli(output_mode):
     """
     E2B Sandbox CLI - Control sandboxes from the command line.
 
@@ -31,6 +44,9 @@ def cli():
     - Create, connect to, and manage sandboxes (sandbox)
     - Perform file operations with SDK APIs (files)
     - Execute any command with full control (exec)
+    - Run one command on many sandboxes at once (exec-many)
+    - Follow and stop background processes (process)
+    - Clone repositories with minimal transfer (git)
 
     Most commands require a SANDBOX_ID. You can get one by:
     1. Creating a new sandbox: sbx init
@@ -40,14 +56,22 @@ def cli():
       export SANDBOX_ID=<your-sandbox-id>
       sbx files ls $SANDBOX_ID /
       sbx exec $SANDBOX_ID "python --version"
+
+    For scripts and agents, put --json (or --ndjson) before the command
+    to get the module results as JSON with no Rich formatting:
+      sbx --json files read $SANDBOX_ID /etc/hostname
     """
-    pass
+    output.set_mode(output_mode)
 
 
 # Add command groups
 cli.add_command(sandbox)
 cli.add_command(files)
 cli.add_command(exec)
+cli.add_command(exec_batch)
+cli.add_command(exec_many)
+cli.add_command(process)
+cli.add_command(git)
 
 
 # Add an init command for quick sandbox setup
@@ -98,14 +122,22 @@ def init(template, timeout, env):
             template=template, timeout=timeout, envs=envs if envs else None
         )
 
+        if output.is_machine():
+            output.emit({
+                "sandbox_id": sbx.sandbox_id,
+                "template": template or "base",
+                "timeout": timeout,
+                "auto_pause": False,
+            })
+            return
+
         console.print(f"\n[green]✓ Sandbox created successfully![/green]")
         console.print(f"\n[cyan]Sandbox ID:[/cyan] {sbx.sandbox_id}")
         if template:
             console.print(f"[dim]Template: {template}[/dim]")
 
     except Exception as e:
-        console.print(f"[red]✗ Error: {e}[/red]")
-        raise click.Abort()
+        output.fail(e)
 
 
 if __name__ == "__main__":
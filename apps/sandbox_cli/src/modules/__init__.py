@@ -5,5 +5,7 @@ Reusable modules for sandbox operations.
 from . import sandbox
 from . import files
 from . import commands
+from . import connections
+from . import git
 
-__all__ = ["sandbox", "files", "commands"]
+__all__ = ["sandbox", "files", "commands", "connections", "git"]
@@ -3,8 +3,29 @@ Command execution module for sandbox.
 Provides helper functions for running commands.
 """
 
-from typing import Optional, Dict, List
-from e2b import Sandbox
+import contextvars
+import json
+import shlex
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, List
+
+from e2b import CommandExitException
+
+from .sandbox import get_sandbox, list_sandboxes
+
+# Default fan-out for run_on_many (sandboxes running the command at once)
+DEFAULT_FANOUT = 8
+
+# Default characters of stdout/stderr kept per stream by compact_output
+DEFAULT_OUTPUT_BUDGET = 20_000
+
+# Sandbox directory holding the full output of compacted commands
+SPILL_DIR = "/tmp/.sbx/output"
+
+# Spill files kept in SPILL_DIR; older ones are removed when a new one is written
+SPILL_KEEP = 40
 
 
 def run_command(
@@ -13,28 +34,326 @@ def run_command(
     cwd: Optional[str] = None,
     envs: Optional[Dict[str, str]] = None,
     timeout: Optional[float] = 60,
+    on_stdout: Optional[Callable[[str], None]] = None,
+    on_stderr: Optional[Callable[[str], None]] = None,
+    on_start: Optional[Callable[[int], None]] = None,
+    max_output: Optional[int] = None,
 ) -> Dict:
     """
     Run a command in the sandbox and wait for it to complete.
 
+    With max_output, long output is compacted (see compact_output): the
+    result keeps the head and tail of each stream with its byte and line
+    counts, and the full stream is written to a file in the sandbox. A
+    non-zero exit is then returned (see exit_code) rather than raised as
+    CommandExitException, so a failed build keeps its stdout and spill files.
+
     Args:
         sandbox_id: The sandbox ID
         cmd: Command to execute
         cwd: Working directory
         envs: Environment variables
         timeout: Command timeout in seconds
+        on_stdout: Called with each stdout chunk as it arrives
+        on_stderr: Called with each stderr chunk as it arrives
+        on_start: Called with the PID once the command started (so a
+            cancelled caller can kill it with kill_process)
+        max_output: Characters kept per stream before compacting (None for
+            the full output)
 
     Returns:
         Command result dictionary with stdout, stderr, exit_code
     """
-    sbx = Sandbox.connect(sandbox_id)
-    result = sbx.commands.run(cmd, cwd=cwd, envs=envs, timeout=timeout)
+    sbx = get_sandbox(sandbox_id)
+    # Same as a foreground run, with the PID exposed before waiting
+    handle = sbx.commands.run(cmd, background=True, cwd=cwd, envs=envs, timeout=timeout)
+    if on_start is not None:
+        on_start(handle.pid)
+    try:
+        result = handle.wait(on_stdout=on_stdout, on_stderr=on_stderr)
+    except CommandExitException as e:
+        if not max_output:
+            raise
+        # Carries stdout, stderr and exit_code like a result
+        result = e
 
-    return {
+    result = {
         "stdout": result.stdout,
         "stderr": result.stderr,
         "exit_code": result.exit_code,
     }
+    if max_output:
+        return compact_output(sandbox_id, result, max_output)
+    return result
+
+
+def _count_lines(text: str) -> int:
+    """Number of lines, counting an unterminated last line."""
+    return text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+
+
+def _head_tail(text: str, limit: int, path: str) -> str:
+    """
+    First quarter and last three quarters of `limit` characters (errors are
+    usually at the end), with a marker for the rest. Cuts at line breaks
+    unless that would drop more than half of the head or tail.
+    """
+    head = text[: limit // 4]
+    cut = head.rfind("\n")
+    if cut >= len(head) // 2:
+        head = head[: cut + 1]
+
+    tail = text[len(text) - (limit - len(head)) :]
+    cut = tail.find("\n")
+    if 0 <= cut < len(tail) // 2:
+        tail = tail[cut + 1 :]
+
+    omitted = text[len(head) : len(text) - len(tail)]
+    return (
+        f"{head}...[{len(omitted.encode())} bytes, {_count_lines(omitted)} lines "
+        f"omitted; full output in {path}]...\n{tail}"
+    )
+
+
+def compact_output(
+    sandbox_id: str,
+    result: Dict,
+    max_output: int = DEFAULT_OUTPUT_BUDGET,
+    spill_dir: str = SPILL_DIR,
+) -> Dict:
+    """
+    Compact the stdout/stderr of a command result to a character budget.
+
+    Every stream gets <stream>_bytes and <stream>_lines (its full size).
+    A stream longer than max_output characters is replaced by its head and
+    tail, and written in full to a file in the sandbox whose path is
+    returned as <stream>_file, to be paged with a ranged read. Only the
+    newest SPILL_KEEP files in spill_dir are kept.
+
+    Args:
+        sandbox_id: The sandbox ID
+        result: Command result with stdout, stderr and exit_code
+        max_output: Characters kept per stream
+        spill_dir: Sandbox directory for the full output
+
+    Returns:
+        The result with compacted streams, sizes and spill file paths
+    """
+    compacted = dict(result)
+    spilled = {}
+    stem = f"{spill_dir}/{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    for stream in ("stdout", "stderr"):
+        text = result[stream] or ""
+        compacted[f"{stream}_bytes"] = len(text.encode())
+        compacted[f"{stream}_lines"] = _count_lines(text)
+        if len(text) <= max_output:
+            continue
+        path = f"{stem}.{stream}"
+        spilled[path] = text
+        compacted[stream] = _head_tail(text, max_output, path)
+        compacted[f"{stream}_file"] = path
+
+    if spilled:
+        sbx = get_sandbox(sandbox_id)
+        for path, text in spilled.items():
+            sbx.files.write(path, text)
+        try:
+            sbx.commands.run(
+                f"cd {shlex.quote(spill_dir)} && ls -1t | tail -n +{SPILL_KEEP + 1} | xargs -r rm -f --",
+                timeout=10,
+            )
+        except Exception:
+            # Pruning is best effort; the next spill tries again
+            pass
+    return compacted
+
+
+# Sandbox-side state of background commands started by this module:
+# <PROCESS_DIR>/<pid>/ holds meta.json, the output ring and the exit status
+PROCESS_DIR = "/tmp/.sbx/procs"
+
+# Bytes of combined stdout/stderr kept per background process
+DEFAULT_BUFFER_BYTES = 1_000_000
+
+# Runs sandbox-side with python3 in place of the background command (exec'd,
+# so it keeps the command's PID). Runs the command under bash with stderr
+# merged into stdout and keeps the output in a two-segment ring: "cur" is
+# appended to and rotated to "prev" when it reaches half the capacity, and
+# "base" holds the absolute offset at which "prev" starts. Rotation happens
+# under the lock readers take, so offsets stay consistent while it runs.
+_SUPERVISOR_SCRIPT = r'''
+import ctypes, fcntl, json, os, signal, subprocess, sys, time
+
+d, capacity, cmd = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+with open(os.path.join(d, "meta.json"), "w") as f:
+    json.dump({"cmd": cmd, "cwd": os.getcwd(), "started_at": time.time(),
+               "capacity": capacity}, f)
+with open(os.path.join(d, "base"), "w") as f:
+    f.write("0")
+
+
+def die_with_parent():
+    # Killing the PID (sandbox commands.kill) also kills the command
+    try:
+        ctypes.CDLL(None).prctl(1, signal.SIGKILL)
+    except Exception:
+        pass
+
+
+proc = subprocess.Popen(["/bin/bash", "-c", cmd], stdin=subprocess.DEVNULL,
+                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                        preexec_fn=die_with_parent)
+
+lock = open(os.path.join(d, "lock"), "w")
+cur_path, prev_path = os.path.join(d, "cur"), os.path.join(d, "prev")
+cur = open(cur_path, "ab")
+base, prev_len, cur_len = 0, 0, 0
+segment = max(1, capacity // 2)
+
+while True:
+    chunk = os.read(proc.stdout.fileno(), min(65536, segment))
+    if not chunk:
+        break
+    if cur_len and cur_len + len(chunk) > segment:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        cur.close()
+        os.replace(cur_path, prev_path)
+        base, prev_len, cur_len = base + prev_len, cur_len, 0
+        with open(os.path.join(d, "base"), "w") as f:
+            f.write(str(base))
+        cur = open(cur_path, "ab")
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    cur.write(chunk)
+    cur.flush()
+    cur_len += len(chunk)
+
+code = proc.wait()
+with open(os.path.join(d, "exit.tmp"), "w") as f:
+    json.dump({"exit_code": code, "ended_at": time.time()}, f)
+os.replace(os.path.join(d, "exit.tmp"), os.path.join(d, "exit"))
+sys.exit(code if code >= 0 else 128 - code)
+'''
+
+# Runs sandbox-side with python3: waits up to `wait` seconds for the process
+# to exit, then returns its status and the output from `since` (negative:
+# the last `limit` bytes) as JSON
+_READ_OUTPUT_SCRIPT = r'''
+import codecs, fcntl, json, os, sys, time
+
+root, pid, since, limit, wait = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), \
+    int(sys.argv[4]), float(sys.argv[5])
+d = os.path.join(root, str(pid))
+
+
+def status():
+    try:
+        with open(os.path.join(d, "exit")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def alive():
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+deadline = time.monotonic() + wait
+while status() is None and alive() and time.monotonic() < deadline:
+    time.sleep(0.2)
+
+ended = status()
+result = {"pid": pid, "tracked": os.path.isdir(d), "running": ended is None and alive(),
+          "exit_code": ended["exit_code"] if ended else None}
+if not result["tracked"]:
+    print(json.dumps(result))
+    sys.exit()
+
+data, base = b"", 0
+with open(os.path.join(d, "lock"), "a") as lock:
+    fcntl.flock(lock, fcntl.LOCK_SH)
+    try:
+        try:
+            with open(os.path.join(d, "base")) as f:
+                base = int(f.read() or 0)
+        except FileNotFoundError:
+            pass
+        for name in ("prev", "cur"):
+            try:
+                with open(os.path.join(d, name), "rb") as f:
+                    data += f.read()
+            except FileNotFoundError:
+                pass
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+
+end = base + len(data)
+if since < 0:
+    start = max(base, end - limit)
+else:
+    start = min(max(since, base), end)
+chunk = data[start - base:start - base + limit]
+
+# Hold back a multi-byte character split at the end of the window
+decoder = codecs.getincrementaldecoder("utf-8")("replace")
+text = decoder.decode(chunk, final=start + len(chunk) == end and not result["running"])
+next_offset = start + len(chunk) - len(decoder.getstate()[0])
+
+result.update(
+    output=text,
+    offset=start,
+    next_offset=next_offset,
+    total_bytes=end,
+    dropped_bytes=max(0, base - since) if since >= 0 else 0,
+    more=next_offset < end,
+)
+print(json.dumps(result))
+'''
+
+# Runs sandbox-side with python3: describes every tracked process as JSON
+_LIST_TRACKED_SCRIPT = r'''
+import json, os, sys
+
+root, rows = sys.argv[1], []
+for name in os.listdir(root) if os.path.isdir(root) else []:
+    d = os.path.join(root, name)
+    try:
+        with open(os.path.join(d, "meta.json")) as f:
+            row = json.load(f)
+        with open(os.path.join(d, "base")) as f:
+            size = int(f.read() or 0)
+    except (OSError, ValueError):
+        continue
+    for segment in ("prev", "cur"):
+        try:
+            size += os.path.getsize(os.path.join(d, segment))
+        except OSError:
+            pass
+    try:
+        with open(os.path.join(d, "exit")) as f:
+            row.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    row.update(pid=int(name), output_bytes=size)
+    rows.append(row)
+print(json.dumps(rows))
+'''
+
+
+def _run_python(sbx, script: str, *args, timeout: Optional[float] = 60):
+    """Run a sandbox-side python3 script and parse its JSON output."""
+    quoted = " ".join(shlex.quote(str(a)) for a in args)
+    try:
+        result = sbx.commands.run(
+            f"python3 -c {shlex.quote(script)} {quoted}", timeout=timeout
+        )
+    except CommandExitException as e:
+        raise RuntimeError(e.stderr.strip() or str(e)) from e
+    return json.loads(result.stdout)
 
 
 def run_command_background(
@@ -43,22 +362,39 @@ def run_command_background(
     cwd: Optional[str] = None,
     envs: Optional[Dict[str, str]] = None,
     timeout: Optional[float] = 60,
+    buffer_bytes: int = DEFAULT_BUFFER_BYTES,
 ) -> Dict:
     """
     Run a command in the background and return immediately.
 
+    Combined stdout/stderr is kept sandbox-side in a ring buffer of about
+    `buffer_bytes`, readable with get_process_output / wait_process. Without
+    python3 in the sandbox the command runs uncaptured.
+
     Args:
         sandbox_id: The sandbox ID
         cmd: Command to execute
         cwd: Working directory
         envs: Environment variables
         timeout: Command timeout in seconds
+        buffer_bytes: Output bytes kept for the process (oldest dropped first)
 
     Returns:
         Dictionary with pid (process starts immediately, does not wait)
     """
-    sbx = Sandbox.connect(sandbox_id)
-    handle = sbx.commands.run(cmd, background=True, cwd=cwd, envs=envs, timeout=timeout)
+    sbx = get_sandbox(sandbox_id)
+    q_cmd = shlex.quote(cmd)
+    # The state directory is created before exec so it is there on return
+    wrapped = (
+        f"if command -v python3 >/dev/null; then "
+        f"d={PROCESS_DIR}/$$; rm -rf \"$d\" && mkdir -p \"$d\" && "
+        f"exec python3 -c {shlex.quote(_SUPERVISOR_SCRIPT)} "
+        f"\"$d\" {int(buffer_bytes)} {q_cmd}; "
+        f"else exec /bin/bash -c {q_cmd}; fi"
+    )
+    handle = sbx.commands.run(
+        wrapped, background=True, cwd=cwd, envs=envs, timeout=timeout
+    )
     pid = handle.pid
 
     # Do NOT wait - return immediately for true background execution
@@ -70,25 +406,127 @@ def run_command_background(
     }
 
 
+def get_process_output(
+    sandbox_id: str,
+    pid: int,
+    since_offset: int = 0,
+    max_bytes: int = 10000,
+    wait: float = 0,
+) -> Dict:
+    """
+    Read the buffered output of a background process.
+
+    Offsets count bytes of combined stdout/stderr since the process started,
+    so polling with the previous `next_offset` returns only new output. Output
+    that has already left the ring buffer is reported as `dropped_bytes`.
+
+    Args:
+        sandbox_id: The sandbox ID
+        pid: Process ID returned by run_command_background
+        since_offset: Byte offset to read from (negative for the last `max_bytes`)
+        max_bytes: Maximum bytes of output returned
+        wait: Seconds to wait for the process to exit before reading
+
+    Returns:
+        Dictionary with running, exit_code, output, offset, next_offset,
+        total_bytes, dropped_bytes and more (output left past max_bytes);
+        tracked is False for processes not started by run_command_background
+    """
+    sbx = get_sandbox(sandbox_id)
+    return _run_python(
+        sbx,
+        _READ_OUTPUT_SCRIPT,
+        PROCESS_DIR,
+        pid,
+        since_offset,
+        max_bytes,
+        wait,
+        timeout=wait + 60,
+    )
+
+
+def wait_process(
+    sandbox_id: str,
+    pid: int,
+    timeout: float = 30,
+    since_offset: int = -1,
+    max_bytes: int = 10000,
+) -> Dict:
+    """
+    Wait for a background process to exit.
+
+    Args:
+        sandbox_id: The sandbox ID
+        pid: Process ID returned by run_command_background
+        timeout: Seconds to wait before returning with the process still running
+        since_offset: Byte offset of the output to return (default: the tail)
+        max_bytes: Maximum bytes of output returned
+
+    Returns:
+        get_process_output result plus timed_out and the time waited
+    """
+    start = time.monotonic()
+    result = get_process_output(
+        sandbox_id, pid, since_offset=since_offset, max_bytes=max_bytes, wait=timeout
+    )
+    result["timed_out"] = result["running"]
+    result["waited"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def _describe(proc) -> str:
+    """Command line of a process, unwrapping the bash -c envd starts."""
+    if proc.args and "-c" in proc.args[:-1]:
+        return proc.args[-1]
+    return " ".join([proc.cmd, *proc.args])
+
+
 def list_processes(sandbox_id: str) -> List[Dict]:
     """
-    List all running processes in the sandbox.
+    List running processes in the sandbox, plus background processes
+    started by run_command_background that have since exited.
 
     Args:
         sandbox_id: The sandbox ID
 
     Returns:
-        List of process info dictionaries
+        List of process info dictionaries (pid, cmd, cwd, tag, running,
+        exit_code, started_at and buffered output_bytes where tracked)
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     processes = sbx.commands.list()
+    tracked = {row["pid"]: row for row in _run_python(sbx, _LIST_TRACKED_SCRIPT, PROCESS_DIR)}
 
     result = []
     for proc in processes:
+        row = tracked.pop(proc.pid, None)
         result.append({
             "pid": proc.pid,
+            "cmd": row["cmd"] if row else _describe(proc),
+            "cwd": row["cwd"] if row else proc.cwd,
+            "tag": proc.tag,
+            "running": True,
+            "exit_code": None,
+            "tracked": row is not None,
+            "started_at": row["started_at"] if row else None,
+            "output_bytes": row["output_bytes"] if row else None,
         })
 
+    # Exited (or killed) background processes whose output is still buffered
+    for row in tracked.values():
+        result.append({
+            "pid": row["pid"],
+            "cmd": row["cmd"],
+            "cwd": row["cwd"],
+            "tag": None,
+            "running": False,
+            "exit_code": row.get("exit_code"),
+            "tracked": True,
+            "started_at": row["started_at"],
+            "output_bytes": row["output_bytes"],
+        })
+
+    result.sort(key=lambda r: r["pid"])
     return result
 
 
@@ -103,6 +541,190 @@ def kill_process(sandbox_id: str, pid: int) -> bool:
     Returns:
         True if killed, False if not found
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     killed = sbx.commands.kill(pid)
     return killed
+
+
+def _tail(text: str, limit: int) -> str:
+    """Keep the last `limit` characters of output (where errors usually are)."""
+    if len(text) <= limit:
+        return text
+    return f"...[{len(text) - limit} chars truncated]...\n" + text[-limit:]
+
+
+def run_batch(
+    sandbox_id: str,
+    steps: List[Dict],
+    stop_on_failure: bool = True,
+    max_output: int = 2000,
+    on_start: Optional[Callable[[int], None]] = None,
+) -> Dict:
+    """
+    Run an ordered list of commands over a single sandbox connection.
+
+    Each step is a dictionary with a required "cmd" and optional "cwd",
+    "envs" (dict) and "timeout" (seconds, 0 for unlimited, default 60).
+
+    Args:
+        sandbox_id: The sandbox ID
+        steps: Command specs to run in order
+        stop_on_failure: Stop at the first step that fails (otherwise continue)
+        max_output: Maximum characters of stdout/stderr kept per step (tail)
+        on_start: Called with the PID of each step's command once it started
+
+    Returns:
+        Dictionary with per-step exit codes, durations and truncated output
+    """
+    # Reject a malformed batch before any step runs
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or not step.get("cmd"):
+            raise ValueError(f'Step {index} has no "cmd"')
+
+    sbx = get_sandbox(sandbox_id)
+    results = []
+    batch_start = time.monotonic()
+
+    for index, step in enumerate(steps):
+        timeout = step.get("timeout", 60)
+        start = time.monotonic()
+        error = None
+
+        try:
+            handle = sbx.commands.run(
+                step["cmd"],
+                background=True,
+                cwd=step.get("cwd"),
+                envs=step.get("envs"),
+                timeout=timeout if timeout else None,
+            )
+            if on_start is not None:
+                on_start(handle.pid)
+            result = handle.wait()
+        except CommandExitException as e:
+            result = e
+        except Exception as e:
+            result = None
+            error = str(e)
+
+        step_result = {
+            "index": index,
+            "cmd": step["cmd"],
+            "exit_code": result.exit_code if result is not None else None,
+            "duration": round(time.monotonic() - start, 3),
+            "stdout": _tail(result.stdout, max_output) if result is not None else "",
+            "stderr": _tail(result.stderr, max_output) if result is not None else "",
+        }
+        if error:
+            step_result["error"] = error
+        results.append(step_result)
+
+        if step_result["exit_code"] != 0 and stop_on_failure:
+            break
+
+    failed = [r["index"] for r in results if r["exit_code"] != 0]
+
+    return {
+        "success": not failed,
+        "steps": results,
+        "failed": failed,
+        "skipped": len(steps) - len(results),
+        "duration": round(time.monotonic() - batch_start, 3),
+    }
+
+
+def run_on_many(
+    cmd: str,
+    sandbox_ids: Optional[List[str]] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    cwd: Optional[str] = None,
+    envs: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = 60,
+    max_parallel: int = DEFAULT_FANOUT,
+    max_output: int = 2000,
+    limit: int = 100,
+    on_start: Optional[Callable[[int, str], None]] = None,
+) -> Dict:
+    """
+    Run one command on many sandboxes concurrently.
+
+    The sandboxes are given by ID or selected by metadata (running sandboxes
+    whose metadata contains every pair). At most `max_parallel` run the
+    command at once; each gets its own timeout, and a sandbox that fails or
+    cannot be reached does not stop the others.
+
+    Args:
+        cmd: Command to execute
+        sandbox_ids: Sandboxes to run on
+        metadata: Select running sandboxes by metadata instead of IDs
+        cwd: Working directory
+        envs: Environment variables
+        timeout: Command timeout per sandbox in seconds (None for unlimited)
+        max_parallel: Sandboxes running the command at once
+        max_output: Maximum characters of stdout/stderr kept per sandbox (tail)
+        limit: Maximum number of sandboxes selected by metadata
+        on_start: Called with the PID and sandbox ID of each command once it
+            started
+
+    Returns:
+        Dictionary with per-sandbox exit codes, durations and truncated
+        output, in the order of the sandboxes, plus the IDs that failed
+    """
+    if not sandbox_ids:
+        if not metadata:
+            raise ValueError("Give sandbox IDs or a metadata filter")
+        # Only running ones: connecting to a paused sandbox would resume it
+        selected = list_sandboxes(limit=limit, metadata=metadata, state=["running"])
+        sandbox_ids = [s["sandbox_id"] for s in selected]
+    # Keep the order, run each sandbox once
+    sandbox_ids = list(dict.fromkeys(sandbox_ids))
+    fanout_start = time.monotonic()
+
+    def run_one(sandbox_id: str) -> Dict:
+        start = time.monotonic()
+        error = None
+        try:
+            result = run_command(
+                sandbox_id,
+                cmd,
+                cwd=cwd,
+                envs=envs,
+                timeout=timeout,
+                on_start=(lambda pid: on_start(pid, sandbox_id)) if on_start else None,
+            )
+        except CommandExitException as e:
+            result = {"stdout": e.stdout, "stderr": e.stderr, "exit_code": e.exit_code}
+        except Exception as e:
+            result = None
+            error = str(e)
+
+        item = {
+            "sandbox_id": sandbox_id,
+            "exit_code": result["exit_code"] if result is not None else None,
+            "duration": round(time.monotonic() - start, 3),
+            "stdout": _tail(result["stdout"], max_output) if result is not None else "",
+            "stderr": _tail(result["stderr"], max_output) if result is not None else "",
+        }
+        if error:
+            item["error"] = error
+        return item
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(sandbox_ids)))) as pool:
+        # Each worker runs in a copy of the caller's context (as if called directly)
+        futures = [
+            pool.submit(contextvars.copy_context().run, run_one, sandbox_id)
+            for sandbox_id in sandbox_ids
+        ]
+        results = [future.result() for future in futures]
+
+    failed = [r["sandbox_id"] for r in results if r["exit_code"] != 0]
+
+    return {
+        "success": not failed,
+        "cmd": cmd,
+        "sandboxes": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": failed,
+        "results": results,
+        "duration": round(time.monotonic() - fanout_start, 3),
+    }
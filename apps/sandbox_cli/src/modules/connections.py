@@ -0,0 +1,125 @@
+"""
+Connection cache module for sandbox handles.
+Keeps connected Sandbox instances keyed by sandbox ID so long-lived callers
+(such as the MCP server) skip the connect round trip on every operation.
+
+The cache is disabled by default; one-shot CLI invocations have nothing to
+reuse. Call ``enable_cache()`` once at startup to turn it on.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from e2b import Sandbox
+
+
+class ConnectionCache:
+    """
+    Thread-safe LRU cache of connected sandboxes with idle TTL expiry.
+
+    Args:
+        max_size: Maximum number of cached connections (LRU eviction beyond)
+        ttl: Seconds a connection may sit unused before it expires
+    """
+
+    def __init__(self, max_size: int = 64, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[Sandbox, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, sandbox_id: str) -> Optional[Sandbox]:
+        """Return a cached connection, or None on miss or expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sandbox_id)
+            if entry is not None and now - entry[1] > self.ttl:
+                del self._entries[sandbox_id]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries[sandbox_id] = (entry[0], now)
+            self._entries.move_to_end(sandbox_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, sandbox_id: str, sbx: Sandbox) -> None:
+        """Store a connection, evicting the least recently used beyond max_size."""
+        with self._lock:
+            self._entries[sandbox_id] = (sbx, time.monotonic())
+            self._entries.move_to_end(sandbox_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, sandbox_id: str) -> bool:
+        """Drop a connection. Returns True if one was cached."""
+        with self._lock:
+            return self._entries.pop(sandbox_id, None) is not None
+
+    def clear(self) -> None:
+        """Drop all connections."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache: Optional[ConnectionCache] = None
+
+
+def enable_cache(max_size: int = 64, ttl: float = 300) -> ConnectionCache:
+    """
+    Turn on connection caching for this process.
+
+    Args:
+        max_size: Maximum number of cached connections
+        ttl: Idle seconds before a cached connection expires
+
+    Returns:
+        The active ConnectionCache
+    """
+    global _cache
+    _cache = ConnectionCache(max_size=max_size, ttl=ttl)
+    return _cache
+
+
+def get_cache() -> Optional[ConnectionCache]:
+    """Return the active cache, or None when caching is disabled."""
+    return _cache
+
+
+def evict(sandbox_id: str) -> None:
+    """Drop a sandbox's cached connection, if caching is enabled."""
+    if _cache is not None:
+        _cache.evict(sandbox_id)
+
+
+def cache_stats() -> Dict:
+    """Cache counters, or {"enabled": False} when caching is disabled."""
+    if _cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **_cache.stats()}
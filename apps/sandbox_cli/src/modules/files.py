@@ -3,36 +3,174 @@ File operations module for sandbox filesystem.
 Provides helper functions for file management.
 """
 
-from typing import List, Optional, Dict
-from e2b import Sandbox
+import bisect
+import fnmatch
+import json
+import logging
+import os
+import posixpath
+import shlex
+import tarfile
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 
+from e2b import (
+    CommandExitException,
+    SandboxException,
+    SandboxNotFoundException,
+    SandboxUnreachableException,
+)
 
-def list_files(sandbox_id: str, path: str = "/", depth: int = 1) -> List[Dict]:
+from .sandbox import get_sandbox
+
+logger = logging.getLogger(__name__)
+
+# Default fan-out for bulk transfers (read_files / write_files)
+DEFAULT_TRANSFER_WORKERS = 8
+
+# Default size budget for ranged reads (bytes of content returned per call)
+DEFAULT_READ_BUDGET = 100_000
+
+# Default entry budget for compact listings (entries returned per call)
+DEFAULT_LIST_BUDGET = 2000
+
+# One-letter entry types of compact listings
+TYPE_CODES = {"file": "f", "dir": "d", "symlink": "l"}
+
+# Skipped by upload_dir / download_dir unless an explicit exclude list is given
+DEFAULT_EXCLUDES = (".git", "node_modules", "__pycache__", ".venv")
+
+
+def iter_files(sandbox_id: str, path: str = "/", depth: int = 1) -> Iterator[Dict]:
     """
-    List files in a directory.
+    Yield file info dictionaries for a directory listing one at a time.
 
     Args:
         sandbox_id: The sandbox ID
         path: Path to list
         depth: Depth to traverse
 
-    Returns:
-        List of file info dictionaries
+    Yields:
+        File info dictionaries
     """
-    sbx = Sandbox.connect(sandbox_id)
-    files = sbx.files.list(path, depth=depth)
-
-    result = []
-    for f in files:
-        result.append({
+    sbx = get_sandbox(sandbox_id)
+    for f in sbx.files.list(path, depth=depth):
+        yield {
             "name": f.name,
             "path": f.path,
             "type": f.type.value,
             "size": f.size,
             "permissions": f.permissions,
-        })
+        }
 
-    return result
+
+def list_files(sandbox_id: str, path: str = "/", depth: int = 1) -> List[Dict]:
+    """
+    List files in a directory.
+
+    Args:
+        sandbox_id: The sandbox ID
+        path: Path to list
+        depth: Depth to traverse
+
+    Returns:
+        List of file info dictionaries
+    """
+    return list(iter_files(sandbox_id, path, depth))
+
+
+def list_files_compact(
+    sandbox_id: str,
+    path: str = "/",
+    depth: int = 1,
+    max_entries: int = DEFAULT_LIST_BUDGET,
+    cursor: Optional[str] = None,
+    permissions: bool = False,
+) -> Dict:
+    """
+    List files as columns instead of one dictionary per entry.
+
+    Entries are sorted by path. Each entry's directory, relative to path, is
+    stored once in "dirs" and referenced by index ("" is path itself); names,
+    sizes and (if requested) permissions are parallel arrays, and types are
+    one letter per entry in a string ("f" file, "d" dir, "l" symlink). At
+    most max_entries are returned; when more remain, pass next_cursor back
+    as cursor to continue after the last one.
+
+    Args:
+        sandbox_id: The sandbox ID
+        path: Path to list
+        depth: Depth to traverse
+        max_entries: Maximum entries returned (0 for no limit)
+        cursor: next_cursor of the previous page
+        permissions: Include a permissions column
+
+    Returns:
+        Dictionary with dirs, the dir/name/type/size columns, the number of
+        entries returned and in total, and next_cursor (None when done)
+    """
+    sbx = get_sandbox(sandbox_id)
+    entries = sorted(sbx.files.list(path, depth=depth), key=lambda f: f.path)
+
+    start = 0
+    if cursor is not None:
+        start = bisect.bisect_right(entries, cursor, key=lambda f: f.path)
+    end = len(entries) if max_entries <= 0 else min(len(entries), start + max_entries)
+    page = entries[start:end]
+
+    root = path.rstrip("/") or "/"
+    dirs: Dict[str, int] = {}
+    dir_column, types = [], []
+    for f in page:
+        parent = posixpath.relpath(posixpath.dirname(f.path), root)
+        dir_column.append(dirs.setdefault("" if parent == "." else parent, len(dirs)))
+        types.append(TYPE_CODES.get(f.type.value, "?"))
+
+    listing = {
+        "path": path,
+        "dirs": list(dirs),
+        "dir": dir_column,
+        "name": [f.name for f in page],
+        "type": "".join(types),
+        "size": [f.size for f in page],
+    }
+    if permissions:
+        listing["permissions"] = [f.permissions for f in page]
+    listing["count"] = len(page)
+    listing["total"] = len(entries)
+    listing["next_cursor"] = page[-1].path if end < len(entries) else None
+    return listing
+
+
+def expand_compact(listing: Dict) -> List[Dict]:
+    """
+    Turn a compact listing back into file info dictionaries.
+
+    Args:
+        listing: Result of list_files_compact
+
+    Returns:
+        List of file info dictionaries (permissions only if listed)
+    """
+    names = {code: name for name, code in TYPE_CODES.items()}
+    root = listing["path"].rstrip("/") or "/"
+    rows = []
+    for i, name in enumerate(listing["name"]):
+        parent = posixpath.join(root, listing["dirs"][listing["dir"][i]]).rstrip("/")
+        row = {
+            "name": name,
+            "path": f"{parent}/{name}",
+            "type": names.get(listing["type"][i], "unknown"),
+            "size": listing["size"][i],
+        }
+        if "permissions" in listing:
+            row["permissions"] = listing["permissions"][i]
+        rows.append(row)
+    return rows
 
 
 def read_file(sandbox_id: str, path: str) -> str:
@@ -46,11 +184,310 @@ def read_file(sandbox_id: str, path: str) -> str:
     Returns:
         File content as string
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     content = sbx.files.read(path)
     return content
 
 
+def _run_read(sandbox_id: str, script: str) -> tuple[str, str]:
+    """Run a sandbox-side read script whose first output line is a count."""
+    sbx = get_sandbox(sandbox_id)
+    try:
+        result = sbx.commands.run(script)
+    except CommandExitException as e:
+        raise RuntimeError(e.stderr.strip() or str(e)) from e
+
+    count, _, content = result.stdout.partition("\n")
+    return count.strip(), content
+
+
+# Runs sandbox-side with python3: cuts a byte window of a file at UTF-8
+# character boundaries (leading continuation bytes are skipped, a character
+# straddling the end is left for the next window) and prints
+# "<total> <start> <end>" followed by the raw window
+_READ_BYTES_SCRIPT = r'''
+import os, sys
+
+path, start, count = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+try:
+    with open(path, "rb") as f:
+        total = os.fstat(f.fileno()).st_size
+        f.seek(start)
+        data = f.read(count + 4)
+except OSError as e:
+    sys.exit(f"{path}: {e.strerror}")
+
+def continuation(i):
+    return i < len(data) and data[i] & 0xC0 == 0x80
+
+lead = 0
+while lead < 3 and continuation(lead):
+    lead += 1
+end = min(max(count, lead), len(data))
+cut = end
+while cut > lead and end - cut < 3 and continuation(cut):
+    cut -= 1
+if cut == lead and end > lead:
+    # The window is smaller than one character: return the whole character
+    while end - count < 3 and continuation(end):
+        end += 1
+else:
+    end = cut
+
+sys.stdout.write(f"{total} {start + lead} {start + end}\n")
+sys.stdout.flush()
+sys.stdout.buffer.write(data[lead:end])
+'''
+
+
+def read_file_range(
+    sandbox_id: str,
+    path: str,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    max_bytes: int = DEFAULT_READ_BUDGET,
+) -> Dict:
+    """
+    Read a window of a file without transferring the rest of it.
+
+    The window is cut sandbox-side (at UTF-8 character boundaries for bytes,
+    with sed for lines), so only the requested bytes cross the wire. A byte
+    window starting inside a character begins at the next one (see offset in
+    the result), and a character straddling its end is left for next_offset,
+    so paged windows concatenate to the exact file. At most max_bytes of content are
+    returned; when more remains, the result carries a continuation cursor
+    (next_offset for byte windows, next_start_line for line windows). A
+    single line longer than max_bytes is cut and flagged line_truncated;
+    use byte windows to page through it.
+
+    Args:
+        sandbox_id: The sandbox ID
+        path: Path to the file
+        offset: Byte offset to start at (byte mode, default 0)
+        length: Number of bytes to read (byte mode, default: to end of file)
+        start_line: First line to read, 1-based (line mode)
+        end_line: Last line to read, inclusive (line mode, default: end of file)
+        max_bytes: Maximum bytes of content to return
+
+    Returns:
+        Dictionary with content, window bounds, file totals and eof flag
+    """
+    quoted = shlex.quote(path)
+
+    if start_line is not None or end_line is not None:
+        first = max(1, start_line or 1)
+        last = "$" if end_line is None else str(end_line)
+        if end_line is not None and end_line < first:
+            raise ValueError("end_line must be >= start_line")
+
+        total, content = _run_read(
+            sandbox_id,
+            f"awk 'END {{ print NR }}' {quoted} && "
+            f"sed -n '{first},{last}p' {quoted} | head -c {max_bytes + 1}",
+        )
+        total_lines = int(total)
+        window_last = total_lines if end_line is None else min(end_line, total_lines)
+
+        truncated = len(content.encode()) > max_bytes
+        line_truncated = False
+        if truncated:
+            content = content.encode()[:max_bytes].decode(errors="ignore")
+            if "\n" in content:
+                # Only return whole lines; the cursor resumes at the next one
+                content = content[: content.rindex("\n") + 1]
+            else:
+                # A single line longer than the budget: return its head
+                line_truncated = True
+
+        lines_returned = content.count("\n") or (1 if content else 0)
+        returned_last = first + lines_returned - 1
+        if not truncated:
+            returned_last = window_last
+
+        result = {
+            "path": path,
+            "content": content,
+            "start_line": first,
+            "end_line": returned_last,
+            "total_lines": total_lines,
+            "next_start_line": returned_last + 1 if returned_last < window_last else None,
+            "eof": returned_last >= total_lines,
+        }
+        if line_truncated:
+            result["line_truncated"] = True
+        return result
+
+    start = max(0, offset or 0)
+    count = max_bytes if length is None else min(length, max_bytes)
+
+    # Without python3 the window is cut at exact bytes (edges may be U+FFFD)
+    header, content = _run_read(
+        sandbox_id,
+        f"if command -v python3 >/dev/null; then "
+        f"python3 -c {shlex.quote(_READ_BYTES_SCRIPT)} {quoted} {start} {count}; "
+        f"else total=$(stat -c %s {quoted}) && "
+        f"echo \"$total {start} $(( {start + count} < total ? {start + count} : total ))\" && "
+        f"tail -c +{start + 1} {quoted} | head -c {count}; fi",
+    )
+    total, window_start, next_offset = (int(n) for n in header.split())
+    total_bytes = total
+    window_end = total_bytes if length is None else min(start + length, total_bytes)
+    next_offset = min(next_offset, total_bytes)
+
+    return {
+        "path": path,
+        "content": content,
+        "offset": window_start,
+        "bytes": max(0, next_offset - window_start),
+        "total_bytes": total_bytes,
+        "next_offset": next_offset if next_offset < window_end else None,
+        "eof": next_offset >= total_bytes,
+    }
+
+
+def _search_command(
+    engine: str,
+    pattern: str,
+    path: str,
+    globs: List[str],
+    ignore_case: bool,
+    fixed_strings: bool,
+    context: int,
+    no_ignore: bool,
+) -> str:
+    """Build the rg or grep invocation for search_files."""
+    q = shlex.quote
+    if engine == "rg":
+        args = ["rg", "--null", "--line-number", "--with-filename", "--no-heading",
+                "--color", "never", "--no-messages"]
+        if no_ignore:
+            args += ["--hidden", "--no-ignore"]
+        else:
+            args += [f"--glob={q('!' + d)}" for d in DEFAULT_EXCLUDES]
+        args += [f"--glob={q(g)}" for g in globs]
+    else:
+        args = ["grep", "-rnsHZ"] + (["-F"] if fixed_strings else ["-E"])
+        if not no_ignore:
+            args += [f"--exclude-dir={q(d)}" for d in DEFAULT_EXCLUDES]
+        for g in globs:
+            if g.startswith("!"):
+                args += [f"--exclude={q(g[1:])}", f"--exclude-dir={q(g[1:])}"]
+            else:
+                args.append(f"--include={q(g)}")
+
+    if engine == "rg" and fixed_strings:
+        args.append("-F")
+    if ignore_case:
+        args.append("-i")
+    if context:
+        args += ["-C", str(context)]
+    return " ".join(args + ["-e", q(pattern), "--", q(path)])
+
+
+def search_files(
+    sandbox_id: str,
+    pattern: str,
+    path: str = "/home/user",
+    globs: Optional[List[str]] = None,
+    ignore_case: bool = False,
+    fixed_strings: bool = False,
+    context: int = 0,
+    max_matches: int = 100,
+    max_line_chars: int = 300,
+    no_ignore: bool = False,
+) -> Dict:
+    """
+    Search file contents with a regex, inside the sandbox.
+
+    Uses ripgrep when the sandbox has it and falls back to ``grep -rE``. The
+    output is capped sandbox-side, so at most roughly max_matches lines (plus
+    context) cross the wire.
+
+    Args:
+        sandbox_id: The sandbox ID
+        pattern: Regular expression (or literal text with fixed_strings)
+        path: File or directory to search (default /home/user)
+        globs: File name globs to include, or exclude with a leading "!"
+            (e.g. ["*.py", "!*_test.py"])
+        ignore_case: Case-insensitive search
+        fixed_strings: Treat pattern as literal text
+        context: Lines of context before and after each match
+        max_matches: Stop after this many matching lines
+        max_line_chars: Truncate each result line's text to this length
+        no_ignore: Also search DEFAULT_EXCLUDES directories (and, with
+            ripgrep, hidden and .gitignore'd files)
+
+    Returns:
+        Dictionary with the engine used, match count, a truncated flag and
+        "results": newline-separated ``path:line:text`` lines (context lines
+        use ``path-line-text``, groups are separated by ``--``)
+    """
+    # Enough lines for every match with its context and a group separator
+    line_budget = (max_matches + 1) * (2 * context + 2)
+    args = (pattern, path, globs or [], ignore_case, fixed_strings, context, no_ignore)
+    q_path = shlex.quote(path)
+
+    script = f"""
+[ -e {q_path} ] || {{ echo "No such file or directory: "{q_path} >&2; exit 2; }}
+out=$(mktemp)
+if command -v rg >/dev/null 2>&1; then
+  echo rg
+  {_search_command("rg", *args)} | cut -c1-4096 | head -n {line_budget} > "$out"
+else
+  echo grep
+  {_search_command("grep", *args)} | cut -c1-4096 | head -n {line_budget} > "$out"
+fi
+status=${{PIPESTATUS[0]}}
+cat "$out"
+# 1 is "no match" and 141 is head closing the pipe; errors only count
+# when they left no results at all
+if [ "$status" -ge 2 ] && [ "$status" -ne 141 ] && [ ! -s "$out" ]; then
+  rm -f "$out"; exit 2
+fi
+rm -f "$out"
+"""
+    engine, content = _run_read(sandbox_id, script)
+
+    lines, matches, truncated, last_match = [], 0, False, 0
+    raw_lines = content.splitlines()
+    for raw in raw_lines:
+        if raw == "--":
+            lines.append(raw)
+            continue
+        file_path, sep, rest = raw.partition("\0")
+        if not sep:
+            continue
+        number, marker, text = rest.partition(":")
+        if not marker or not number.isdigit():
+            number, marker, text = rest.partition("-")
+        if marker == ":":
+            if matches == max_matches:
+                # Keep the last match's trailing context, not the next one's lead-in
+                lines = lines[: last_match + context]
+                truncated = True
+                break
+            matches += 1
+        if len(text) > max_line_chars:
+            text = text[:max_line_chars] + "…"
+        lines.append(f"{file_path}{marker}{number}{marker}{text}")
+        if marker == ":":
+            last_match = len(lines)
+
+    while lines and lines[-1] == "--":
+        lines.pop()
+
+    return {
+        "pattern": pattern,
+        "path": path,
+        "engine": engine,
+        "matches": matches,
+        "truncated": truncated or len(raw_lines) >= line_budget,
+        "results": "\n".join(lines),
+    }
+
+
 def write_file(sandbox_id: str, path: str, content: str) -> Dict:
     """
     Write a file to the sandbox.
@@ -63,7 +500,7 @@ def write_file(sandbox_id: str, path: str, content: str) -> Dict:
     Returns:
         Write info dictionary
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     info = sbx.files.write(path, content)
 
     return {
@@ -71,6 +508,361 @@ def write_file(sandbox_id: str, path: str, content: str) -> Dict:
     }
 
 
+# Runs sandbox-side with python3: validates every edit before writing any
+# file, then replaces each changed file atomically (temp file + rename)
+_APPLY_EDITS_SCRIPT = r'''
+import json, os, sys, tempfile
+
+spec = json.load(open(sys.argv[1]))
+contents, results, ok = {}, [], True
+
+for index, edit in enumerate(spec["edits"]):
+    path = os.path.join(spec["cwd"], edit["path"])
+    result = {"index": index, "path": edit["path"]}
+    results.append(result)
+    old, new = edit.get("old", ""), edit.get("new", "")
+
+    if path not in contents:
+        try:
+            with open(path, encoding="utf-8", newline="") as f:
+                contents[path] = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            result.update(status="error", error=str(e))
+            ok = False
+            continue
+
+    content = contents[path]
+    count = content.count(old) if old else 0
+    if not old:
+        result.update(status="error", error="'old' must not be empty")
+    elif count == 0:
+        result["status"] = "not_found"
+    elif count > 1 and not edit.get("all"):
+        result.update(status="ambiguous", occurrences=count)
+    else:
+        result.update(
+            status="applied",
+            line=content[: content.index(old)].count("\n") + 1,
+            replacements=count if edit.get("all") else 1,
+        )
+        contents[path] = content.replace(old, new, -1 if edit.get("all") else 1)
+        continue
+    ok = False
+
+# Mirror diff mode: nothing is written unless every edit matched
+for result in results:
+    if result["status"] == "applied":
+        if not ok:
+            result["status"] = "not_applied"
+        elif spec["dry_run"]:
+            result["status"] = "ok"
+
+if ok and not spec["dry_run"]:
+    for path, content in contents.items():
+        mode = os.stat(path).st_mode & 0o7777
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".sbx-edit-")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+
+print(json.dumps({"success": ok, "edits": results}))
+'''
+
+
+def _patch_targets(patch: str) -> tuple[int, List[Dict]]:
+    """Detect the strip level and count the hunks per file of a unified diff."""
+    headers = [line.split("\t")[0][4:].strip() for line in patch.splitlines()
+               if line.startswith(("--- ", "+++ "))]
+    paths = [p for p in headers if p != "/dev/null"]
+    strip = 1 if paths and all(p.startswith(("a/", "b/")) for p in paths) else 0
+
+    files, old_path = [], None
+    for line in patch.splitlines():
+        if line.startswith("--- "):
+            old_path = line.split("\t")[0][4:].strip()
+        elif line.startswith("+++ ") and old_path is not None:
+            new_path = line.split("\t")[0][4:].strip()
+            path = new_path if new_path != "/dev/null" else old_path
+            files.append({"path": path.split("/", strip)[-1], "hunks": 0})
+            old_path = None
+        elif line.startswith("@@ ") and files:
+            files[-1]["hunks"] += 1
+    return strip, files
+
+
+def _hunk_report(files: List[Dict], output_text: str, tool: str) -> List[Dict]:
+    """Turn patch / git apply output into per-file, per-hunk statuses."""
+    by_path = {f["path"]: f for f in files}
+    for f in files:
+        f["status"] = "ok"
+        f["hunks"] = ["ok"] * f["hunks"]
+
+    current = files[0] if files else None
+    for line in output_text.splitlines():
+        line = line.strip()
+        for prefix in ("checking file ", "patching file ", "Checking patch "):
+            if line.startswith(prefix):
+                name = line[len(prefix):].rstrip(".").strip("'")
+                current = by_path.get(name, current)
+        if line.startswith("Hunk #") and current is not None:
+            number, _, rest = line[len("Hunk #"):].partition(" ")
+            if number.isdigit() and int(number) <= len(current["hunks"]):
+                failed = "FAILED" in rest
+                current["hunks"][int(number) - 1] = "failed" if failed else rest.rstrip(".")
+                if failed:
+                    current["status"] = "failed"
+        elif line.startswith("error:") and tool == "git" and "searching for" not in line:
+            target = next((f for f in files if f["path"] in line), current)
+            if target is not None:
+                target["status"] = "failed"
+                target.setdefault("errors", []).append(line[len("error:"):].strip())
+        elif "Reversed (or previously applied) patch detected" in line and current:
+            current["status"] = "already_applied"
+        elif line.startswith("can't find file to patch") and current:
+            current["status"] = "missing"
+    return files
+
+
+def apply_patch(
+    sandbox_id: str,
+    patch: Optional[str] = None,
+    edits: Optional[List[Dict]] = None,
+    cwd: str = "/home/user",
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Apply a unified diff or exact string replacements sandbox-side.
+
+    Only the diff or the replacement strings travel to the sandbox and only
+    statuses come back, never the file contents. Either everything applies
+    or nothing is written: diffs are checked with a dry run first, and edits
+    are all validated before any file is replaced.
+
+    Args:
+        sandbox_id: The sandbox ID
+        patch: Unified diff (e.g. from ``git diff`` or ``diff -u``); the
+            strip level (-p0 / -p1) is detected from the a/ b/ prefixes
+        edits: Replacements, each {"path", "old", "new"} plus optional
+            "all": true to replace every occurrence (otherwise "old" must
+            occur exactly once)
+        cwd: Directory relative paths are resolved against
+        dry_run: Only check whether everything would apply
+
+    Returns:
+        Dictionary with "success" plus per-file hunk statuses (diff) or
+        per-edit statuses with the line of each replacement (edits)
+    """
+    if (patch is None) == (edits is None):
+        raise ValueError("Pass exactly one of patch or edits")
+
+    sbx = get_sandbox(sandbox_id)
+    token = uuid.uuid4().hex
+    q_cwd = shlex.quote(cwd)
+
+    if edits is not None:
+        spec_path = f"/tmp/sbx-edits-{token}.json"
+        sbx.files.write(
+            spec_path, json.dumps({"edits": edits, "cwd": cwd, "dry_run": dry_run})
+        )
+        q_spec = shlex.quote(spec_path)
+        stdout = _run_script(
+            sbx,
+            f"python3 -c {shlex.quote(_APPLY_EDITS_SCRIPT)} {q_spec}; "
+            f"status=$?; rm -f {q_spec}; exit $status",
+        )
+        return {"mode": "edits", "dry_run": dry_run, **json.loads(stdout)}
+
+    strip, files = _patch_targets(patch)
+    patch_path = f"/tmp/sbx-patch-{token}.diff"
+    sbx.files.write(patch_path, patch)
+    q_patch = shlex.quote(patch_path)
+    apply = "false" if dry_run else "true"
+
+    script = f"""
+cd {q_cwd} || exit 2
+if command -v patch >/dev/null 2>&1; then
+  echo patch
+  patch -p{strip} --dry-run --batch --forward -i {q_patch} 2>&1; status=$?
+  if [ $status -eq 0 ] && {apply}; then
+    patch -p{strip} --batch --forward --silent -i {q_patch} >/dev/null 2>&1 || status=3
+  fi
+else
+  echo git
+  git apply -p{strip} --check --verbose {q_patch} 2>&1; status=$?
+  if [ $status -eq 0 ] && {apply}; then
+    git apply -p{strip} {q_patch} 2>&1 || status=3
+  fi
+fi
+rm -f {q_patch}
+echo "__status=$status"
+"""
+    tool, output_text = _run_read(sandbox_id, script)
+    output_text, _, status = output_text.rpartition("__status=")
+    success = status.strip() == "0"
+
+    files = _hunk_report(files, output_text, tool)
+    for f in files:
+        if f["status"] == "ok":
+            # Nothing is written unless every file applies
+            f["status"] = "not_applied" if not success else "ok" if dry_run else "applied"
+
+    result = {
+        "mode": "patch",
+        "dry_run": dry_run,
+        "success": success,
+        "tool": tool,
+        "files": files,
+    }
+    if not success:
+        result["output"] = output_text.strip()[-2000:]
+    return result
+
+
+# Default number of files hashed per file_checksums call
+DEFAULT_HASH_BUDGET = 10_000
+
+# Hash algorithms file_checksums accepts
+HASH_ALGORITHMS = ("sha256", "sha1", "md5", "blake2b")
+
+# Runs sandbox-side with python3: hashes files and walks directories with
+# the same include/exclude matching as upload_dir / download_dir
+_CHECKSUMS_SCRIPT = r'''
+import fnmatch, hashlib, json, os, sys, time
+
+spec = json.load(open(sys.argv[1]))
+include, exclude = spec["include"], spec["exclude"]
+files, missing, errors = {}, [], {}
+hashed_bytes, truncated, start = 0, False, time.monotonic()
+
+def matches(rel, patterns):
+    parts = rel.split("/")
+    return any(
+        fnmatch.fnmatch(rel, p) or any(fnmatch.fnmatch(part, p) for part in parts)
+        for p in patterns
+    )
+
+def selected(rel):
+    if matches(rel, exclude):
+        return False
+    name = rel.rsplit("/", 1)[-1]
+    return not include or any(
+        fnmatch.fnmatch(rel, p) or fnmatch.fnmatch(name, p) for p in include
+    )
+
+def add(path):
+    global hashed_bytes, truncated
+    if len(files) + len(errors) >= spec["max_files"]:
+        truncated = True
+        return
+    digest = hashlib.new(spec["algorithm"])
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+            st = os.fstat(f.fileno())
+    except OSError as e:
+        errors[path] = e.strerror or str(e)
+        return
+    hashed_bytes += st.st_size
+    if spec["stat"]:
+        files[path] = {"hash": digest.hexdigest(), "size": st.st_size, "mtime": round(st.st_mtime, 3)}
+    else:
+        files[path] = digest.hexdigest()
+
+for root in spec["paths"]:
+    if os.path.isfile(root):
+        add(root)
+    elif os.path.isdir(root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root)
+            prefix = "" if rel_dir == "." else rel_dir + "/"
+            dirnames[:] = sorted(d for d in dirnames if not matches(prefix + d, exclude))
+            for name in sorted(filenames):
+                if selected(prefix + name):
+                    add(os.path.join(dirpath, name))
+                if truncated:
+                    break
+            if truncated:
+                break
+    else:
+        missing.append(root)
+    if truncated:
+        break
+
+print(json.dumps({
+    "files": files,
+    "missing": missing,
+    "errors": errors,
+    "bytes": hashed_bytes,
+    "truncated": truncated,
+    "duration": round(time.monotonic() - start, 3),
+}))
+'''
+
+
+def file_checksums(
+    sandbox_id: str,
+    paths: List[str],
+    algorithm: str = "sha256",
+    stat: bool = False,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    max_files: int = DEFAULT_HASH_BUDGET,
+) -> Dict:
+    """
+    Hash files sandbox-side in one pass, so callers can tell what changed.
+
+    Files are hashed where they are; only the digests cross the wire.
+    Directories are walked recursively with upload_dir's include/exclude
+    matching. Compare the digests with earlier ones (or local files) and
+    only transfer the files that differ.
+
+    Args:
+        sandbox_id: The sandbox ID
+        paths: Files and/or directories (relative paths resolve against
+            /home/user)
+        algorithm: One of HASH_ALGORITHMS
+        stat: Also report size and mtime per file
+        include: Inside directories, only hash files whose relative path or
+            name matches one of these globs (default: everything; files
+            given directly are always hashed)
+        exclude: Skip files and directories matching these globs (default:
+            DEFAULT_EXCLUDES; pass [] to hash everything)
+        max_files: Stop after this many files (the result is then truncated)
+
+    Returns:
+        Dictionary with "files" mapping each path to its hex digest (or to
+        {hash, size, mtime} with stat), plus missing paths, per-file errors,
+        the file count, bytes hashed, duration and a truncated flag
+    """
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(
+            f"Unsupported algorithm {algorithm!r} (use one of {', '.join(HASH_ALGORITHMS)})"
+        )
+
+    sbx = get_sandbox(sandbox_id)
+    spec_path = f"/tmp/sbx-hash-{uuid.uuid4().hex}.json"
+    spec = {
+        "paths": [posixpath.join("/home/user", p) for p in paths],
+        "algorithm": algorithm,
+        "stat": stat,
+        "include": include or [],
+        "exclude": list(DEFAULT_EXCLUDES) if exclude is None else exclude,
+        "max_files": max_files,
+    }
+    sbx.files.write(spec_path, json.dumps(spec))
+    q_spec = shlex.quote(spec_path)
+    stdout = _run_script(
+        sbx,
+        f"python3 -c {shlex.quote(_CHECKSUMS_SCRIPT)} {q_spec}; "
+        f"status=$?; rm -f {q_spec}; exit $status",
+        timeout=None,
+    )
+    result = json.loads(stdout)
+    return {"algorithm": algorithm, "count": len(result["files"]), **result}
+
+
 def file_exists(sandbox_id: str, path: str) -> bool:
     """
     Check if a file or directory exists.
@@ -82,7 +874,7 @@ def file_exists(sandbox_id: str, path: str) -> bool:
     Returns:
         True if exists, False otherwise
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     exists = sbx.files.exists(path)
     return exists
 
@@ -98,7 +890,7 @@ def get_file_info(sandbox_id: str, path: str) -> Dict:
     Returns:
         File info dictionary
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     info = sbx.files.get_info(path)
 
     return {
@@ -118,7 +910,7 @@ def remove_file(sandbox_id: str, path: str) -> None:
         sandbox_id: The sandbox ID
         path: Path to remove
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     sbx.files.remove(path)
 
 
@@ -133,7 +925,7 @@ def make_directory(sandbox_id: str, path: str) -> bool:
     Returns:
         True if created, False if already exists
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     created = sbx.files.make_dir(path)
     return created
 
@@ -150,7 +942,7 @@ def rename_file(sandbox_id: str, old_path: str, new_path: str) -> Dict:
     Returns:
         Info about renamed file
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     info = sbx.files.rename(old_path, new_path)
 
     return {
@@ -171,7 +963,7 @@ def read_file_bytes(sandbox_id: str, path: str) -> bytearray:
     Returns:
         File content as bytearray
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     content = sbx.files.read(path, format="bytes")
     return content
 
@@ -188,9 +980,317 @@ def write_file_bytes(sandbox_id: str, path: str, data: bytes) -> Dict:
     Returns:
         Write info dictionary
     """
-    sbx = Sandbox.connect(sandbox_id)
+    sbx = get_sandbox(sandbox_id)
     info = sbx.files.write(path, data)
 
     return {
         "path": info.path,
     }
+
+
+def read_files(
+    sandbox_id: str,
+    paths: List[str],
+    max_workers: int = DEFAULT_TRANSFER_WORKERS,
+) -> List[Dict]:
+    """
+    Read many files concurrently over one sandbox connection.
+
+    A failure on one file does not abort the others.
+
+    Args:
+        sandbox_id: The sandbox ID
+        paths: Paths of the files to read
+        max_workers: Maximum number of concurrent reads
+
+    Returns:
+        One dictionary per path, in input order, with "content" on success
+        or "error" on failure
+    """
+    sbx = get_sandbox(sandbox_id)
+
+    def read_one(path: str) -> Dict:
+        try:
+            return {"path": path, "success": True, "content": sbx.files.read(path)}
+        except Exception as e:
+            return {"path": path, "success": False, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return list(pool.map(read_one, paths))
+
+
+def write_files(
+    sandbox_id: str,
+    files: List[Dict],
+    max_workers: int = DEFAULT_TRANSFER_WORKERS,
+) -> List[Dict]:
+    """
+    Write many files over one sandbox connection.
+
+    Uses the SDK's multi-file write (a single request) when available. If
+    that is missing or the sandbox rejects the combined request, falls back
+    to concurrent per-file writes so each file gets its own status and one
+    bad path does not abort the rest. A sandbox that is gone or unreachable
+    raises instead.
+
+    Args:
+        sandbox_id: The sandbox ID
+        files: File specs, each {"path": str, "content": str}
+        max_workers: Maximum number of concurrent per-file writes
+
+    Returns:
+        One dictionary per file, in input order, with "success" and either
+        the written "path" or an "error"
+    """
+    sbx = get_sandbox(sandbox_id)
+
+    if hasattr(sbx.files, "write_files"):
+        try:
+            sbx.files.write_files(
+                [{"path": f["path"], "data": f["content"]} for f in files]
+            )
+            return [{"path": f["path"], "success": True} for f in files]
+        except (SandboxNotFoundException, SandboxUnreachableException):
+            # Per-file writes would fail the same way, once per file
+            raise
+        except SandboxException as e:
+            logger.warning(f"Bulk write to {sandbox_id} failed, writing per file: {e}")
+
+    def write_one(f: Dict) -> Dict:
+        try:
+            info = sbx.files.write(f["path"], f["content"])
+            return {"path": info.path, "success": True}
+        except Exception as e:
+            return {"path": f["path"], "success": False, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return list(pool.map(write_one, files))
+
+
+def _matches(rel_path: str, patterns: List[str]) -> bool:
+    """True if a relative path, its basename or any directory component matches."""
+    parts = rel_path.split("/")
+    return any(
+        fnmatch.fnmatch(rel_path, pattern)
+        or any(fnmatch.fnmatch(part, pattern) for part in parts)
+        for pattern in patterns
+    )
+
+
+def _selected(
+    rel_path: str, include: Optional[List[str]], exclude: List[str]
+) -> bool:
+    """Apply include/exclude globs to a relative POSIX path."""
+    if _matches(rel_path, exclude):
+        return False
+    if not include:
+        return True
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in include
+    )
+
+
+def _transfer_stats(files: int, size: int, archive: int, start: float) -> Dict:
+    duration = time.monotonic() - start
+    return {
+        "files": files,
+        "bytes": size,
+        "archive_bytes": archive,
+        "duration": round(duration, 3),
+        "throughput_mb_s": round(size / duration / 1_000_000, 2) if duration else None,
+    }
+
+
+def _run_script(sbx, script: str, timeout: Optional[float] = 60) -> str:
+    """Run a sandbox-side shell script, raising RuntimeError with its stderr."""
+    try:
+        return sbx.commands.run(script, timeout=timeout).stdout
+    except CommandExitException as e:
+        raise RuntimeError(e.stderr.strip() or str(e)) from e
+
+
+def upload_dir(
+    sandbox_id: str,
+    local_dir: str,
+    remote_dir: str,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Upload a local directory as one compressed tar archive.
+
+    The archive is built locally (spooled to disk past 64 MiB), written to
+    the sandbox in a single request and extracted there, so the round trips
+    do not grow with the number of files. Symlinks to files are uploaded as
+    symlinks; symlinks to directories are not followed and are reported in
+    "skipped".
+
+    Args:
+        sandbox_id: The sandbox ID
+        local_dir: Local directory to upload
+        remote_dir: Destination directory in the sandbox (created if missing)
+        include: Only upload files whose relative path or name matches one
+            of these globs (default: everything)
+        exclude: Skip files and directories matching these globs (default:
+            DEFAULT_EXCLUDES; pass [] to upload everything)
+
+    Returns:
+        Dictionary with file count, raw and archive bytes, duration,
+        throughput (raw MB/s) and the skipped entries with their reason
+    """
+    start = time.monotonic()
+    root = Path(local_dir)
+    if not root.is_dir():
+        raise NotADirectoryError(f"Local directory not found: {local_dir}")
+    exclude = list(DEFAULT_EXCLUDES) if exclude is None else exclude
+
+    count = size = 0
+    skipped = []
+    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as archive:
+        with tarfile.open(fileobj=archive, mode="w:gz", compresslevel=1) as tar:
+            for dirpath, dirnames, filenames in os.walk(root):
+                rel_dir = Path(dirpath).relative_to(root).as_posix()
+                prefix = "" if rel_dir == "." else rel_dir + "/"
+                # Prune excluded directories instead of walking into them
+                dirnames[:] = [d for d in dirnames if not _matches(prefix + d, exclude)]
+                # os.walk does not follow directory symlinks (they could loop)
+                for name in [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+                    if _selected(prefix + name, include, exclude):
+                        skipped.append(
+                            {"path": prefix + name, "reason": "symlink to a directory"}
+                        )
+
+                for name in filenames:
+                    rel_path = prefix + name
+                    if not _selected(rel_path, include, exclude):
+                        continue
+                    full_path = os.path.join(dirpath, name)
+                    tar.add(full_path, arcname=rel_path, recursive=False)
+                    count += 1
+                    size += os.lstat(full_path).st_size
+
+        archive_size = archive.tell()
+        archive.seek(0)
+
+        sbx = get_sandbox(sandbox_id)
+        remote_archive = f"/tmp/sbx-upload-{uuid.uuid4().hex}.tar.gz"
+        sbx.files.write(remote_archive, archive)
+
+    q_dir, q_archive = shlex.quote(remote_dir), shlex.quote(remote_archive)
+    _run_script(
+        sbx,
+        f"mkdir -p {q_dir} && tar -xzf {q_archive} -C {q_dir}; "
+        f"status=$?; rm -f {q_archive}; exit $status",
+        timeout=None,
+    )
+
+    return {
+        "local_dir": local_dir,
+        "remote_dir": remote_dir,
+        **_transfer_stats(count, size, archive_size, start),
+        "skipped": skipped,
+    }
+
+
+def download_dir(
+    sandbox_id: str,
+    remote_dir: str,
+    local_dir: str,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Download a sandbox directory as one compressed tar archive.
+
+    Lists the directory sandbox-side (pruning excluded directories), archives
+    the selected files there, and streams the archive down in one read.
+    Entries that would be unsafe to extract (absolute symlinks, links that
+    escape local_dir, etc.) are left out and reported in "skipped".
+
+    Args:
+        sandbox_id: The sandbox ID
+        remote_dir: Directory in the sandbox to download
+        local_dir: Local destination directory (created if missing)
+        include: Only download files whose relative path or name matches one
+            of these globs (default: everything)
+        exclude: Skip files and directories matching these globs (default:
+            DEFAULT_EXCLUDES; pass [] to download everything)
+
+    Returns:
+        Dictionary with file count, raw and archive bytes, duration,
+        throughput (raw MB/s) and the skipped entries with their reason
+    """
+    start = time.monotonic()
+    exclude = list(DEFAULT_EXCLUDES) if exclude is None else exclude
+    sbx = get_sandbox(sandbox_id)
+    q_dir = shlex.quote(remote_dir)
+
+    # Directory-name excludes are pruned by find itself; everything else is
+    # filtered here so both directions share the same glob semantics
+    prune = " -o ".join(f"-name {shlex.quote(p)}" for p in exclude if "/" not in p)
+    prune_expr = f"\\( {prune} \\) -prune -o " if prune else ""
+    listing = _run_script(
+        sbx,
+        f"cd {q_dir} && find . {prune_expr}\\( -type f -o -type l \\) "
+        f"-printf '%s %P\\n'",
+        timeout=None,
+    )
+
+    selected, size = [], 0
+    for line in listing.splitlines():
+        file_size, _, rel_path = line.partition(" ")
+        if rel_path and _selected(rel_path, include, exclude):
+            selected.append(rel_path)
+            size += int(file_size)
+
+    Path(local_dir).mkdir(parents=True, exist_ok=True)
+    if not selected:
+        return {
+            "remote_dir": remote_dir,
+            "local_dir": local_dir,
+            **_transfer_stats(0, 0, 0, start),
+            "skipped": [],
+        }
+
+    skipped = []
+
+    def skip_unsafe(member: tarfile.TarInfo, dest: str) -> Optional[tarfile.TarInfo]:
+        # "data" refuses absolute paths, links escaping local_dir, etc.;
+        # skip those members instead of aborting the whole extraction
+        try:
+            return tarfile.data_filter(member, dest)
+        except tarfile.FilterError as e:
+            skipped.append({"path": member.name, "reason": str(e)})
+            return None
+
+    token = uuid.uuid4().hex
+    remote_list = f"/tmp/sbx-download-{token}.list"
+    remote_archive = f"/tmp/sbx-download-{token}.tar.gz"
+    q_list, q_archive = shlex.quote(remote_list), shlex.quote(remote_archive)
+    sbx.files.write(remote_list, "\0".join(selected) + "\0")
+
+    try:
+        _run_script(
+            sbx,
+            f"tar -czf {q_archive} -C {q_dir} --null -T {q_list}",
+            timeout=None,
+        )
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as archive:
+            for chunk in sbx.files.read(remote_archive, format="stream"):
+                archive.write(chunk)
+            archive_size = archive.tell()
+            archive.seek(0)
+
+            with tarfile.open(fileobj=archive, mode="r:gz") as tar:
+                tar.extractall(local_dir, filter=skip_unsafe)
+    finally:
+        _run_script(sbx, f"rm -f {q_list} {q_archive}")
+
+    return {
+        "remote_dir": remote_dir,
+        "local_dir": local_dir,
+        **_transfer_stats(len(selected) - len(skipped), size, archive_size, start),
+        "skipped": skipped,
+    }
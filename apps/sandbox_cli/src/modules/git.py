@@ -0,0 +1,167 @@
+"""
+Git operations module for sandbox repositories.
+Provides fast clone helpers.
+"""
+
+import re
+import shlex
+import time
+from typing import Callable, Dict, List, Optional
+
+from e2b import CommandExitException
+
+from .commands import run_command
+
+# Where repositories are cloned unless told otherwise (as in the fork agent prompts)
+DEFAULT_REPO_DIR = "/home/user/repo"
+
+# Bare mirrors baked into a template live at <MIRROR_ROOT>/<host>/<owner>/<repo>.git
+MIRROR_ROOT = "/home/user/.git-mirrors"
+
+# Partial clone filter used by default: commits and trees now, blobs on demand
+DEFAULT_FILTER = "blob:none"
+
+
+def mirror_path(repo_url: str) -> Optional[str]:
+    """
+    Path of the template mirror for a repository URL.
+
+    https://github.com/disler/repo.git, git@github.com:disler/repo.git and
+    ssh://git@github.com/disler/repo all map to
+    <MIRROR_ROOT>/github.com/disler/repo.git.
+
+    Args:
+        repo_url: Repository URL (https, ssh or scp-like)
+
+    Returns:
+        Absolute path of the bare mirror, or None for URLs without a host
+    """
+    match = re.match(
+        r"^(?:[\w.+-]+://)?(?:[^@/]+@)?([^/:]+)(?::\d+)?[:/](.+?)(?:\.git)?/?$",
+        repo_url.strip(),
+    )
+    if match is None:
+        return None
+    host, repo = match.groups()
+    return f"{MIRROR_ROOT}/{host}/{repo}.git"
+
+
+def clone_repo(
+    sandbox_id: str,
+    repo_url: str,
+    path: str = DEFAULT_REPO_DIR,
+    branch: Optional[str] = None,
+    depth: int = 0,
+    filter: Optional[str] = DEFAULT_FILTER,
+    sparse: Optional[List[str]] = None,
+    reference: Optional[str] = None,
+    use_mirror: bool = True,
+    timeout: Optional[float] = 600,
+    on_start: Optional[Callable[[int], None]] = None,
+) -> Dict:
+    """
+    Clone a repository into the sandbox, fetching as little as possible.
+
+    By default this is a partial clone (filter blob:none): the full commit
+    history arrives, file contents only for the checked-out tree, so log,
+    branch and push keep working. A bare mirror baked into the template
+    (see mirror_path) or given as reference is used as a local object store,
+    so only objects newer than the mirror are fetched; depth and filter are
+    not needed then. With sparse paths only those directories are checked
+    out.
+
+    If branch does not exist on the remote, the default branch is cloned and
+    branch is created from it.
+
+    Args:
+        sandbox_id: The sandbox ID
+        repo_url: Repository URL
+        path: Destination directory (must not exist or be empty)
+        branch: Branch to check out (created if the remote lacks it)
+        depth: Fetch only this many commits per branch (0 for full history)
+        filter: Partial clone filter (None for a full clone)
+        sparse: Directories to check out (sparse checkout, cone mode)
+        reference: Bare repository to borrow objects from (default: the
+            template mirror, if there is one)
+        use_mirror: Look for a template mirror when no reference is given
+        timeout: Clone timeout in seconds (None for unlimited)
+        on_start: Called with the PID once the clone started
+
+    Returns:
+        Dictionary with the checked-out branch and commit, the mirror used,
+        whether the branch was created, bytes of objects fetched and duration
+    """
+    start = time.monotonic()
+    if reference is None and use_mirror:
+        reference = mirror_path(repo_url)
+
+    # Only needed when there is no mirror to take the objects from
+    fetch_args = []
+    if depth > 0:
+        fetch_args.append(f"--depth {depth} --no-single-branch")
+    if filter:
+        fetch_args.append(f"--filter={shlex.quote(filter)}")
+
+    q_url, q_path = shlex.quote(repo_url), shlex.quote(path)
+    q_branch = shlex.quote(branch or "")
+    q_sparse = " ".join(shlex.quote(p) for p in sparse or [])
+    sparse_flag = "1" if sparse else ""
+
+    script = f"""
+set -e
+ref={shlex.quote(reference or "")}
+mirror=""
+args=()
+if [ -n "$ref" ] && git --git-dir="$ref" rev-parse --is-bare-repository >/dev/null 2>&1; then
+  mirror="$ref"
+  args+=(--reference "$mirror")
+else
+  args+=({" ".join(fetch_args)})
+fi
+[ -z "{sparse_flag}" ] || args+=(--sparse)
+
+branch_created=0
+if [ -n {q_branch} ]; then
+  if git ls-remote --exit-code --heads {q_url} {q_branch} >/dev/null 2>&1; then
+    args+=(--branch {q_branch})
+  else
+    branch_created=1
+  fi
+fi
+
+mkdir -p "$(dirname {q_path})"
+git clone --quiet "${{args[@]}}" {q_url} {q_path}
+cd {q_path}
+[ -z "{sparse_flag}" ] || git sparse-checkout set -- {q_sparse}
+[ "$branch_created" = 0 ] || git checkout --quiet -b {q_branch}
+
+echo "mirror=$mirror"
+echo "branch_created=$branch_created"
+echo "branch=$(git rev-parse --abbrev-ref HEAD)"
+echo "commit=$(git rev-parse HEAD)"
+echo "shallow=$(git rev-parse --is-shallow-repository)"
+echo "bytes=$(du -sb .git/objects | cut -f1)"
+"""
+    try:
+        result = run_command(sandbox_id, script, timeout=timeout, on_start=on_start)
+    except CommandExitException as e:
+        raise RuntimeError(e.stderr.strip() or str(e)) from e
+
+    info = dict(
+        line.split("=", 1) for line in result["stdout"].splitlines() if "=" in line
+    )
+    mirror = info.get("mirror") or None
+    return {
+        "repo_url": repo_url,
+        "path": path,
+        "branch": info.get("branch"),
+        "commit": info.get("commit"),
+        "branch_created": info.get("branch_created") == "1",
+        "mirror": mirror,
+        "depth": depth if depth > 0 and mirror is None else None,
+        "filter": filter if mirror is None else None,
+        "sparse": sparse or None,
+        "shallow": info.get("shallow") == "true",
+        "bytes_fetched": int(info.get("bytes") or 0),
+        "duration": round(time.monotonic() - start, 3),
+    }
@@ -3,14 +3,20 @@ Sandbox connection and management module.
 Provides helper functions for sandbox lifecycle operations.
 """
 
-from typing import Optional, Dict
-from e2b import Sandbox
+from typing import Optional, Dict, List
+from e2b import Sandbox, SandboxQuery, SandboxState
+
+from . import connections
 
 
 def get_sandbox(sandbox_id: str, timeout: Optional[int] = None) -> Sandbox:
     """
     Connect to an existing sandbox by ID.
 
+    Reuses a cached connection when the connection cache is enabled (see
+    connections.py). Passing a timeout always reconnects, since connecting
+    is what updates the sandbox timeout.
+
     Args:
         sandbox_id: The sandbox ID to connect to
         timeout: Optional timeout for the sandbox in seconds
@@ -18,7 +24,18 @@ def get_sandbox(sandbox_id: str, timeout: Optional[int] = None) -> Sandbox:
     Returns:
         Connected Sandbox instance
     """
-    return Sandbox.connect(sandbox_id, timeout=timeout)
+    cache = connections.get_cache()
+
+    if cache is not None and timeout is None:
+        sbx = cache.get(sandbox_id)
+        if sbx is not None:
+            return sbx
+
+    sbx = Sandbox.connect(sandbox_id, timeout=timeout)
+
+    if cache is not None:
+        cache.put(sandbox_id, sbx)
+    return sbx
 
 
 def create_sandbox(
@@ -68,6 +85,7 @@ def kill_sandbox(sandbox_id: str) -> bool:
     Returns:
         True if sandbox was killed, False if not found
     """
+    connections.evict(sandbox_id)
     return Sandbox.kill(sandbox_id)
 
 
@@ -87,6 +105,28 @@ def get_host(sandbox_id: str, port: int) -> str:
     return host
 
 
+def resume_sandbox(sandbox_id: str, timeout: Optional[int] = None) -> Sandbox:
+    """
+    Resume a paused sandbox (a running sandbox is simply connected to).
+
+    Always reconnects, bypassing any cached handle from before the pause.
+
+    Args:
+        sandbox_id: The sandbox ID to resume
+        timeout: Timeout for the resumed sandbox in seconds
+
+    Returns:
+        Connected Sandbox instance
+    """
+    connections.evict(sandbox_id)
+    sbx = Sandbox.connect(sandbox_id, timeout=timeout)
+
+    cache = connections.get_cache()
+    if cache is not None:
+        cache.put(sandbox_id, sbx)
+    return sbx
+
+
 def pause_sandbox(sandbox_id: str) -> None:
     """
     Pause a sandbox (beta feature).
@@ -94,6 +134,7 @@ def pause_sandbox(sandbox_id: str) -> None:
     Args:
         sandbox_id: The sandbox ID to pause
     """
+    connections.evict(sandbox_id)
     Sandbox.beta_pause(sandbox_id)
 
 
@@ -131,17 +172,30 @@ def is_sandbox_running(sandbox_id: str) -> bool:
     return result
 
 
-def list_sandboxes(limit: int = 20) -> list:
+def list_sandboxes(
+    limit: int = 20,
+    metadata: Optional[Dict[str, str]] = None,
+    state: Optional[List[str]] = None,
+) -> list:
     """
-    List all running sandboxes.
+    List sandboxes (running ones by default).
 
     Args:
         limit: Maximum number of sandboxes to return (default 20)
+        metadata: Only sandboxes whose metadata contains these pairs
+        state: Sandbox states to include, e.g. ["paused"] or ["running", "paused"]
 
     Returns:
         List of dictionaries with sandbox info
     """
-    paginator = Sandbox.list()
+    query = None
+    if metadata or state:
+        query = SandboxQuery(
+            metadata=metadata,
+            state=[SandboxState(s) for s in state] if state else None,
+        )
+
+    paginator = Sandbox.list(query=query, limit=limit)
     sandboxes = paginator.next_items()
 
     # Limit the results
@@ -153,6 +207,7 @@ def list_sandboxes(limit: int = 20) -> list:
             "template_id": sbx.template_id,
             "started_at": str(sbx.started_at),
             "metadata": sbx.metadata,
+            "state": getattr(sbx.state, "value", sbx.state),
         }
         for sbx in sandboxes
     ]
@@ -0,0 +1,115 @@
+"""
+Output handling shared by all CLI commands.
+
+By default commands render for humans with Rich. The global ``--json`` and
+``--ndjson`` flags switch to machine-readable output: the shared console is
+silenced and each command emits the dict its module call returned. List
+commands stream rows as they are produced (one object per line with
+``--ndjson``).
+"""
+
+import json
+import sys
+from typing import Dict, Iterable, Optional
+
+import click
+from rich.console import Console
+
+JSON = "json"
+NDJSON = "ndjson"
+
+# Shared console for all command groups; silenced in machine-readable modes
+console = Console()
+
+
+def set_mode(mode: Optional[str]) -> None:
+    """
+    Select the output mode for this invocation.
+
+    Args:
+        mode: None for Rich output, or "json" / "ndjson"
+    """
+    ctx = click.get_current_context()
+    ctx.ensure_object(dict)["output"] = mode
+    console.quiet = mode is not None
+
+
+def get_mode() -> Optional[str]:
+    """Return the active output mode (None for Rich output)."""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.find_root().obj is None:
+        return None
+    return ctx.find_root().obj.get("output")
+
+
+def is_machine() -> bool:
+    """True when --json or --ndjson is active."""
+    return get_mode() is not None
+
+
+def _write(data) -> None:
+    sys.stdout.write(json.dumps(data, default=str))
+    sys.stdout.write("\n")
+
+
+def emit(data: Dict) -> None:
+    """
+    Emit a single result as one JSON document.
+
+    Args:
+        data: Result dictionary
+    """
+    _write(data)
+    sys.stdout.flush()
+
+
+def emit_rows(rows: Iterable[Dict], key: str, meta: Optional[Dict] = None) -> None:
+    """
+    Stream list results without building the whole document first.
+
+    With --ndjson every row is its own line. With --json the rows are written
+    incrementally as ``{**meta, key: [row, ...]}``.
+
+    Args:
+        rows: Iterable of row dictionaries
+        key: Name of the list field in --json mode
+        meta: Extra top-level fields for --json mode
+    """
+    if get_mode() == NDJSON:
+        for row in rows:
+            _write(row)
+            sys.stdout.flush()
+        return
+
+    # Opening is only written once the first row arrives, so an error raised
+    # before any rows (e.g. while connecting) still yields one clean document
+    opening = json.dumps({**(meta or {}), key: []}, default=str)[:-2]
+    started = False
+    for row in rows:
+        sys.stdout.write(", " if started else opening)
+        sys.stdout.write(json.dumps(row, default=str))
+        sys.stdout.flush()
+        started = True
+    if not started:
+        sys.stdout.write(opening)
+    sys.stdout.write("]}\n")
+    sys.stdout.flush()
+
+
+def fail(error: Exception) -> None:
+    """
+    Report a command failure and exit non-zero.
+
+    Args:
+        error: The exception that aborted the command
+
+    Raises:
+        click.Abort: In Rich mode, after printing the error
+        SystemExit: In machine-readable modes, after emitting the error
+    """
+    if is_machine():
+        emit({"success": False, "error": str(error)})
+        sys.exit(1)
+
+    console.print(f"[red]✗ Error: {error}[/red]")
+    raise click.Abort()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the E2B Sandbox MCP Server tool handlers.
+
+Issues N simultaneous ``read_file`` tool calls against a stand-in backend
+that sleeps for a fixed latency (simulating the E2B network round trip) and
+compares the wall time with N sequential calls. With non-blocking handlers
+the concurrent run should take roughly one latency, not N of them.
+With ``--same-path`` every call reads the same file, so the concurrent calls
+are coalesced into one backend call (coalesce.py). With ``--flood`` the
+sandbox is flooded with slow commands first, and the latency of reads issued
+behind them is compared with and without the per-sandbox limits (limits.py).
+No E2B account is needed.
+
+Usage:
+    uv run python benchmarks/concurrency.py
+    uv run python benchmarks/concurrency.py --calls 64 --latency 0.2
+    uv run python benchmarks/concurrency.py --same-path
+    uv run python benchmarks/concurrency.py --flood 48
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import anyio
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import engine  # noqa: E402
+import server  # noqa: E402
+from limits import FairLimiter  # noqa: E402
+
+
+class StandInFiles:
+    """Replaces the files module with a fixed-latency backend."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def read_file_range(self, sandbox_id: str, path: str, **window) -> dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"path": path, "content": f"contents of {path}"}
+
+
+class StandInCommands:
+    """Replaces the commands module with commands that just take a while."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def run_command(self, sandbox_id: str, command: str, **options) -> dict:
+        time.sleep(self.latency)
+        return {"stdout": "", "stderr": "", "exit_code": 0}
+
+
+def path_for(i: int, same_path: bool) -> str:
+    return "/tmp/file.txt" if same_path else f"/tmp/file-{i}.txt"
+
+
+async def run_sequential(calls: int, same_path: bool) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        await server.read_file("stand-in", path_for(i, same_path))
+    return time.perf_counter() - start
+
+
+async def run_concurrent(calls: int, same_path: bool) -> float:
+    start = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for i in range(calls):
+            tg.start_soon(server.read_file, "stand-in", path_for(i, same_path))
+    return time.perf_counter() - start
+
+
+async def run_flood(commands: int, reads: int) -> list[float]:
+    """Start `commands` slow commands, then time `reads` reads behind them."""
+    latencies = []
+
+    async def read(i: int) -> None:
+        start = time.perf_counter()
+        await server.read_file("stand-in", path_for(i, False))
+        latencies.append(time.perf_counter() - start)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(commands):
+            tg.start_soon(server.execute_command, "stand-in", "make")
+        # Let the commands take their slots (or queue) first
+        await anyio.sleep(0.05)
+        for i in range(reads):
+            tg.start_soon(read, i)
+    return latencies
+
+
+def flood(args: argparse.Namespace) -> None:
+    command_latency = args.latency * 5
+    server.cmd_module = StandInCommands(command_latency)
+
+    limited = anyio.run(run_flood, args.flood, args.calls)
+    stats = engine.call_limiter.stats()
+    # Only the global limit, as before limits.py
+    engine.call_limiter = FairLimiter(
+        max_calls=engine.MAX_WORKERS, light_reserve=0, sandbox_max_calls=0, sandbox_max_commands=0
+    )
+    unlimited = anyio.run(run_flood, args.flood, args.calls)
+
+    print(f"commands:     {args.flood} x {command_latency:.2f}s, then {args.calls} reads "
+          f"x {args.latency:.2f}s on one sandbox (workers: {engine.MAX_WORKERS})")
+    print(f"limits:       {stats['limits']}")
+    print(f"reads, fair queue:   mean {sum(limited) / len(limited):.3f}s, max {max(limited):.3f}s")
+    print(f"reads, global only:  mean {sum(unlimited) / len(unlimited):.3f}s, max {max(unlimited):.3f}s")
+    print(f"heavy wait p99: {stats['wait']['heavy']['p99_ms']} ms, "
+          f"max queued: {stats['max_queued']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", "-n", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per call")
+    parser.add_argument(
+        "--same-path", action="store_true", help="Read one file from every call"
+    )
+    parser.add_argument(
+        "--flood", type=int, default=0, metavar="N",
+        help="Start N slow commands on the sandbox before the reads",
+    )
+    args = parser.parse_args()
+
+    engine.ENGINE = engine.ENGINE_INPROCESS
+    # Every call must reach the backend, so bypass the result cache
+    server.result_cache = engine.result_cache = None
+    backend = server.files_module = StandInFiles(args.latency)
+
+    if args.flood:
+        flood(args)
+        return
+
+    sequential = anyio.run(run_sequential, args.calls, args.same_path)
+    backend.calls = 0
+    concurrent = anyio.run(run_concurrent, args.calls, args.same_path)
+
+    # 1.0 means every call fully overlapped; 1/N means no overlap at all
+    parallel = min(engine.MAX_WORKERS, engine.call_limiter.sandbox_max_calls or engine.MAX_WORKERS)
+    ideal = args.latency * -(-args.calls // parallel)
+    print(f"calls:        {args.calls} (workers: {engine.MAX_WORKERS}, "
+          f"per sandbox: {engine.call_limiter.sandbox_max_calls})")
+    print(f"sequential:   {sequential:.3f}s")
+    print(f"concurrent:   {concurrent:.3f}s")
+    print(f"speedup:      {sequential / concurrent:.1f}x")
+    if args.same_path:
+        print(f"backend:      {backend.calls} calls for {args.calls} concurrent reads")
+    else:
+        print(f"overlap:      {ideal / concurrent:.0%} of ideal")
+
+
+if __name__ == "__main__":
+    main()
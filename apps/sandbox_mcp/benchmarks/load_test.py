@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Load test for the shared HTTP transport of the E2B Sandbox MCP Server.
+
+Starts one server with ``--transport streamable-http``, connects N MCP
+clients to it at once (each with its own session, like N agent forks) and
+has every client issue ``read_file`` calls back to back. Reports connect and
+call latency (p50/p99), throughput and errors, the server's memory while
+serving them, and the memory one stdio server takes, which is what N
+stdio-launched servers would cost each.
+
+By default the server runs against a stand-in backend that sleeps for a
+fixed latency (as in concurrency.py), so no E2B account is needed. Pass
+``--sandbox-id`` to read a file from a real sandbox instead (requires
+E2B_API_KEY). Raise ``SBX_MCP_MAX_WORKERS`` in the environment to let more
+calls run at once; it is passed through to the server.
+
+Usage:
+    uv run python benchmarks/load_test.py
+    uv run python benchmarks/load_test.py --clients 100 --calls 20 --latency 0.1
+    uv run python benchmarks/load_test.py --sandbox-id $SANDBOX_ID
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import anyio
+import httpx
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+SERVER_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+BENCH_FILE = "/home/user/bench.txt"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident set size of another process (via ps, so it works on macOS too)."""
+    out = subprocess.run(
+        ["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True
+    ).stdout
+    return int(out.strip() or 0) * 1024
+
+
+class StandInFiles:
+    """Replaces the files module with a fixed-latency backend."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def read_file_range(self, sandbox_id: str, path: str, **window) -> dict:
+        time.sleep(self.latency)
+        return {"path": path, "content": f"contents of {path}"}
+
+
+def serve_stand_in(port: int, latency: float) -> None:
+    """Run the HTTP server in this process with the stand-in backend."""
+    import engine
+    import server
+
+    engine.ENGINE = engine.ENGINE_INPROCESS
+    server.files_module = StandInFiles(latency)
+
+    server.mcp.settings.port = port
+    logging.getLogger().setLevel(logging.WARNING)
+    server.mcp.run(transport="streamable-http")
+
+
+async def run_client(url: str, sandbox_id: str, calls: int, results: dict) -> None:
+    """One agent: connect, then call read_file `calls` times in a row."""
+    start = time.perf_counter()
+    try:
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                results["connect"].append((time.perf_counter() - start) * 1000)
+
+                for _ in range(calls):
+                    call_start = time.perf_counter()
+                    result = await session.call_tool(
+                        "read_file", {"sandbox_id": sandbox_id, "path": BENCH_FILE}
+                    )
+                    results["calls"].append((time.perf_counter() - call_start) * 1000)
+                    results["errors"] += int(result.isError)
+    except Exception as e:
+        results["failed_clients"].append(str(e))
+
+
+async def sample_memory(url: str, samples: list[int], stop: anyio.Event) -> None:
+    """Poll the server's /health endpoint for its RSS until stopped."""
+    async with httpx.AsyncClient() as client:
+        while not stop.is_set():
+            health = (await client.get(url)).json()
+            samples.append(health["rss_bytes"])
+            with anyio.move_on_after(0.2):
+                await stop.wait()
+
+
+async def run_load(base_url: str, args: argparse.Namespace, sandbox_id: str) -> dict:
+    results = {"connect": [], "calls": [], "errors": 0, "failed_clients": []}
+    memory: list[int] = []
+    stop = anyio.Event()
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(sample_memory, f"{base_url}/health", memory, stop)
+        async with anyio.create_task_group() as clients:
+            for _ in range(args.clients):
+                clients.start_soon(run_client, f"{base_url}/mcp", sandbox_id, args.calls, results)
+        stop.set()
+    results["wall"] = time.perf_counter() - start
+    results["memory"] = memory
+    return results
+
+
+def wait_healthy(url: str, process: subprocess.Popen, timeout: float = 60) -> int:
+    """Wait for /health to answer; returns the server's idle RSS."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with code {process.returncode}")
+        try:
+            return httpx.get(url, timeout=1).json()["rss_bytes"]
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    sys.exit(f"Server did not become healthy within {timeout:.0f}s")
+
+
+def stdio_server_memory(settle: float = 5) -> int:
+    """RSS of one stdio server after startup (the per-agent cost today)."""
+    process = subprocess.Popen(
+        [sys.executable, str(SERVER_DIR / "server.py")],
+        cwd=SERVER_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(settle)
+        return rss_bytes(process.pid)
+    finally:
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", "-c", type=int, default=50)
+    parser.add_argument("--calls", "-n", type=int, default=10, help="Calls per client")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stand-in seconds per call")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--sandbox-id", default=None, help="Use a real sandbox instead of the stand-in")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_stand_in(args.port, args.latency)
+        return
+
+    if args.sandbox_id:
+        command = [sys.executable, str(SERVER_DIR / "server.py"),
+                   "--transport", "streamable-http", "--port", str(args.port)]
+    else:
+        command = [sys.executable, __file__, "--serve",
+                   "--port", str(args.port), "--latency", str(args.latency)]
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    # Every call must reach the backend, so bypass the result cache and
+    # coalescing; all clients share one sandbox, so only the global limit applies
+    env = {
+        **os.environ,
+        "SBX_MCP_RESULT_CACHE": "0",
+        "SBX_MCP_COALESCE": "0",
+        "SBX_MCP_SANDBOX_MAX_CALLS": "0",
+    }
+    server_process = subprocess.Popen(command, cwd=SERVER_DIR, env=env)
+    try:
+        idle = wait_healthy(f"{base_url}/health", server_process)
+
+        if args.sandbox_id:
+            import engine
+
+            engine.files_module.write_file(args.sandbox_id, BENCH_FILE, "hello\n" * 100)
+
+        results = anyio.run(run_load, base_url, args, args.sandbox_id or "stand-in")
+        after = rss_bytes(server_process.pid)
+    finally:
+        server_process.terminate()
+        server_process.wait()
+
+    stdio = stdio_server_memory()
+
+    calls, connects = results["calls"], results["connect"]
+    mb = 1024 * 1024
+    peak = max(results["memory"] or [after])
+    print(f"\nclients:            {args.clients} x {args.calls} calls "
+          f"({'sandbox ' + args.sandbox_id if args.sandbox_id else f'stand-in {args.latency * 1000:.0f} ms'})")
+    print(f"workers:            {os.environ.get('SBX_MCP_MAX_WORKERS', '32')}")
+    print(f"failed clients:     {len(results['failed_clients'])}")
+    print(f"tool errors:        {results['errors']}")
+    if connects:
+        print(f"connect p50/p99:    {percentile(connects, 50):.1f} / {percentile(connects, 99):.1f} ms")
+    if calls:
+        print(f"call p50/p99/mean:  {percentile(calls, 50):.1f} / {percentile(calls, 99):.1f} / "
+              f"{statistics.mean(calls):.1f} ms")
+        print(f"throughput:         {len(calls) / results['wall']:.0f} calls/s")
+    print(f"\nshared server RSS:  {idle / mb:.0f} MB idle, {peak / mb:.0f} MB peak, "
+          f"{after / mb:.0f} MB after")
+    print(f"per client:         {(peak - idle) / max(1, args.clients) / mb:.2f} MB")
+    print(f"stdio server RSS:   {stdio / mb:.0f} MB each, "
+          f"{stdio * args.clients / mb:.0f} MB for {args.clients} clients")
+    for error in results["failed_clients"][:5]:
+        print(f"  client error: {error}")
+
+
+if __name__ == "__main__":
+    main()
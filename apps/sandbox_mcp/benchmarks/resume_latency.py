@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Resume vs cold-build latency benchmark for the E2B Sandbox MCP Server.
+
+For each iteration, builds a sandbox from scratch (create + setup commands),
+pauses it, and resumes it, then prints p50/p99 for the cold build and for the
+resume. This is the trade the paused pool (paused_pool.py) makes.
+Requires E2B_API_KEY (read from the repo .env like the CLI does).
+
+Usage:
+    uv run python benchmarks/resume_latency.py
+    uv run python benchmarks/resume_latency.py --iterations 5 \\
+        --setup "git clone --depth 1 https://github.com/disler/agent-sandboxes /home/user/repo"
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import engine  # noqa: E402
+
+DEFAULT_SETUP = ["pip install --quiet requests"]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", "-n", type=int, default=3)
+    parser.add_argument("--template", "-t", default=None)
+    parser.add_argument(
+        "--setup",
+        action="append",
+        help="Setup command (repeatable, default: pip install requests)",
+    )
+    args = parser.parse_args()
+
+    if not engine.INPROCESS_AVAILABLE:
+        sys.exit("Cannot import sandbox_cli modules (run `uv sync` first)")
+
+    steps = [{"cmd": cmd, "timeout": 600} for cmd in (args.setup or DEFAULT_SETUP)]
+    sbx_module, cmd_module = engine.sbx_module, engine.cmd_module
+
+    build, resume = [], []
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        sbx = sbx_module.create_sandbox(template=args.template, timeout=600)
+        sandbox_id = sbx.sandbox_id
+        try:
+            result = cmd_module.run_batch(sandbox_id, steps)
+            if not result["success"]:
+                sys.exit(f"Setup failed: {result['steps'][-1]}")
+            build.append((time.perf_counter() - start) * 1000)
+
+            sbx_module.pause_sandbox(sandbox_id)
+
+            start = time.perf_counter()
+            sbx = sbx_module.resume_sandbox(sandbox_id, timeout=300)
+            # Include the first command, so a lazily resumed sandbox counts in full
+            sbx.commands.run("true")
+            resume.append((time.perf_counter() - start) * 1000)
+        finally:
+            sbx_module.kill_sandbox(sandbox_id)
+
+        print(
+            f"[{i + 1}/{args.iterations}] "
+            f"build {build[-1]:.0f} ms, resume {resume[-1]:.0f} ms"
+        )
+
+    print(f"\n{'path':<22} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    for name, samples in (("create + setup", build), ("resume", resume)):
+        print(
+            f"{name:<22} {percentile(samples, 50):>10.1f} "
+            f"{percentile(samples, 99):>10.1f} {statistics.mean(samples):>10.1f}"
+        )
+    print(f"\nspeedup: {statistics.mean(build) / statistics.mean(resume):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
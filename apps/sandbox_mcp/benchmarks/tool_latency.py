@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tool latency benchmark for the E2B Sandbox MCP Server.
+
+Creates a sandbox, calls a handful of representative tools repeatedly with
+each engine (in-process and subprocess), and prints p50/p99 latency per tool.
+Requires E2B_API_KEY (read from the repo .env like the CLI does).
+
+Usage:
+    uv run python benchmarks/tool_latency.py
+    uv run python benchmarks/tool_latency.py --iterations 50 --engine inprocess
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import anyio
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import engine  # noqa: E402
+import server  # noqa: E402
+
+BENCH_FILE = "/home/user/bench.txt"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def bench_engine(name: str, sandbox_id: str, iterations: int) -> dict:
+    """Time each tool call under the given engine."""
+    engine.ENGINE = name
+
+    calls = {
+        "read_file": lambda: server.read_file(sandbox_id, BENCH_FILE),
+        "list_files": lambda: server.list_files(sandbox_id, "/home/user"),
+        "get_file_info": lambda: server.get_file_info(sandbox_id, BENCH_FILE),
+        "execute_command": lambda: server.execute_command(sandbox_id, "echo ok"),
+    }
+
+    results = {}
+    for tool, call in calls.items():
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await call()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[tool] = samples
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", "-n", type=int, default=20)
+    parser.add_argument(
+        "--engine",
+        choices=[engine.ENGINE_INPROCESS, engine.ENGINE_SUBPROCESS, "both"],
+        default="both",
+    )
+    args = parser.parse_args()
+
+    # Measure the engines, not the result cache
+    server.result_cache = engine.result_cache = None
+
+    # Sandbox setup/teardown uses the CLI modules directly, whatever the engine
+    if not engine.INPROCESS_AVAILABLE:
+        sys.exit("Cannot import sandbox_cli modules (run `uv sync` first)")
+
+    engines = (
+        [engine.ENGINE_INPROCESS, engine.ENGINE_SUBPROCESS]
+        if args.engine == "both"
+        else [args.engine]
+    )
+
+    sandbox_id = engine.sbx_module.create_sandbox(timeout=600).sandbox_id
+    print(f"Sandbox: {sandbox_id}")
+
+    try:
+        engine.files_module.write_file(sandbox_id, BENCH_FILE, "hello\n" * 100)
+
+        print(f"\n{'engine':<12} {'tool':<18} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+        for name in engines:
+            results = anyio.run(bench_engine, name, sandbox_id, args.iterations)
+            for tool, samples in results.items():
+                print(
+                    f"{name:<12} {tool:<18} {percentile(samples, 50):>10.1f} "
+                    f"{percentile(samples, 99):>10.1f} {statistics.mean(samples):>10.1f}"
+                )
+    finally:
+        engine.sbx_module.kill_sandbox(sandbox_id)
+
+
+if __name__ == "__main__":
+    main()
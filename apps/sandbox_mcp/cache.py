@@ -0,0 +1,180 @@
+"""
+Read-through cache for idempotent MCP tool results.
+
+``read_file``, ``list_files``, ``search_files``, ``get_file_info`` and
+``check_file_exists`` results are cached per sandbox and path. Tools that modify the filesystem
+invalidate every cached entry related to the paths they touch (the path
+itself, anything below it, and its ancestors, whose listings/existence may
+have changed). Command execution can touch anything, so it flushes the whole
+sandbox (by touching ``ANY_PATH``).
+
+Configuration:
+    SBX_MCP_RESULT_CACHE            "0" disables the cache (default "1")
+    SBX_MCP_RESULT_CACHE_MAX_BYTES  Total size bound (default 32 MiB)
+    SBX_MCP_RESULT_CACHE_ENTRY_MAX  Results larger than this are not cached
+                                    (default 1 MiB)
+    SBX_MCP_RESULT_CACHE_TTL        Seconds an entry stays valid, as a guard
+                                    against background processes (default 30)
+"""
+
+import json
+import os
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# (sandbox_id, tool, path, params)
+CacheKey = tuple[str, str, str, Hashable]
+
+# Pass as a touched path for calls that can modify anything (e.g. commands)
+ANY_PATH = "/"
+
+
+def _normalize(path: str) -> Optional[str]:
+    """Normalize an absolute path ("/" becomes ""); None for relative paths."""
+    if not path.startswith("/"):
+        return None
+    return posixpath.normpath(path).rstrip("/")
+
+
+def _related(a: str, b: str) -> bool:
+    """True if a and b are the same path or one contains the other."""
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/")
+
+
+class ResultCache:
+    """
+    Thread-safe, size-bounded LRU cache of tool results.
+
+    Every sandbox has a generation number that changes on invalidation. A
+    result is only stored if the generation is unchanged since its read
+    started, so a read racing a write can never cache stale data.
+
+    Args:
+        max_bytes: Upper bound on the summed size of cached results
+        max_entry_bytes: Results larger than this are not cached
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, tuple[Any, int, float]]" = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.flushes = 0
+
+    def get(self, key: CacheKey) -> tuple[bool, Any]:
+        """Return (hit, value) for a key."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] > self.ttl:
+                self._drop(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def generation(self, sandbox_id: str) -> int:
+        """Current generation for a sandbox; pass it back to put()."""
+        with self._lock:
+            return self._generations.get(sandbox_id, 0)
+
+    def put(self, key: CacheKey, value: Any, generation: int) -> None:
+        """Store a result unless its sandbox was invalidated since the read began."""
+        size = len(json.dumps(value, default=str))
+        if size > self.max_entry_bytes:
+            return
+
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, sandbox_id: str, *paths: str) -> None:
+        """Drop entries related to the given paths (flushes on relative paths)."""
+        normalized = [_normalize(p) for p in paths]
+        if any(p is None for p in normalized):
+            self.flush(sandbox_id)
+            return
+
+        with self._lock:
+            self._bump(sandbox_id)
+            self.invalidations += 1
+            for key in [k for k in self._entries if k[0] == sandbox_id]:
+                cached = _normalize(key[2])
+                if cached is None or any(_related(cached, p) for p in normalized):
+                    self._drop(key)
+
+    def flush(self, sandbox_id: Optional[str] = None) -> None:
+        """Drop every entry for a sandbox (or for all sandboxes)."""
+        with self._lock:
+            self.flushes += 1
+            if sandbox_id is None:
+                for sid in list(self._generations):
+                    self._bump(sid)
+                self._entries.clear()
+                self._bytes = 0
+                return
+
+            self._bump(sandbox_id)
+            for key in [k for k in self._entries if k[0] == sandbox_id]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "flushes": self.flushes,
+            }
+
+    def _bump(self, sandbox_id: str) -> None:
+        self._generations[sandbox_id] = self._generations.get(sandbox_id, 0) + 1
+
+    def _drop(self, key: CacheKey) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _create_cache() -> Optional[ResultCache]:
+    enabled = os.environ.get("SBX_MCP_RESULT_CACHE", "1").strip().lower()
+    if enabled in ("0", "false", "off"):
+        return None
+    env = os.environ.get
+    return ResultCache(
+        max_bytes=int(env("SBX_MCP_RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        max_entry_bytes=int(env("SBX_MCP_RESULT_CACHE_ENTRY_MAX", str(1024 * 1024))),
+        ttl=float(env("SBX_MCP_RESULT_CACHE_TTL", "30")),
+    )
+
+
+# Process-wide cache, or None when disabled
+result_cache = _create_cache()
@@ -0,0 +1,144 @@
+"""
+Single-flight coalescing of identical concurrent reads for the E2B Sandbox
+MCP Server.
+
+Parallel subagents often issue the same ``read_file`` / ``list_files`` /
+``get_file_info`` call on the same sandbox at the same moment. The result
+cache (cache.py) only helps once the first call has finished; while it is
+still in flight, every duplicate would go to E2B as well. Here the first
+caller (the leader) runs the backend call and identical calls that arrive
+while it runs wait for it and get the same result (or exception).
+
+Calls are identical when they share the result cache key (sandbox, tool,
+path and arguments). Every sandbox has a generation that is bumped whenever
+a modifying call finishes, and a caller only joins a flight started in the
+current generation, so a read issued after a write never gets data read
+before it. If the leader is cancelled, waiting callers start a new flight.
+
+Set ``SBX_MCP_COALESCE=0`` to disable. Counters are served as the MCP
+resource ``metrics://coalescing``.
+"""
+
+import os
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import anyio
+
+import metrics
+
+
+class _Flight:
+    """One in-flight backend call and its outcome."""
+
+    def __init__(self):
+        self.done = anyio.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        self.cancelled = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Shares one backend call among identical concurrent callers.
+
+    All methods run on the server's event loop, so no lock is needed.
+    """
+
+    def __init__(self):
+        self._flights: dict[tuple[Hashable, int], _Flight] = {}
+        self._generations: dict[Optional[str], int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.by_tool: dict[str, int] = {}
+        self.max_waiters = 0
+
+    async def run(
+        self,
+        key: tuple,
+        fn: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Run fn(), or wait for an identical call already in flight.
+
+        Args:
+            key: (sandbox_id, tool, path, params), as used by the result cache
+            fn: Coroutine function doing the backend call
+
+        Returns:
+            The result of this call or of the flight it joined
+
+        Raises:
+            Exception: Whatever the backend call raised
+        """
+        sandbox_id, tool = key[0], key[1]
+        while True:
+            flight_key = (key, self._generations.get(sandbox_id, 0))
+            flight = self._flights.get(flight_key)
+            if flight is None:
+                break
+
+            flight.waiters += 1
+            self.max_waiters = max(self.max_waiters, flight.waiters)
+            with metrics.phase("coalesce"):
+                await flight.done.wait()
+            if flight.cancelled:
+                # The leader's caller went away; take over with a new flight
+                continue
+
+            self.coalesced += 1
+            self.by_tool[tool] = self.by_tool.get(tool, 0) + 1
+            metrics.mark_coalesced()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        flight = _Flight()
+        self._flights[flight_key] = flight
+        self.leaders += 1
+        try:
+            flight.result = await fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        except BaseException:
+            flight.cancelled = True
+            raise
+        finally:
+            del self._flights[flight_key]
+            flight.done.set()
+
+    def invalidate(self, sandbox_id: Optional[str]) -> None:
+        """Start a new generation: later reads no longer join earlier flights."""
+        self._generations[sandbox_id] = self._generations.get(sandbox_id, 0) + 1
+
+    def invalidate_all(self) -> None:
+        """Start a new generation for every sandbox (after a call that may touch any)."""
+        in_flight = {flight_key[0][0] for flight_key in self._flights}
+        for sandbox_id in in_flight | set(self._generations):
+            self.invalidate(sandbox_id)
+
+    def stats(self) -> dict:
+        """Leader/coalesced counters and current in-flight reads."""
+        calls = self.leaders + self.coalesced
+        return {
+            "enabled": True,
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            "coalesced_by_tool": dict(sorted(self.by_tool.items())),
+            "max_waiters": self.max_waiters,
+        }
+
+
+def _create_single_flight() -> Optional[SingleFlight]:
+    enabled = os.environ.get("SBX_MCP_COALESCE", "1").strip().lower()
+    if enabled in ("0", "false", "off"):
+        return None
+    return SingleFlight()
+
+
+# Process-wide coalescer, or None when disabled
+single_flight = _create_single_flight()
@@ -0,0 +1,449 @@
+"""
+Execution engines for the E2B Sandbox MCP Server.
+
+Tools can be served two ways:
+
+- ``inprocess`` (default): import the CLI's reusable modules
+  (``sandbox_cli/src/modules``) and call them directly inside the server
+  process. No interpreter start, no ``uv`` resolution, no re-import of the
+  E2B SDK per call.
+- ``subprocess``: spawn ``uv run sbx ...`` for every call. Kept as a fallback
+  for environments where the CLI modules cannot be imported.
+
+Select the engine with the ``SBX_MCP_ENGINE`` environment variable. If the
+in-process engine is requested but the CLI modules cannot be imported, the
+server falls back to the subprocess engine.
+
+Both engines are blocking, so tool calls run on a bounded worker thread pool
+(``SBX_MCP_MAX_WORKERS``, default 32). Concurrent tool calls from one agent
+(parallel tool use, Task subagents) overlap their network waits instead of
+queueing behind each other on the event loop. Before it gets a thread, a
+call is admitted under the per-sandbox and global in-flight limits of
+limits.py, so heavy commands cannot starve file operations.
+
+The in-process engine also keeps a connection cache (see
+``sandbox_cli/src/modules/connections.py``) so repeated calls against the
+same sandbox skip ``Sandbox.connect``. Tune it with
+``SBX_MCP_CONN_CACHE_SIZE`` (default 64, 0 disables) and
+``SBX_MCP_CONN_CACHE_TTL`` (idle seconds, default 300).
+
+Cancelled calls (MCP cancellation, a client going away, or a deadline) do
+not hold their worker: the waiting task returns at once and the work is
+stopped behind it. The subprocess engine sends ``SIGTERM`` to ``sbx``, which
+kills its remote command first (``SIGKILL`` follows after a grace period).
+The in-process engine kills remote commands started by the call through
+``commands.kill`` (tools report them via ``remote_started``). Calls can
+also clean up what a cancelled call produced, such as a just-created
+sandbox (``on_abandon``). Deadlines come from the tool (e.g. a command's own
+timeout) or from ``SBX_MCP_CALL_TIMEOUT`` (seconds, default 0: none).
+"""
+
+import contextvars
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, Sequence
+
+import anyio
+
+import metrics
+from cache import result_cache
+from coalesce import single_flight
+from limits import call_limiter
+
+logger = logging.getLogger(__name__)
+
+# Path to the CLI project (sibling directory)
+CLI_PATH = Path(__file__).parent.parent / "sandbox_cli"
+
+ENGINE_INPROCESS = "inprocess"
+ENGINE_SUBPROCESS = "subprocess"
+
+# Make the CLI package importable as ``src`` for the in-process engine
+if str(CLI_PATH) not in sys.path:
+    sys.path.insert(0, str(CLI_PATH))
+
+try:
+    from dotenv import load_dotenv
+
+    # Same .env the CLI loads, so both engines see the same E2B_API_KEY
+    load_dotenv(CLI_PATH.parent.parent / ".env")
+except ImportError:
+    pass
+
+try:
+    from e2b import CommandExitException
+    from src.modules import commands as cmd_module
+    from src.modules import connections
+    from src.modules import files as files_module
+    from src.modules import git as git_module
+    from src.modules import sandbox as sbx_module
+
+    INPROCESS_AVAILABLE = True
+except ImportError as e:
+    cmd_module = files_module = git_module = sbx_module = connections = None
+    CommandExitException = None
+    INPROCESS_AVAILABLE = False
+    logger.warning(f"In-process engine unavailable ({e}); using subprocess engine")
+
+
+def _select_engine() -> str:
+    """Resolve the engine from SBX_MCP_ENGINE, falling back when unavailable."""
+    requested = os.environ.get("SBX_MCP_ENGINE", ENGINE_INPROCESS).strip().lower()
+    if requested == ENGINE_INPROCESS and INPROCESS_AVAILABLE:
+        return ENGINE_INPROCESS
+    return ENGINE_SUBPROCESS
+
+
+ENGINE = _select_engine()
+
+# Upper bound on tool calls blocking a worker thread at the same time
+MAX_WORKERS = int(os.environ.get("SBX_MCP_MAX_WORKERS", "32"))
+_workers = anyio.CapacityLimiter(MAX_WORKERS)
+
+CONN_CACHE_SIZE = int(os.environ.get("SBX_MCP_CONN_CACHE_SIZE", "64"))
+CONN_CACHE_TTL = float(os.environ.get("SBX_MCP_CONN_CACHE_TTL", "300"))
+
+if ENGINE == ENGINE_INPROCESS and CONN_CACHE_SIZE > 0:
+    connections.enable_cache(max_size=CONN_CACHE_SIZE, ttl=CONN_CACHE_TTL)
+
+
+# Default deadline in seconds for every tool call (0: none)
+CALL_TIMEOUT = float(os.environ.get("SBX_MCP_CALL_TIMEOUT", "0"))
+
+# Seconds a cancelled `sbx` process gets to kill its remote command
+CLI_TERMINATE_GRACE = 5.0
+
+
+class _Call:
+    """
+    Cancellation state of one tool call, shared with the thread running it.
+
+    Args:
+        sandbox_id: Sandbox the call targets (for killing remote commands)
+        on_abandon: Called with the result if the call finishes after it
+            was cancelled (nobody will receive it)
+    """
+
+    def __init__(
+        self,
+        sandbox_id: Optional[str],
+        on_abandon: Optional[Callable[[Any], None]] = None,
+    ):
+        self.sandbox_id = sandbox_id
+        self.on_abandon = on_abandon
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._finished = False
+        self._result: Any = None
+        self._pids: list[tuple[Optional[str], int]] = []
+        self._process: Optional[subprocess.Popen] = None
+
+    def remote_started(self, pid: int, sandbox_id: Optional[str] = None) -> None:
+        """Note a remote command; kill it right away if already cancelled."""
+        sandbox_id = sandbox_id or self.sandbox_id
+        with self._lock:
+            if not self._cancelled:
+                self._pids.append((sandbox_id, pid))
+                return
+        self._kill_remote(sandbox_id, pid)
+
+    def spawned(self, process: subprocess.Popen) -> None:
+        """Note the `sbx` process; stop it right away if already cancelled."""
+        with self._lock:
+            self._process = process
+            cancelled = self._cancelled
+        if cancelled:
+            _terminate(process)
+
+    def finish(self, result: Any) -> Any:
+        """Record the result in the worker; clean it up if nobody awaits it."""
+        with self._lock:
+            self._finished = True
+            self._result = result
+            abandoned = self._cancelled
+        if abandoned:
+            self._abandon(result)
+        return result
+
+    def cancel(self) -> None:
+        """Stop the call's remote commands and `sbx` process."""
+        with self._lock:
+            self._cancelled = True
+            pids, process = list(self._pids), self._process
+            finished, result = self._finished, self._result
+        for sandbox_id, pid in pids:
+            self._kill_remote(sandbox_id, pid)
+        if process is not None:
+            _terminate(process)
+        if finished:
+            # Done, but the result was never delivered
+            self._abandon(result)
+
+    def _kill_remote(self, sandbox_id: Optional[str], pid: int) -> None:
+        try:
+            cmd_module.kill_process(sandbox_id, pid)
+        except Exception as e:
+            logger.warning(f"Could not kill process {pid} in {sandbox_id}: {e}")
+
+    def _abandon(self, result: Any) -> None:
+        if self.on_abandon is None:
+            return
+        try:
+            self.on_abandon(result)
+        except Exception as e:
+            logger.warning(f"Could not clean up after a cancelled call: {e}")
+
+
+# The call being executed, visible to its worker thread (threads started with
+# anyio.to_thread inherit the context)
+_current_call: contextvars.ContextVar[Optional[_Call]] = contextvars.ContextVar(
+    "sbx_mcp_call", default=None
+)
+
+
+def remote_started(pid: int, sandbox_id: Optional[str] = None) -> None:
+    """
+    Report a remote command started by the current call (in-process engine),
+    so it is killed if the call is cancelled. Pass as ``on_start`` to
+    ``cmd_module.run_command`` / ``run_batch`` / ``run_on_many``; the sandbox
+    defaults to the one the call targets.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.remote_started(pid, sandbox_id)
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    """SIGTERM an `sbx` process (it kills its remote command), SIGKILL later."""
+    if process.poll() is not None:
+        return
+    process.terminate()
+
+    def reap():
+        try:
+            process.wait(timeout=CLI_TERMINATE_GRACE)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    threading.Thread(target=reap, name="sbx-cli-reaper", daemon=True).start()
+
+
+def run_sbx_cli(
+    *args,
+    stdin: Optional[str] = None,
+    on_spawn: Optional[Callable[[subprocess.Popen], None]] = None,
+) -> dict:
+    """
+    Execute sbx CLI command and return parsed JSON or structured output.
+
+    Args:
+        *args: CLI arguments to pass to sbx command
+        stdin: Text fed to the command's standard input (for "-" arguments)
+        on_spawn: Called with the process right after it started
+
+    Returns:
+        Parsed output from the CLI (dict or string)
+
+    Raises:
+        RuntimeError: If CLI command fails
+    """
+    # --json makes every command emit the same dicts the modules return
+    cmd = ["uv", "run", "sbx", "--json", *args]
+
+    # Create clean environment without VIRTUAL_ENV to avoid uv conflicts
+    env = os.environ.copy()
+    env.pop("VIRTUAL_ENV", None)
+
+    with metrics.phase("spawn"):
+        process = subprocess.Popen(
+            cmd,
+            cwd=CLI_PATH,
+            env=env,
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    if on_spawn is not None:
+        on_spawn(process)
+    with metrics.phase("cli"):
+        stdout, stderr = process.communicate(input=stdin)
+
+    if process.returncode != 0:
+        # JSON-mode failures carry a clean {"success": false, "error": ...}
+        try:
+            error = json.loads(stdout)["error"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            error = None
+        if error is not None:
+            raise RuntimeError(error)
+
+        # Include both stdout and stderr for complete error context
+        error_msg = f"CLI command failed with exit code {process.returncode}"
+        if stdout and stdout.strip():
+            error_msg += f"\nOutput: {stdout.strip()}"
+        if stderr and stderr.strip():
+            error_msg += f"\nError: {stderr.strip()}"
+        raise RuntimeError(error_msg)
+
+    # Try to parse as JSON, otherwise return raw output
+    with metrics.phase("parse"):
+        try:
+            return json.loads(stdout)
+        except json.JSONDecodeError:
+            return {"output": stdout.strip(), "success": True}
+
+
+async def _execute(
+    cli_args: list[str],
+    inprocess: Optional[Callable[[], Any]],
+    sandbox_id: Optional[str],
+    cli_stdin: Optional[str] = None,
+    on_abandon: Optional[Callable[[Any], None]] = None,
+    heavy: bool = False,
+) -> Any:
+    """Run one admitted call on the worker thread pool with the active engine."""
+    async with call_limiter.slot(sandbox_id, heavy):
+        return await _run_worker(cli_args, inprocess, sandbox_id, cli_stdin, on_abandon)
+
+
+async def _run_worker(
+    cli_args: list[str],
+    inprocess: Optional[Callable[[], Any]],
+    sandbox_id: Optional[str],
+    cli_stdin: Optional[str],
+    on_abandon: Optional[Callable[[Any], None]],
+) -> Any:
+    queued = time.perf_counter()
+    call = _Call(sandbox_id, on_abandon)
+
+    def timed(fn: Callable[[], Any], name: Optional[str] = None) -> Callable[[], Any]:
+        def run():
+            metrics.add_phase("queue", time.perf_counter() - queued)
+            if name is None:
+                return call.finish(fn())
+            with metrics.phase(name):
+                return call.finish(fn())
+
+        return run
+
+    token = _current_call.set(call)
+    try:
+        if ENGINE == ENGINE_INPROCESS and inprocess is not None:
+            try:
+                return await anyio.to_thread.run_sync(
+                    timed(inprocess, "sdk"), limiter=_workers, abandon_on_cancel=True
+                )
+            except Exception as e:
+                # A non-zero exit is a healthy sandbox; anything else may be a stale handle
+                if sandbox_id and not isinstance(e, CommandExitException):
+                    connections.evict(sandbox_id)
+                raise
+        # run_sbx_cli times its own spawn/cli/parse phases
+        return await anyio.to_thread.run_sync(
+            timed(lambda: run_sbx_cli(*cli_args, stdin=cli_stdin, on_spawn=call.spawned)),
+            limiter=_workers,
+            abandon_on_cancel=True,
+        )
+    except anyio.get_cancelled_exc_class():
+        # The worker slot is already released; stop the work behind it
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(call.cancel)
+        raise
+    finally:
+        _current_call.reset(token)
+
+
+async def run_tool(
+    cli_args: list[str],
+    inprocess: Optional[Callable[[], Any]] = None,
+    *,
+    sandbox_id: Optional[str] = None,
+    read_key: Optional[tuple[str, str, Hashable]] = None,
+    touches: Optional[Sequence[str]] = None,
+    cli_stdin: Optional[str] = None,
+    deadline: Optional[float] = None,
+    on_abandon: Optional[Callable[[Any], None]] = None,
+    heavy: bool = False,
+) -> Any:
+    """
+    Run a tool through the active engine on the worker thread pool.
+
+    Args:
+        cli_args: Arguments for the ``sbx`` CLI (subprocess engine)
+        inprocess: Zero-argument callable using the CLI modules directly
+            (in-process engine). Tools without one always use the CLI.
+        sandbox_id: Sandbox the call targets, if any. A failed in-process
+            call drops its cached connection so the next call reconnects
+            (and resumes the sandbox if it was auto-paused).
+        read_key: (tool, path, params) for idempotent reads; the result is
+            served from and stored in the result cache (see cache.py), and
+            identical reads in flight share one call (see coalesce.py)
+        touches: Sandbox paths the call may modify; related cached results
+            are invalidated once it finishes, successfully or not. Use
+            cache.ANY_PATH for calls that can touch anything.
+        cli_stdin: Standard input for the CLI (subprocess engine), for
+            payloads passed as "-"
+        deadline: Seconds before the call is cancelled (None: the
+            SBX_MCP_CALL_TIMEOUT default, 0: no deadline)
+        on_abandon: Cleanup for the in-process result of a call that was
+            cancelled (e.g. kill a sandbox nobody will receive)
+        heavy: Whether the call runs commands or large transfers; heavy
+            calls are limited per sandbox so light ones are not starved
+
+    Returns:
+        The callable's result in-process, or the parsed CLI output
+
+    Raises:
+        TimeoutError: If the deadline passed (the call is cancelled)
+    """
+    if deadline is None:
+        deadline = CALL_TIMEOUT
+    try:
+        with anyio.move_on_after(deadline or None):
+            if read_key is None:
+                return await _execute(
+                    cli_args, inprocess, sandbox_id, cli_stdin, on_abandon, heavy
+                )
+            return await _read(cli_args, inprocess, sandbox_id, read_key, cli_stdin)
+        raise TimeoutError(f"Call cancelled after its {deadline:g}s deadline")
+    finally:
+        if touches:
+            if result_cache is not None:
+                result_cache.invalidate(sandbox_id, *touches)
+            if single_flight is not None:
+                single_flight.invalidate(sandbox_id)
+
+
+async def _read(
+    cli_args: list[str],
+    inprocess: Optional[Callable[[], Any]],
+    sandbox_id: Optional[str],
+    read_key: tuple[str, str, Hashable],
+    cli_stdin: Optional[str],
+) -> Any:
+    """Serve an idempotent read from the result cache or a shared call."""
+    key = (sandbox_id, *read_key)
+    if result_cache is not None:
+        hit, value = result_cache.get(key)
+        if hit:
+            metrics.mark_cache_hit()
+            return value
+
+    async def read() -> Any:
+        generation = result_cache.generation(sandbox_id) if result_cache else None
+        result = await _execute(cli_args, inprocess, sandbox_id, cli_stdin)
+        if result_cache is not None:
+            result_cache.put(key, result, generation)
+        return result
+
+    if single_flight is None:
+        return await read()
+    # Identical reads already in flight share one backend call
+    return await single_flight.run(key, read)
@@ -0,0 +1,226 @@
+"""
+Per-sandbox and global in-flight limits with fair queueing for the E2B
+Sandbox MCP Server.
+
+With parallel tool use one agent can start many heavy commands on a single
+sandbox at once. They saturate the sandbox and the worker threads, so the
+agent's own file operations stall behind them and time out. Every call is
+therefore admitted here before it gets a worker thread:
+
+- At most ``SBX_MCP_MAX_WORKERS`` calls run at once (default 32), of which
+  ``SBX_MCP_LIGHT_RESERVE`` (default 4) are kept for light calls.
+- At most ``SBX_MCP_SANDBOX_MAX_CALLS`` calls run per sandbox (default 16),
+  of which at most ``SBX_MCP_SANDBOX_MAX_COMMANDS`` are heavy (default 4).
+
+Heavy calls are the ones that run commands or move many files
+(``execute_command``, ``execute_batch``, ``wait_process``, ``clone_repo``,
+directory transfers); everything else is light. ``execute_on_many`` is one
+heavy call with no sandbox, bounded by its own ``max_parallel``. Calls that do not fit wait in one
+queue per sandbox. Free slots go round-robin across sandboxes, and within a
+sandbox to the oldest call that fits, so a file read is not stuck behind
+commands waiting for the sandbox's command limit. Set a limit to 0 to turn
+it off.
+
+Queue depth and wait times are served as the MCP resource
+``metrics://limits``; per-tool wait times are the ``admit`` phase in
+``metrics://tools``.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import anyio
+
+import metrics
+
+
+class _Waiter:
+    """One call waiting for (or holding) a slot."""
+
+    __slots__ = ("sandbox_id", "heavy", "event", "granted")
+
+    def __init__(self, sandbox_id: Optional[str], heavy: bool):
+        self.sandbox_id = sandbox_id
+        self.heavy = heavy
+        self.event = anyio.Event()
+        self.granted = False
+
+
+class FairLimiter:
+    """
+    Admits tool calls under global and per-sandbox in-flight limits.
+
+    All methods run on the server's event loop, so no lock is needed.
+
+    Args:
+        max_calls: Calls in flight overall (0: unlimited)
+        light_reserve: Slots of max_calls that heavy calls cannot take
+        sandbox_max_calls: Calls in flight per sandbox (0: unlimited)
+        sandbox_max_commands: Heavy calls in flight per sandbox (0: unlimited)
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 32,
+        light_reserve: int = 4,
+        sandbox_max_calls: int = 16,
+        sandbox_max_commands: int = 4,
+    ):
+        self.max_calls = max_calls
+        self.max_heavy = max(1, max_calls - light_reserve) if max_calls else 0
+        self.sandbox_max_calls = sandbox_max_calls
+        self.sandbox_max_commands = sandbox_max_commands
+
+        # Waiting calls per sandbox, least recently served sandbox first
+        self._queues: OrderedDict[Optional[str], deque[_Waiter]] = OrderedDict()
+        # Calls and heavy calls in flight per sandbox
+        self._sandboxes: dict[Optional[str], list[int]] = {}
+        self._in_flight = 0
+        self._heavy_in_flight = 0
+
+        self.admitted = 0
+        self.waited = 0
+        self.max_queued = 0
+        self.waits = {"light": metrics.Histogram(), "heavy": metrics.Histogram()}
+
+    @asynccontextmanager
+    async def slot(self, sandbox_id: Optional[str], heavy: bool = False) -> AsyncIterator[None]:
+        """
+        Hold a slot for one call, waiting in the sandbox's queue if needed.
+
+        Args:
+            sandbox_id: Sandbox the call targets (None: only global limits)
+            heavy: Whether the call runs commands or large transfers
+        """
+        waiter = _Waiter(sandbox_id, heavy)
+        self._queues.setdefault(sandbox_id, deque()).append(waiter)
+        self._dispatch()
+
+        if not waiter.granted:
+            self.waited += 1
+            self.max_queued = max(self.max_queued, self.queued())
+        start = time.perf_counter()
+        try:
+            if not waiter.granted:
+                with metrics.phase("admit"):
+                    await waiter.event.wait()
+        except BaseException:
+            if waiter.granted:
+                self._release(waiter)
+            else:
+                self._dequeue(waiter)
+            raise
+        self.waits["heavy" if heavy else "light"].add((time.perf_counter() - start) * 1000)
+
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    def queued(self) -> int:
+        """Calls currently waiting for a slot."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _fits(self, waiter: _Waiter) -> bool:
+        if self.max_calls and self._in_flight >= self.max_calls:
+            return False
+        if waiter.heavy and self.max_heavy and self._heavy_in_flight >= self.max_heavy:
+            return False
+        if waiter.sandbox_id is None:
+            return True
+        calls, commands = self._sandboxes.get(waiter.sandbox_id, (0, 0))
+        if self.sandbox_max_calls and calls >= self.sandbox_max_calls:
+            return False
+        if waiter.heavy and self.sandbox_max_commands and commands >= self.sandbox_max_commands:
+            return False
+        return True
+
+    def _dispatch(self) -> None:
+        """Grant free slots round-robin across sandboxes."""
+        granted = True
+        while granted:
+            granted = False
+            for sandbox_id, queue in self._queues.items():
+                waiter = next((w for w in queue if self._fits(w)), None)
+                if waiter is None:
+                    continue
+                queue.remove(waiter)
+                if queue:
+                    self._queues.move_to_end(sandbox_id)
+                else:
+                    del self._queues[sandbox_id]
+                self._grant(waiter)
+                granted = True
+                # Start over from the sandbox served least recently
+                break
+
+    def _grant(self, waiter: _Waiter) -> None:
+        counts = self._sandboxes.setdefault(waiter.sandbox_id, [0, 0])
+        counts[0] += 1
+        counts[1] += int(waiter.heavy)
+        self._in_flight += 1
+        self._heavy_in_flight += int(waiter.heavy)
+        self.admitted += 1
+        waiter.granted = True
+        waiter.event.set()
+
+    def _release(self, waiter: _Waiter) -> None:
+        counts = self._sandboxes[waiter.sandbox_id]
+        counts[0] -= 1
+        counts[1] -= int(waiter.heavy)
+        if not counts[0]:
+            del self._sandboxes[waiter.sandbox_id]
+        self._in_flight -= 1
+        self._heavy_in_flight -= int(waiter.heavy)
+        self._dispatch()
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.sandbox_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.sandbox_id]
+
+    def stats(self) -> dict:
+        """Limits, current load and queue wait times."""
+        sandboxes = {}
+        for sandbox_id in set(self._sandboxes) | set(self._queues):
+            calls, commands = self._sandboxes.get(sandbox_id, (0, 0))
+            sandboxes[sandbox_id or "-"] = {
+                "in_flight": calls,
+                "heavy_in_flight": commands,
+                "queued": len(self._queues.get(sandbox_id, ())),
+            }
+        return {
+            "enabled": True,
+            "limits": {
+                "max_calls": self.max_calls,
+                "max_heavy": self.max_heavy,
+                "sandbox_max_calls": self.sandbox_max_calls,
+                "sandbox_max_commands": self.sandbox_max_commands,
+            },
+            "in_flight": self._in_flight,
+            "heavy_in_flight": self._heavy_in_flight,
+            "queued": self.queued(),
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "wait": {name: h.snapshot() for name, h in self.waits.items()},
+            "sandboxes": dict(sorted(sandboxes.items())),
+        }
+
+
+def _create_limiter() -> FairLimiter:
+    return FairLimiter(
+        max_calls=int(os.environ.get("SBX_MCP_MAX_WORKERS", "32")),
+        light_reserve=int(os.environ.get("SBX_MCP_LIGHT_RESERVE", "4")),
+        sandbox_max_calls=int(os.environ.get("SBX_MCP_SANDBOX_MAX_CALLS", "16")),
+        sandbox_max_commands=int(os.environ.get("SBX_MCP_SANDBOX_MAX_COMMANDS", "4")),
+    )
+
+
+# Process-wide admission control for tool calls
+call_limiter = _create_limiter()
@@ -0,0 +1,291 @@
+"""
+Per-tool latency and payload metrics for the E2B Sandbox MCP Server.
+
+Every tool call is recorded under its tool name: call, error and
+cancellation counts (client cancellations and deadlines),
+request/response sizes in bytes, and a latency histogram for the whole call
+and for each phase it went through:
+
+- ``admit``: waiting in the fair queue for an in-flight slot (limits.py)
+- ``queue``: waiting for a worker thread (``SBX_MCP_MAX_WORKERS``)
+- ``coalesce``: waiting for an identical read already in flight (coalesce.py)
+- ``sdk``: running the CLI module call in-process (E2B SDK time)
+- ``spawn``: starting the ``uv run sbx`` process (subprocess engine)
+- ``cli``: waiting for the ``sbx`` process to finish (subprocess engine)
+- ``parse``: decoding the CLI's JSON output (subprocess engine)
+- ``serialize``: everything else, i.e. FastMCP argument validation and
+  converting the tool result into MCP content
+
+The snapshot is served as the MCP resource ``metrics://tools``. Set
+``SBX_MCP_METRICS_FILE`` to also write it as JSON when the server exits.
+"""
+
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import anyio
+from mcp.server.fastmcp import FastMCP
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds (last bucket is unbounded)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Phase timings of the tool call running in the current context. Worker
+# threads started with anyio.to_thread inherit the context, so the engine can
+# add phases from the thread doing the work.
+_current: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "sbx_mcp_tool_phases", default=None
+)
+
+
+def _round(ms: Optional[float]) -> Optional[float]:
+    return None if ms is None else round(ms, 3)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, total and max."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (ms)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b}" for b in BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": _round(self.percentile(0.5)),
+            "p99_ms": _round(self.percentile(0.99)),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class ToolStats:
+    """Counters and histograms for one tool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = Histogram()
+        self.phases: dict[str, Histogram] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "latency": self.latency.snapshot(),
+            "phases": {name: h.snapshot() for name, h in sorted(self.phases.items())},
+        }
+
+
+class ToolMetrics:
+    """Thread-safe registry of per-tool statistics."""
+
+    def __init__(self):
+        self._tools: dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def record(
+        self,
+        tool: str,
+        duration: float,
+        phases: dict,
+        request_bytes: int,
+        response_bytes: int,
+        error: bool,
+        cancelled: bool = False,
+    ) -> None:
+        """Add one finished call (durations in seconds)."""
+        with self._lock:
+            stats = self._tools.setdefault(tool, ToolStats())
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.cancelled += int(cancelled)
+            stats.cache_hits += int(phases.pop("cache_hit", 0))
+            stats.coalesced += int(phases.pop("coalesced", 0))
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            stats.latency.add(duration * 1000)
+            for name, seconds in phases.items():
+                stats.phases.setdefault(name, Histogram()).add(seconds * 1000)
+
+    def snapshot(self) -> dict:
+        """All statistics as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "tools": {
+                    name: stats.snapshot() for name, stats in sorted(self._tools.items())
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+            self.started = time.time()
+
+    def dump(self, path: str) -> None:
+        """Write the snapshot to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+tool_metrics = ToolMetrics()
+
+
+def add_phase(name: str, seconds: float) -> None:
+    """Attribute time to a phase of the current tool call (no-op outside one)."""
+    phases = _current.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+def mark_cache_hit() -> None:
+    """Count the current tool call as served from the result cache."""
+    phases = _current.get()
+    if phases is not None:
+        phases["cache_hit"] = 1
+
+
+def mark_coalesced() -> None:
+    """Count the current tool call as served by an identical call in flight."""
+    phases = _current.get()
+    if phases is not None:
+        phases["coalesced"] = 1
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as a phase of the current tool call."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - start)
+
+
+def _payload_size(value: Any) -> int:
+    """Bytes of text in MCP content (or of the JSON encoding of anything else)."""
+    # Tools with an output schema return (content blocks, structured dict)
+    if isinstance(value, tuple):
+        value = value[0]
+    if isinstance(value, (list, tuple)) and all(hasattr(b, "type") for b in value):
+        size = 0
+        for block in value:
+            text = getattr(block, "text", None) or getattr(block, "data", None) or ""
+            size += len(text.encode("utf-8"))
+        return size
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+class MeteredFastMCP(FastMCP):
+    """FastMCP server that records every tool call in ``tool_metrics``."""
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
+        phases: dict = {}
+        token = _current.set(phases)
+        start = time.perf_counter()
+        error = True
+        cancelled = False
+        result = None
+        try:
+            result = await super().call_tool(name, arguments)
+            error = False
+            return result
+        except anyio.get_cancelled_exc_class():
+            cancelled = True
+            raise
+        except Exception as e:
+            # A deadline set by the engine (run_tool), wrapped by FastMCP
+            cancelled = isinstance(e.__cause__ or e, TimeoutError)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current.reset(token)
+
+            # Whatever the engine phases do not cover is FastMCP's own work
+            accounted = sum(
+                v for k, v in phases.items() if k not in ("cache_hit", "coalesced")
+            )
+            phases["serialize"] = max(0.0, duration - accounted)
+
+            tool_metrics.record(
+                name,
+                duration,
+                phases,
+                request_bytes=_payload_size(arguments),
+                response_bytes=_payload_size(result) if result is not None else 0,
+                error=error,
+                cancelled=cancelled,
+            )
+
+
+def process_memory() -> Optional[int]:
+    """Resident set size of this process in bytes (peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _dump_on_exit() -> None:
+    path = os.environ.get("SBX_MCP_METRICS_FILE")
+    if not path:
+        return
+    try:
+        tool_metrics.dump(path)
+    except OSError as e:
+        logger.warning(f"Could not write tool metrics to {path}: {e}")
+
+
+atexit.register(_dump_on_exit)
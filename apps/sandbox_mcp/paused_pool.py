@@ -0,0 +1,373 @@
+"""
+Pool of pre-set-up, paused sandboxes for the E2B Sandbox MCP Server.
+
+Agent forks usually start by creating a sandbox, cloning the repo and
+installing dependencies. A paused pool does that ahead of time: each pooled
+sandbox is created, set up with a list of commands (the ``execute_batch``
+step format) and paused. ``resume_sandbox(pool=...)`` then resumes one,
+which costs a resume instead of a create plus the whole setup. On a miss the
+sandbox is built inline (without pausing), so the call always returns a
+set-up sandbox; both paths are timed for comparison.
+
+Configure with ``SBX_MCP_PAUSED_POOL``, the path to a JSON file:
+
+    {
+      "my-repo": {
+        "template": "base",
+        "size": 2,
+        "envs": {"NODE_ENV": "development"},
+        "setup": [
+          "git clone --depth 1 https://github.com/org/repo /home/user/repo",
+          {"cmd": "npm ci", "cwd": "/home/user/repo", "timeout": 600}
+        ],
+        "max_age": 3600
+      }
+    }
+
+Pooled sandboxes older than ``max_age`` seconds (default 3600) are killed and
+rebuilt so the checkout does not go stale. Idle pooled sandboxes are killed
+when the server exits and rebuilt on the next start. Set
+``SBX_MCP_PAUSED_POOL_WORKERS`` (default 2) to build more in parallel.
+In-process engine only.
+
+Paused sandboxes do not time out, so a server that crashes, is SIGKILLed or
+is dropped with its stdio session would leave its pool paused forever. Each
+pooled sandbox is therefore tagged with metadata: ``sbx_mcp_pool`` (the pool
+name) and ``sbx_mcp_pool_expires`` (Unix time of build plus ``max_age``). At
+startup and every ``REAP_INTERVAL`` seconds, paused sandboxes with an
+expired tag that this server does not hold are killed, so a leak lasts at
+most ``max_age`` plus one interval once any server with the pool configured
+runs again. Metadata cannot be changed after creation: a sandbox taken from
+a pool keeps its tag, and is reaped too if its user pauses it past expiry.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from engine import ENGINE, ENGINE_INPROCESS, cmd_module, sbx_module
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Seconds between maintenance passes when nothing is taken from the pool
+REFILL_INTERVAL = 30.0
+
+# Sandbox timeout while a pooled sandbox is being set up (paused time is free)
+SETUP_TIMEOUT = 1800
+
+DEFAULT_MAX_AGE = 3600
+
+# Seconds between passes that kill expired pooled sandboxes left by any server
+REAP_INTERVAL = 600.0
+
+# Metadata keys tagging pooled sandboxes (see the module docstring)
+POOL_TAG = "sbx_mcp_pool"
+EXPIRES_TAG = "sbx_mcp_pool_expires"
+
+
+def _normalize_spec(name: str, spec: dict) -> dict:
+    """Fill defaults and turn plain string setup steps into step dicts."""
+    steps = [
+        {"cmd": s} if isinstance(s, str) else dict(s) for s in spec.get("setup", [])
+    ]
+    for step in steps:
+        if "cmd" not in step:
+            raise ValueError(f"Paused pool '{name}': every setup step needs a 'cmd'")
+    return {
+        "template": spec.get("template"),
+        "size": int(spec.get("size", 1)),
+        "envs": spec.get("envs") or None,
+        "setup": steps,
+        "max_age": float(spec.get("max_age", DEFAULT_MAX_AGE)),
+    }
+
+
+class PausedPool:
+    """
+    Named pools of set-up, paused sandboxes with background refill.
+
+    Args:
+        specs: Pool name -> {"template", "size", "envs", "setup", "max_age"}
+        build_workers: Sandboxes built in parallel while refilling
+    """
+
+    def __init__(self, specs: dict[str, dict], build_workers: int = 2):
+        self.specs = {name: _normalize_spec(name, s) for name, s in specs.items()}
+        self._idle: dict[str, deque] = {name: deque() for name in self.specs}
+        self._pending: dict[str, int] = {name: 0 for name in self.specs}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=build_workers, thread_name_prefix="sbx-paused-pool"
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._last_reap: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.built = 0
+        self.build_errors = 0
+        self.expired = 0
+        self.discarded = 0
+        self.reaped = 0
+        # Resume of a pooled sandbox vs create + setup (background or inline)
+        self.resume_latency = Histogram()
+        self.build_latency = Histogram()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.specs)
+
+    def start(self) -> None:
+        """Start the background refill thread."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._maintain, name="sbx-paused-pool-refill", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop refilling and kill the sandboxes still waiting in the pool."""
+        self._closed.set()
+        self._wake.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            idle = [sid for queue in self._idle.values() for sid, _ in queue]
+            for queue in self._idle.values():
+                queue.clear()
+        for sandbox_id in idle:
+            self._kill(sandbox_id)
+
+    def take(self, name: str, timeout: int) -> tuple[Any, bool]:
+        """
+        Resume a set-up sandbox from a pool, building one inline on a miss.
+
+        Args:
+            name: Pool name
+            timeout: Timeout for the returned sandbox in seconds
+
+        Returns:
+            (Sandbox, resumed) where resumed is False if it was built inline
+
+        Raises:
+            ValueError: If the pool is not configured
+            RuntimeError: If an inline build fails
+        """
+        if name not in self.specs:
+            configured = ", ".join(self.specs) or "none"
+            raise ValueError(f"Unknown paused pool '{name}' (configured: {configured})")
+
+        max_age = self.specs[name]["max_age"]
+        while True:
+            with self._lock:
+                queue = self._idle[name]
+                entry = queue.popleft() if queue else None
+            if entry is None:
+                break
+
+            sandbox_id, paused_at = entry
+            if time.monotonic() - paused_at > max_age:
+                with self._lock:
+                    self.expired += 1
+                self._kill(sandbox_id)
+                continue
+
+            start = time.perf_counter()
+            try:
+                sbx = sbx_module.resume_sandbox(sandbox_id, timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Discarding paused sandbox {sandbox_id}: {e}")
+                with self._lock:
+                    self.discarded += 1
+                self._kill(sandbox_id)
+                continue
+
+            with self._lock:
+                self.hits += 1
+                self.resume_latency.add((time.perf_counter() - start) * 1000)
+            self._wake.set()
+            return sbx, True
+
+        with self._lock:
+            self.misses += 1
+        self._wake.set()
+        return self._build(name, timeout), False
+
+    def stats(self) -> dict:
+        """Occupancy, hit/miss counters and resume vs build latency."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "pools": {
+                    name: {
+                        "template": spec["template"] or "base",
+                        "size": spec["size"],
+                        "idle": len(self._idle[name]),
+                        "pending": self._pending[name],
+                        "setup_steps": len(spec["setup"]),
+                    }
+                    for name, spec in self.specs.items()
+                },
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "built": self.built,
+                "build_errors": self.build_errors,
+                "expired": self.expired,
+                "discarded": self.discarded,
+                "reaped": self.reaped,
+                "resume_latency": self.resume_latency.snapshot(),
+                "build_latency": self.build_latency.snapshot(),
+            }
+
+    def _build(self, name: str, timeout: int, pooled: bool = False) -> Any:
+        """Create a sandbox and run the pool's setup steps on it."""
+        spec = self.specs[name]
+        start = time.perf_counter()
+        metadata = None
+        if pooled:
+            # Lets any server reap it if this one dies before killing it
+            expires = int(time.time() + spec["max_age"])
+            metadata = {POOL_TAG: name, EXPIRES_TAG: str(expires)}
+        sbx = sbx_module.create_sandbox(
+            template=spec["template"],
+            timeout=timeout,
+            envs=spec["envs"],
+            metadata=metadata,
+        )
+
+        try:
+            result = cmd_module.run_batch(sbx.sandbox_id, spec["setup"], max_output=500)
+        except Exception:
+            self._kill(sbx.sandbox_id)
+            raise
+        if not result["success"]:
+            self._kill(sbx.sandbox_id)
+            failed = result["steps"][result["failed"][0]]
+            detail = failed.get("error") or failed["stderr"]
+            raise RuntimeError(
+                f"Paused pool '{name}' setup failed at '{failed['cmd']}' "
+                f"(exit {failed['exit_code']}): {detail}"
+            )
+
+        with self._lock:
+            self.built += 1
+            self.build_latency.add((time.perf_counter() - start) * 1000)
+        return sbx
+
+    def _maintain(self) -> None:
+        while not self._closed.is_set():
+            now = time.monotonic()
+            if self._last_reap is None or now - self._last_reap >= REAP_INTERVAL:
+                self._last_reap = now
+                self._reap_orphans()
+            self._evict_expired()
+            self._refill()
+            self._wake.wait(REFILL_INTERVAL)
+            self._wake.clear()
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for name, queue in self._idle.items():
+                max_age = self.specs[name]["max_age"]
+                while queue and now - queue[0][1] > max_age:
+                    stale.append(queue.popleft()[0])
+            self.expired += len(stale)
+        for sandbox_id in stale:
+            self._kill(sandbox_id)
+
+    def _reap_orphans(self) -> None:
+        """Kill expired, paused pool sandboxes this server does not hold."""
+        now = time.time()
+        with self._lock:
+            held = {sid for queue in self._idle.values() for sid, _ in queue}
+        for name in self.specs:
+            try:
+                tagged = sbx_module.list_sandboxes(
+                    limit=100, metadata={POOL_TAG: name}, state=["paused"]
+                )
+            except Exception as e:
+                logger.warning(f"Could not list paused pool '{name}' sandboxes: {e}")
+                continue
+            for info in tagged:
+                try:
+                    expires = float((info["metadata"] or {}).get(EXPIRES_TAG, "inf"))
+                except ValueError:
+                    expires = 0.0
+                if info["sandbox_id"] in held or expires > now:
+                    continue
+                logger.info(f"Reaping orphaned paused pool sandbox {info['sandbox_id']}")
+                with self._lock:
+                    self.reaped += 1
+                self._kill(info["sandbox_id"])
+
+    def _refill(self) -> None:
+        with self._lock:
+            for name, spec in self.specs.items():
+                missing = spec["size"] - len(self._idle[name]) - self._pending[name]
+                for _ in range(max(0, missing)):
+                    self._pending[name] += 1
+                    self._executor.submit(self._fill, name)
+
+    def _fill(self, name: str) -> None:
+        sbx = None
+        try:
+            sbx = self._build(name, SETUP_TIMEOUT, pooled=True)
+            sbx_module.pause_sandbox(sbx.sandbox_id)
+        except Exception as e:
+            logger.warning(f"Could not build paused pool '{name}' sandbox: {e}")
+            if sbx is not None:
+                # Built but not paused: it would keep running untracked
+                self._kill(sbx.sandbox_id)
+            with self._lock:
+                self._pending[name] -= 1
+                self.build_errors += 1
+            # Back off until the next maintenance pass instead of retrying hot
+            return
+
+        with self._lock:
+            self._pending[name] -= 1
+            closed = self._closed.is_set()
+            if not closed:
+                self._idle[name].append((sbx.sandbox_id, time.monotonic()))
+        if closed:
+            self._kill(sbx.sandbox_id)
+
+    @staticmethod
+    def _kill(sandbox_id: str) -> None:
+        try:
+            sbx_module.kill_sandbox(sandbox_id)
+        except Exception as e:
+            logger.warning(f"Could not kill pooled sandbox {sandbox_id}: {e}")
+
+
+def _create_pool() -> PausedPool:
+    path = os.environ.get("SBX_MCP_PAUSED_POOL")
+    specs = {}
+    if path:
+        if ENGINE != ENGINE_INPROCESS:
+            logger.warning("SBX_MCP_PAUSED_POOL needs the in-process engine; disabled")
+        else:
+            with open(path) as f:
+                specs = json.load(f)
+    return PausedPool(
+        specs,
+        build_workers=int(os.environ.get("SBX_MCP_PAUSED_POOL_WORKERS", "2")),
+    )
+
+
+# Process-wide pool; start() is called by the server at startup
+paused_pool = _create_pool()
+atexit.register(paused_pool.close)
@@ -0,0 +1,322 @@
+"""
+Warm sandbox pool for the E2B Sandbox MCP Server.
+
+Creating a sandbox is the slowest step at the start of every agent fork. The
+pool keeps pre-created sandboxes per template and refills them on a
+background thread, so ``init_sandbox`` / ``create_sandbox`` calls that match
+a pooled template are served without waiting for ``Sandbox.create``.
+
+A request matches when its template is pooled, its env vars equal the ones
+the template's pooled sandboxes were created with (none unless configured)
+and it does not ask for auto-pause (both are fixed at creation). The requested timeout is applied
+when the sandbox is handed out (``set_timeout`` restarts the lifetime), which
+doubles as a liveness check. Pooled sandboxes older than the max age are
+killed and replaced; they are created with a timeout just past the max age,
+so they expire on their own if the server dies.
+
+Configuration (in-process engine only):
+    SBX_MCP_POOL              Template sizes, e.g. "base=2,my-template=1"
+                              (default: empty, pool disabled)
+    SBX_MCP_POOL_MAX_AGE      Seconds a pooled sandbox may wait (default 600)
+    SBX_MCP_POOL_FILL_WORKERS Parallel creations while refilling (default 4)
+    SBX_MCP_POOL_ENVS         JSON object of env vars per pooled template, e.g.
+                              '{"base": {"API_URL": "..."}}' (default: none)
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from engine import ENGINE, ENGINE_INPROCESS, connections, sbx_module
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "base"
+
+# Seconds between maintenance passes when nothing is taken from the pool
+REFILL_INTERVAL = 10.0
+
+# Pooled sandboxes outlive the max age by this much, then expire themselves
+EXPIRY_MARGIN = 60
+
+# Served sandboxes that never run a command are forgotten after this long
+SERVED_TTL = 3600
+
+
+def _parse_sizes(spec: str) -> dict[str, int]:
+    """Parse "template=size,..." (a bare template name means size 1)."""
+    sizes = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        template, _, size = item.partition("=")
+        sizes[template.strip()] = int(size) if size else 1
+    return sizes
+
+
+class SandboxPool:
+    """
+    Pre-created sandboxes per template with background refill.
+
+    Args:
+        sizes: Number of warm sandboxes to keep per template
+        max_age: Seconds a pooled sandbox may wait before it is replaced
+        fill_workers: Sandboxes created in parallel while refilling
+        envs: Env vars the pooled sandboxes of each template are created with
+    """
+
+    def __init__(
+        self,
+        sizes: dict[str, int],
+        max_age: float = 600,
+        fill_workers: int = 4,
+        envs: Optional[dict[str, dict]] = None,
+    ):
+        self.sizes = {t: n for t, n in sizes.items() if n > 0}
+        self.envs = {t: dict((envs or {}).get(t) or {}) for t in self.sizes}
+        self.max_age = max_age
+        self._idle: dict[str, deque] = {t: deque() for t in self.sizes}
+        self._pending: dict[str, int] = {t: 0 for t in self.sizes}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=fill_workers, thread_name_prefix="sbx-pool"
+        )
+        self._thread: Optional[threading.Thread] = None
+
+        # Creation time per sandbox served by the server, until its first command
+        self._served: dict[str, tuple[float, bool]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.created = 0
+        self.create_errors = 0
+        self.expired = 0
+        self.discarded = 0
+        self.first_command = {True: Histogram(), False: Histogram()}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sizes)
+
+    def start(self) -> None:
+        """Start the background refill thread."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._maintain, name="sbx-pool-refill", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop refilling and kill the sandboxes still waiting in the pool."""
+        self._closed.set()
+        self._wake.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            idle = [sbx for queue in self._idle.values() for sbx, _ in queue]
+            for queue in self._idle.values():
+                queue.clear()
+        for sbx in idle:
+            self._kill(sbx)
+
+    def take(
+        self,
+        template: Optional[str],
+        timeout: int,
+        envs: Optional[dict] = None,
+        auto_pause: bool = False,
+    ) -> Optional[Any]:
+        """
+        Hand out a warm sandbox matching the request.
+
+        Args:
+            template: Requested template (None means the default template)
+            timeout: Requested sandbox timeout in seconds
+            envs: Requested env vars (must equal the template's pooled ones)
+            auto_pause: Requested auto-pause (pooled sandboxes have none)
+
+        Returns:
+            A running Sandbox with its timeout reset, or None on a miss
+        """
+        template = template or DEFAULT_TEMPLATE
+        if (
+            auto_pause
+            or template not in self.sizes
+            or (envs or {}) != self.envs[template]
+        ):
+            with self._lock:
+                self.bypasses += 1
+            return None
+
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                queue = self._idle[template]
+                entry = queue.popleft() if queue else None
+                if entry is None:
+                    self.misses += 1
+            if entry is None:
+                self._wake.set()
+                return None
+
+            sbx, created = entry
+            if now - created > self.max_age:
+                with self._lock:
+                    self.expired += 1
+                self._kill(sbx)
+                continue
+
+            try:
+                sbx.set_timeout(timeout)
+            except Exception as e:
+                logger.warning(f"Discarding pooled sandbox {sbx.sandbox_id}: {e}")
+                with self._lock:
+                    self.discarded += 1
+                continue
+
+            with self._lock:
+                self.hits += 1
+            self._wake.set()
+            return sbx
+
+    def served(self, sandbox_id: str, started: float, pooled: bool) -> None:
+        """Note a sandbox handed to a client (started: perf_counter at request)."""
+        cutoff = time.perf_counter() - SERVED_TTL
+        with self._lock:
+            stale = [sid for sid, (t, _) in self._served.items() if t < cutoff]
+            for sid in stale:
+                del self._served[sid]
+            self._served[sandbox_id] = (started, pooled)
+
+    def forget(self, sandbox_id: str) -> None:
+        """Drop a served sandbox that will not run a command (e.g. killed)."""
+        with self._lock:
+            self._served.pop(sandbox_id, None)
+
+    def command_started(self, sandbox_id: str) -> None:
+        """Record time-to-first-command for a sandbox served by this server."""
+        now = time.perf_counter()
+        with self._lock:
+            entry = self._served.pop(sandbox_id, None)
+            if entry is not None:
+                started, pooled = entry
+                self.first_command[pooled].add((now - started) * 1000)
+
+    def stats(self) -> dict:
+        """Pool occupancy, hit/miss counters and time-to-first-command."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "max_age": self.max_age,
+                "templates": {
+                    t: {
+                        "size": n,
+                        "idle": len(self._idle[t]),
+                        "pending": self._pending[t],
+                        "envs": sorted(self.envs[t]),
+                    }
+                    for t, n in self.sizes.items()
+                },
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "created": self.created,
+                "create_errors": self.create_errors,
+                "expired": self.expired,
+                "discarded": self.discarded,
+                "time_to_first_command": {
+                    "pooled": self.first_command[True].snapshot(),
+                    "cold": self.first_command[False].snapshot(),
+                },
+            }
+
+    def _maintain(self) -> None:
+        while not self._closed.is_set():
+            self._evict_expired()
+            self._refill()
+            self._wake.wait(REFILL_INTERVAL)
+            self._wake.clear()
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for queue in self._idle.values():
+                while queue and now - queue[0][1] > self.max_age:
+                    stale.append(queue.popleft()[0])
+            self.expired += len(stale)
+        for sbx in stale:
+            self._kill(sbx)
+
+    def _refill(self) -> None:
+        with self._lock:
+            for template, size in self.sizes.items():
+                missing = size - len(self._idle[template]) - self._pending[template]
+                for _ in range(max(0, missing)):
+                    self._pending[template] += 1
+                    self._executor.submit(self._create, template)
+
+    def _create(self, template: str) -> None:
+        try:
+            sbx = sbx_module.create_sandbox(
+                template=template,
+                timeout=int(self.max_age + EXPIRY_MARGIN),
+                envs=self.envs[template] or None,
+                metadata={"sbx_pool": template},
+            )
+        except Exception as e:
+            logger.warning(f"Could not create pooled {template} sandbox: {e}")
+            with self._lock:
+                self._pending[template] -= 1
+                self.create_errors += 1
+            # Back off until the next maintenance pass instead of retrying hot
+            return
+
+        with self._lock:
+            self._pending[template] -= 1
+            self.created += 1
+            closed = self._closed.is_set()
+            if not closed:
+                self._idle[template].append((sbx, time.monotonic()))
+        if closed:
+            self._kill(sbx)
+
+    @staticmethod
+    def _kill(sbx: Any) -> None:
+        try:
+            sbx.kill()
+        except Exception as e:
+            logger.warning(f"Could not kill pooled sandbox {sbx.sandbox_id}: {e}")
+        if connections is not None:
+            connections.evict(sbx.sandbox_id)
+
+
+def _create_pool() -> SandboxPool:
+    sizes = _parse_sizes(os.environ.get("SBX_MCP_POOL", ""))
+    if sizes and ENGINE != ENGINE_INPROCESS:
+        logger.warning("SBX_MCP_POOL needs the in-process engine; pool disabled")
+        sizes = {}
+    return SandboxPool(
+        sizes,
+        max_age=float(os.environ.get("SBX_MCP_POOL_MAX_AGE", "600")),
+        fill_workers=int(os.environ.get("SBX_MCP_POOL_FILL_WORKERS", "4")),
+        envs=json.loads(os.environ.get("SBX_MCP_POOL_ENVS") or "{}"),
+    )
+
+
+# Process-wide pool; start() is called by the server at startup
+sandbox_pool = _create_pool()
+atexit.register(sandbox_pool.close)
@@ -0,0 +1,137 @@
+"""
+Streaming command output as MCP progress notifications.
+
+The E2B SDK calls ``on_stdout``/``on_stderr`` from the worker thread running
+the command, once per output chunk. Forwarding each chunk as its own
+notification would flood the client during a chatty ``npm install``, so
+chunks are coalesced and flushed at most once per ``SBX_MCP_PROGRESS_INTERVAL``
+seconds (default 1.0). Each notification carries at most
+``SBX_MCP_PROGRESS_MAX_CHARS`` (default 4096) characters: the tail of what
+arrived in that window. Notification volume is therefore bounded no matter
+how fast the command writes.
+
+Periodic notifications are sent without blocking the command's output, but
+leaving the context waits (up to ``FLUSH_TIMEOUT`` seconds) until every
+notification, including the final flush, has been sent. Progress therefore
+never reaches the client after the tool result; some clients drop or reject
+progress for a request that has already completed.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Optional
+
+from mcp.server.fastmcp import Context
+
+PROGRESS_INTERVAL = float(os.environ.get("SBX_MCP_PROGRESS_INTERVAL", "1.0"))
+PROGRESS_MAX_CHARS = int(os.environ.get("SBX_MCP_PROGRESS_MAX_CHARS", "4096"))
+
+# Seconds to wait for pending notifications when the command finishes
+FLUSH_TIMEOUT = 5.0
+
+
+def wants_progress(ctx: Optional[Context]) -> bool:
+    """True when the current request carries a progress token."""
+    if ctx is None:
+        return False
+    try:
+        meta = ctx.request_context.meta
+    except ValueError:
+        # Called outside of an MCP request (e.g. from a benchmark)
+        return False
+    return meta is not None and meta.progressToken is not None
+
+
+class OutputProgress:
+    """
+    Coalesce command output chunks into bounded progress notifications.
+
+    Use as a context manager from the async tool, then pass ``on_stdout`` and
+    ``on_stderr`` to the command. Progress is the number of output
+    characters seen so far; the message is the latest output.
+
+    Args:
+        ctx: MCP request context used to send notifications
+        interval: Minimum seconds between notifications
+        max_chars: Maximum characters per notification (tail kept)
+    """
+
+    def __init__(
+        self,
+        ctx: Context,
+        interval: float = PROGRESS_INTERVAL,
+        max_chars: int = PROGRESS_MAX_CHARS,
+    ):
+        self.ctx = ctx
+        self.interval = interval
+        self.max_chars = max_chars
+        self.notifications = 0
+        self._loop = asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._buffer: list[str] = []
+        self._buffered = 0
+        self._skipped = 0
+        self._seen = 0
+        self._done = threading.Event()
+        self._sending: list[concurrent.futures.Future] = []
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+
+    def __enter__(self) -> "OutputProgress":
+        self._flusher.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._done.set()
+        self._flusher.join()
+        self._flush()
+        # Runs on the worker thread; the event loop is free to send meanwhile
+        concurrent.futures.wait(self._sending, timeout=FLUSH_TIMEOUT)
+
+    def on_stdout(self, chunk: str) -> None:
+        self._add(chunk)
+
+    def on_stderr(self, chunk: str) -> None:
+        self._add(chunk)
+
+    def _add(self, chunk: str) -> None:
+        with self._lock:
+            self._buffer.append(chunk)
+            self._buffered += len(chunk)
+            self._seen += len(chunk)
+
+            # Only the tail is ever sent, so keep the buffer bounded too
+            if self._buffered > 2 * self.max_chars:
+                text = "".join(self._buffer)
+                self._skipped += len(text) - self.max_chars
+                self._buffer = [text[-self.max_chars :]]
+                self._buffered = self.max_chars
+
+    def _flush_periodically(self) -> None:
+        while not self._done.wait(self.interval):
+            self._flush()
+
+    def _flush(self) -> None:
+        with self._lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            skipped = self._skipped + max(0, len(text) - self.max_chars)
+            seen = self._seen
+            self._buffer = []
+            self._buffered = 0
+            self._skipped = 0
+            self.notifications += 1
+
+        if skipped:
+            text = f"...[{skipped} chars skipped]...\n" + text[-self.max_chars :]
+
+        # Not awaited here: never block the command's output stream on the
+        # client (__exit__ waits for whatever is still being sent)
+        future = asyncio.run_coroutine_threadsafe(
+            self.ctx.report_progress(seen, message=text), self._loop
+        )
+        with self._lock:
+            self._sending = [f for f in self._sending if not f.done()]
+            self._sending.append(future)
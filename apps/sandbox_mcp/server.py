@@ -3,77 +3,146 @@
 E2B Sandbox MCP Server
 
 MCP server that wraps the E2B Sandbox CLI, providing tools for managing
-sandboxes, executing commands, and manipulating files. All tools call the
-underlying CLI via subprocess.
+sandboxes, executing commands, and manipulating files. Tools call the CLI's
+reusable modules in-process by default, or the CLI itself via subprocess
+(see engine.py).
 
 Usage:
     uv run mcp dev server.py
     uv run mcp install server.py
+
+    # One shared server for many agents (streamable HTTP at /mcp)
+    uv run python server.py --transport streamable-http --port 8765
 """
 
+import argparse
 import json
+import logging
 import os
-import subprocess
+import posixpath
+import time
 from pathlib import Path
 from typing import Optional
 
-from mcp.server.fastmcp import FastMCP
-
-# Initialize FastMCP server
-mcp = FastMCP(
+from mcp.server.fastmcp import Context
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from cache import ANY_PATH, result_cache
+from coalesce import single_flight
+from engine import (
+    ENGINE,
+    ENGINE_INPROCESS,
+    cmd_module,
+    connections,
+    files_module,
+    git_module,
+    remote_started,
+    run_tool,
+    sbx_module,
+)
+from limits import call_limiter
+from metrics import MeteredFastMCP, process_memory, tool_metrics
+from paused_pool import paused_pool
+from pool import sandbox_pool
+from progress import OutputProgress, wants_progress
+
+# Initialize FastMCP server (records per-tool metrics, see metrics.py)
+mcp = MeteredFastMCP(
     "E2B Sandbox Manager",
     instructions="Manage E2B sandboxes for isolated code execution. Create sandboxes, execute commands, "
     "manage files, and control sandbox lifecycle. All operations are performed securely within isolated "
     "cloud environments.",
 )
 
-# Path to the CLI project (sibling directory)
-CLI_PATH = Path(__file__).parent.parent / "sandbox_cli"
+logger = logging.getLogger(__name__)
 
+STARTED_AT = time.monotonic()
 
-def run_sbx_cli(*args) -> dict:
-    """
-    Execute sbx CLI command and return parsed JSON or structured output.
+# Seconds a call may run past its commands' own timeouts before it is cancelled
+DEADLINE_GRACE = 30
 
-    Args:
-        *args: CLI arguments to pass to sbx command
+# Start filling the sandbox pools (no-ops unless configured)
+sandbox_pool.start()
+paused_pool.start()
 
-    Returns:
-        Parsed output from the CLI (dict or string)
 
-    Raises:
-        RuntimeError: If CLI command fails
-    """
-    cmd = ["uv", "run", "sbx", *args]
+def _parse_env_vars(env_vars: Optional[str]) -> Optional[dict]:
+    """Parse comma-separated KEY=VALUE pairs the same way the CLI parses --env."""
+    if not env_vars:
+        return None
 
-    # Create clean environment without VIRTUAL_ENV to avoid uv conflicts
-    env = os.environ.copy()
-    env.pop("VIRTUAL_ENV", None)
+    envs = {}
+    for env_pair in env_vars.split(","):
+        if "=" in env_pair:
+            key, value = env_pair.strip().split("=", 1)
+            envs[key] = value
+    return envs or None
 
-    try:
-        result = subprocess.run(
-            cmd,
-            cwd=CLI_PATH,
-            env=env,
-            capture_output=True,
-            text=True,
-            check=True,
+
+def _create_sandbox(
+    template: Optional[str],
+    timeout: int,
+    env_vars: Optional[str],
+    auto_pause: bool = False,
+) -> dict:
+    """Create a sandbox in-process (warm pool first), described like the CLI does."""
+    started = time.perf_counter()
+    envs = _parse_env_vars(env_vars)
+
+    sbx = sandbox_pool.take(template, timeout, envs=envs, auto_pause=auto_pause)
+    pooled = sbx is not None
+    if not pooled:
+        sbx = sbx_module.create_sandbox(
+            template=template,
+            timeout=timeout,
+            envs=envs,
+            auto_pause=auto_pause,
         )
 
-        # Try to parse as JSON, otherwise return raw output
-        try:
-            return json.loads(result.stdout)
-        except json.JSONDecodeError:
-            return {"output": result.stdout.strip(), "success": True}
+    # The new handle is already connected; let the first command reuse it
+    cache = connections.get_cache()
+    if cache is not None:
+        cache.put(sbx.sandbox_id, sbx)
+
+    sandbox_pool.served(sbx.sandbox_id, started, pooled)
+    return {
+        "sandbox_id": sbx.sandbox_id,
+        "template": template or "base",
+        "timeout": timeout,
+        "auto_pause": auto_pause,
+        "pooled": pooled,
+    }
+
+
+def _kill_abandoned(result: dict) -> None:
+    """Kill a sandbox created for a call that was cancelled meanwhile."""
+    logger.info(f"Killing sandbox {result['sandbox_id']} of a cancelled call")
+    sbx_module.kill_sandbox(result["sandbox_id"])
+
+
+def _command_deadline(timeouts: list[int]) -> Optional[float]:
+    """
+    Deadline for commands with their own timeouts: their sum plus
+    DEADLINE_GRACE, or None (the server default) if any is unlimited.
+    """
+    if any(t <= 0 for t in timeouts):
+        return None
+    return sum(timeouts) + DEADLINE_GRACE
 
-    except subprocess.CalledProcessError as e:
-        # Include both stdout and stderr for complete error context
-        error_msg = f"CLI command failed with exit code {e.returncode}"
-        if e.stdout and e.stdout.strip():
-            error_msg += f"\nOutput: {e.stdout.strip()}"
-        if e.stderr and e.stderr.strip():
-            error_msg += f"\nError: {e.stderr.strip()}"
-        raise RuntimeError(error_msg) from e
+
+def _dir_transfer_args(
+    include: Optional[list[str]], exclude: Optional[list[str]]
+) -> list[str]:
+    """CLI flags for upload_dir/download_dir globs (exclude=None keeps the defaults)."""
+    args = []
+    for pattern in include or []:
+        args.extend(["--include", pattern])
+    if exclude is not None:
+        args.append("--no-default-excludes")
+        for pattern in exclude:
+            args.extend(["--exclude", pattern])
+    return args
 
 
 # ========================================
@@ -82,7 +151,7 @@ def run_sbx_cli(*args) -> dict:
 
 
 @mcp.tool()
-def init_sandbox(
+async def init_sandbox(
     template: Optional[str] = None,
     timeout: int = 300,
     env_vars: Optional[str] = None,
@@ -107,7 +176,11 @@ def init_sandbox(
         for env_pair in env_vars.split(","):
             args.extend(["--env", env_pair.strip()])
 
-    return run_sbx_cli(*args)
+    return await run_tool(
+        args,
+        lambda: _create_sandbox(template, timeout, env_vars),
+        on_abandon=_kill_abandoned,
+    )
 
 
 # ========================================
@@ -116,7 +189,7 @@ def init_sandbox(
 
 
 @mcp.tool()
-def create_sandbox(
+async def create_sandbox(
     template: Optional[str] = None,
     timeout: int = 300,
     env_vars: Optional[str] = None,
@@ -146,11 +219,15 @@ def create_sandbox(
     if auto_pause:
         args.append("--auto-pause")
 
-    return run_sbx_cli(*args)
+    return await run_tool(
+        args,
+        lambda: _create_sandbox(template, timeout, env_vars, auto_pause),
+        on_abandon=_kill_abandoned,
+    )
 
 
 @mcp.tool()
-def connect_sandbox(sandbox_id: str, timeout: Optional[int] = None) -> dict:
+async def connect_sandbox(sandbox_id: str, timeout: Optional[int] = None) -> dict:
     """
     Connect to an existing sandbox to verify it's running.
 
@@ -165,11 +242,15 @@ def connect_sandbox(sandbox_id: str, timeout: Optional[int] = None) -> dict:
     if timeout:
         args.extend(["--timeout", str(timeout)])
 
-    return run_sbx_cli(*args)
+    def connect() -> dict:
+        sbx = sbx_module.get_sandbox(sandbox_id, timeout=timeout)
+        return {"sandbox_id": sandbox_id, "running": sbx.is_running()}
+
+    return await run_tool(args, connect, sandbox_id=sandbox_id)
 
 
 @mcp.tool()
-def kill_sandbox(sandbox_id: str) -> dict:
+async def kill_sandbox(sandbox_id: str) -> dict:
     """
     Kill/terminate a sandbox.
 
@@ -179,11 +260,82 @@ def kill_sandbox(sandbox_id: str) -> dict:
     Returns:
         Success confirmation
     """
-    return run_sbx_cli("sandbox", "kill", sandbox_id)
+    sandbox_pool.forget(sandbox_id)
+    return await run_tool(
+        ["sandbox", "kill", sandbox_id],
+        lambda: {
+            "sandbox_id": sandbox_id,
+            "killed": sbx_module.kill_sandbox(sandbox_id),
+        },
+        sandbox_id=sandbox_id,
+        touches=[ANY_PATH],
+    )
 
 
 @mcp.tool()
-def get_sandbox_info(sandbox_id: str) -> dict:
+async def resume_sandbox(
+    sandbox_id: Optional[str] = None,
+    pool: Optional[str] = None,
+    timeout: int = 300,
+) -> dict:
+    """
+    Resume a paused sandbox, or start from a pre-set-up paused pool.
+
+    Pass sandbox_id to resume that sandbox. Pass pool to get a sandbox that
+    already has the pool's repo/dependencies set up (resumed from the pool,
+    or built on the spot if the pool is empty).
+
+    Args:
+        sandbox_id: The paused sandbox to resume
+        pool: Name of a configured paused pool (instead of sandbox_id)
+        timeout: Timeout for the resumed sandbox in seconds (default: 300)
+
+    Returns:
+        Dict with sandbox_id, whether it was resumed, and the duration
+    """
+    if (sandbox_id is None) == (pool is None):
+        raise ValueError("Pass exactly one of sandbox_id or pool")
+
+    if pool is not None:
+        # Pools live in this process; there is no CLI command to fall back to
+        if ENGINE != ENGINE_INPROCESS:
+            raise ValueError(
+                "Paused pools need the in-process engine "
+                f"(SBX_MCP_ENGINE={ENGINE_INPROCESS})"
+            )
+        if not paused_pool.enabled:
+            raise ValueError("No paused pools configured (set SBX_MCP_PAUSED_POOL)")
+
+        def resume_from_pool() -> dict:
+            start = time.monotonic()
+            sbx, resumed = paused_pool.take(pool, timeout)
+            return {
+                "sandbox_id": sbx.sandbox_id,
+                "pool": pool,
+                "resumed": resumed,
+                "duration": round(time.monotonic() - start, 3),
+            }
+
+        return await run_tool([], resume_from_pool, on_abandon=_kill_abandoned)
+
+    def resume() -> dict:
+        start = time.monotonic()
+        sbx_module.resume_sandbox(sandbox_id, timeout=timeout)
+        return {
+            "sandbox_id": sandbox_id,
+            "resumed": True,
+            "duration": round(time.monotonic() - start, 3),
+        }
+
+    return await run_tool(
+        ["sandbox", "resume", sandbox_id, "--timeout", str(timeout)],
+        resume,
+        sandbox_id=sandbox_id,
+    )
+
+
+@mcp.tool()
+async def get_sandbox_info(sandbox_id: str) -> dict:
     """
     Get detailed information about a sandbox.
 
@@ -193,11 +345,15 @@ def get_sandbox_info(sandbox_id: str) -> dict:
     Returns:
         Sandbox metadata including template, started time, etc.
     """
-    return run_sbx_cli("sandbox", "info", sandbox_id)
+    return await run_tool(
+        ["sandbox", "info", sandbox_id],
+        lambda: sbx_module.get_sandbox_info(sandbox_id),
+        sandbox_id=sandbox_id,
+    )
 
 
 @mcp.tool()
-def check_sandbox_status(sandbox_id: str) -> dict:
+async def check_sandbox_status(sandbox_id: str) -> dict:
     """
     Check if a sandbox is currently running.
 
@@ -207,11 +363,18 @@ def check_sandbox_status(sandbox_id: str) -> dict:
     Returns:
         Running status (true/false)
     """
-    return run_sbx_cli("sandbox", "status", sandbox_id)
+    return await run_tool(
+        ["sandbox", "status", sandbox_id],
+        lambda: {
+            "sandbox_id": sandbox_id,
+            "running": sbx_module.is_sandbox_running(sandbox_id),
+        },
+        sandbox_id=sandbox_id,
+    )
 
 
 @mcp.tool()
-def get_host(sandbox_id: str, port: int) -> dict:
+async def get_host(sandbox_id: str, port: int) -> dict:
     """
     Get the public hostname for an exposed port in the sandbox.
 
@@ -222,11 +385,24 @@ def get_host(sandbox_id: str, port: int) -> dict:
     Returns:
         Public URL for the exposed port (e.g., https://xxxxx.e2b.app)
     """
-    return run_sbx_cli("sandbox", "get-host", sandbox_id, "--port", str(port))
+    def host() -> dict:
+        hostname = sbx_module.get_host(sandbox_id, port)
+        return {
+            "sandbox_id": sandbox_id,
+            "port": port,
+            "host": hostname,
+            "url": f"https://{hostname}",
+        }
+
+    return await run_tool(
+        ["sandbox", "get-host", sandbox_id, "--port", str(port)],
+        host,
+        sandbox_id=sandbox_id,
+    )
 
 
 @mcp.tool()
-def list_sandboxes(limit: int = 20) -> dict:
+async def list_sandboxes(limit: int = 20) -> dict:
     """
     List all running sandboxes.
 
@@ -236,11 +412,14 @@ def list_sandboxes(limit: int = 20) -> dict:
     Returns:
         List of running sandboxes with their metadata
     """
-    return run_sbx_cli("sandbox", "list", "--limit", str(limit))
+    return await run_tool(
+        ["sandbox", "list", "--limit", str(limit)],
+        lambda: {"sandboxes": sbx_module.list_sandboxes(limit=limit)},
+    )
 
 
 @mcp.tool()
-def pause_sandbox(sandbox_id: str) -> dict:
+async def pause_sandbox(sandbox_id: str) -> dict:
     """
     Pause a sandbox (beta feature).
 
@@ -250,7 +429,16 @@ def pause_sandbox(sandbox_id: str) -> dict:
     Returns:
         Success confirmation
     """
-    return run_sbx_cli("sandbox", "pause", sandbox_id)
+    def pause() -> dict:
+        sbx_module.pause_sandbox(sandbox_id)
+        return {"sandbox_id": sandbox_id, "paused": True}
+
+    return await run_tool(
+        ["sandbox", "pause", sandbox_id],
+        pause,
+        sandbox_id=sandbox_id,
+        touches=[ANY_PATH],
+    )
 
 
 # ========================================
@@ -259,38 +447,224 @@ def pause_sandbox(sandbox_id: str) -> dict:
 
 
 @mcp.tool()
-def list_files(sandbox_id: str, path: str = "/", depth: int = 1) -> dict:
+async def list_files(
+    sandbox_id: str,
+    path: str = "/",
+    depth: int = 1,
+    compact: bool = False,
+    max_entries: int = 2000,
+    cursor: Optional[str] = None,
+    permissions: bool = False,
+) -> dict:
     """
     List files and directories in a sandbox path.
 
+    By default each entry is one {name, path, type, size, permissions}
+    object, unpaged. For deep listings pass compact=true, which sends
+    columns instead: entry i is named name[i], lives in dirs[dir[i]]
+    (relative to path, "" is path itself), has type type[i] ("f" file, "d"
+    dir, "l" symlink) and size size[i]. Compact listings are paged: if
+    next_cursor is set, call again with cursor=next_cursor for the rest.
+
     Args:
         sandbox_id: The sandbox ID
         path: Directory path to list (default: "/")
         depth: Directory depth to traverse (default: 1)
+        compact: Columnar, paged format (default: false)
+        max_entries: Maximum entries per page in compact format (default: 2000)
+        cursor: next_cursor from the previous page
+        permissions: Include a permissions column in compact format
 
     Returns:
-        List of files with metadata (name, type, size, permissions)
+        Compact listing (dirs, dir, name, type, size, count, total,
+        next_cursor) or the list of files with metadata
     """
-    return run_sbx_cli("files", "ls", sandbox_id, path, "--depth", str(depth))
+    if not compact:
+        return await run_tool(
+            ["files", "ls", sandbox_id, path, "--depth", str(depth)],
+            lambda: {"path": path, "files": files_module.list_files(sandbox_id, path, depth)},
+            sandbox_id=sandbox_id,
+            read_key=("list_files", path, depth),
+        )
+
+    args = [
+        "files", "ls", sandbox_id, path, "--depth", str(depth),
+        "--compact", "--max-entries", str(max_entries),
+    ]
+    if cursor is not None:
+        args.extend(["--cursor", cursor])
+    if permissions:
+        args.append("--permissions")
+
+    return await run_tool(
+        args,
+        lambda: files_module.list_files_compact(
+            sandbox_id,
+            path,
+            depth,
+            max_entries=max_entries,
+            cursor=cursor,
+            permissions=permissions,
+        ),
+        sandbox_id=sandbox_id,
+        read_key=("list_files", path, (depth, max_entries, cursor, permissions)),
+    )
 
 
 @mcp.tool()
-def read_file(sandbox_id: str, path: str) -> dict:
+async def read_file(
+    sandbox_id: str,
+    path: str,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    max_bytes: int = 100_000,
+) -> dict:
     """
-    Read a text file from the sandbox.
+    Read a text file from the sandbox, optionally just a window of it.
+
+    The window is cut inside the sandbox, so unneeded bytes never cross the
+    wire. At most max_bytes of content are returned; if more remains, call
+    again with the returned next_offset (byte windows) or next_start_line
+    (line windows).
 
     Args:
         sandbox_id: The sandbox ID
         path: File path to read
+        offset: Byte offset to start at (default: 0)
+        length: Number of bytes to read (default: to end of file)
+        start_line: First line to read, 1-based (switches to line windows)
+        end_line: Last line to read, inclusive (switches to line windows)
+        max_bytes: Maximum bytes of content per call (default: 100000)
+
+    Returns:
+        File content plus window bounds, file totals, eof flag and a
+        continuation cursor when more content remains
+    """
+    args = ["files", "read", sandbox_id, path, "--max-bytes", str(max_bytes)]
+    for flag, value in (
+        ("--offset", offset),
+        ("--length", length),
+        ("--start-line", start_line),
+        ("--end-line", end_line),
+    ):
+        if value is not None:
+            args.extend([flag, str(value)])
+
+    return await run_tool(
+        args,
+        lambda: files_module.read_file_range(
+            sandbox_id,
+            path,
+            offset=offset,
+            length=length,
+            start_line=start_line,
+            end_line=end_line,
+            max_bytes=max_bytes,
+        ),
+        sandbox_id=sandbox_id,
+        read_key=("read_file", path, (offset, length, start_line, end_line, max_bytes)),
+    )
+
+
+@mcp.tool()
+async def search_files(
+    sandbox_id: str,
+    pattern: str,
+    path: str = "/home/user",
+    globs: Optional[list[str]] = None,
+    ignore_case: bool = False,
+    fixed_strings: bool = False,
+    context: int = 0,
+    max_matches: int = 100,
+    no_ignore: bool = False,
+) -> dict:
+    """
+    Search file contents with a regex inside the sandbox (ripgrep or grep).
+
+    Use this to find symbols, usages or strings instead of listing and
+    reading files one by one: one call returns every match.
+
+    Args:
+        sandbox_id: The sandbox ID
+        pattern: Regular expression (literal text with fixed_strings)
+        path: File or directory to search (default: /home/user)
+        globs: File name globs to include, or exclude with a leading "!"
+            (e.g. ["*.ts", "!*.test.ts"])
+        ignore_case: Case-insensitive search
+        fixed_strings: Treat pattern as literal text
+        context: Lines of context before and after each match
+        max_matches: Maximum matching lines returned (default: 100)
+        no_ignore: Also search .git, node_modules, __pycache__ and .venv
 
     Returns:
-        File content as string
+        Match count, truncated flag and "results" as compact
+        "path:line:text" lines (context lines use "path-line-text")
     """
-    return run_sbx_cli("files", "read", sandbox_id, path)
+    args = ["files", "search", "--path", path]
+    for glob in globs or []:
+        args.extend(["--glob", glob])
+    if ignore_case:
+        args.append("--ignore-case")
+    if fixed_strings:
+        args.append("--fixed-strings")
+    if no_ignore:
+        args.append("--no-ignore")
+    args.extend(["--context", str(context), "--max-matches", str(max_matches)])
+    # After "--" so a pattern like "-foo" or "->" is not parsed as an option
+    args.extend(["--", sandbox_id, pattern])
+
+    return await run_tool(
+        args,
+        lambda: files_module.search_files(
+            sandbox_id,
+            pattern,
+            path=path,
+            globs=globs,
+            ignore_case=ignore_case,
+            fixed_strings=fixed_strings,
+            context=context,
+            max_matches=max_matches,
+            no_ignore=no_ignore,
+        ),
+        sandbox_id=sandbox_id,
+        read_key=(
+            "search_files",
+            path,
+            (pattern, tuple(globs or ()), ignore_case, fixed_strings, context,
+             max_matches, no_ignore),
+        ),
+    )
 
 
 @mcp.tool()
-def write_file(sandbox_id: str, path: str, content: str) -> dict:
+async def read_files(sandbox_id: str, paths: list[str], max_workers: int = 8) -> dict:
+    """
+    Read several text files from the sandbox in one call.
+
+    Files are transferred concurrently. A failure on one file does not
+    abort the others.
+
+    Args:
+        sandbox_id: The sandbox ID
+        paths: File paths to read
+        max_workers: Maximum number of concurrent transfers (default: 8)
+
+    Returns:
+        Per-file results in input order, each with "content" or "error"
+    """
+    return await run_tool(
+        ["files", "read-many", sandbox_id, *paths, "--max-workers", str(max_workers)],
+        lambda: {
+            "files": files_module.read_files(sandbox_id, paths, max_workers=max_workers)
+        },
+        sandbox_id=sandbox_id,
+    )
+
+
+@mcp.tool()
+async def write_file(sandbox_id: str, path: str, content: str) -> dict:
     """
     Write text content to a file in the sandbox.
 
@@ -302,11 +676,115 @@ def write_file(sandbox_id: str, path: str, content: str) -> dict:
     Returns:
         Success confirmation with file path
     """
-    return run_sbx_cli("files", "write", sandbox_id, path, content)
+    return await run_tool(
+        ["files", "write", sandbox_id, path, content],
+        lambda: files_module.write_file(sandbox_id, path, content),
+        sandbox_id=sandbox_id,
+        touches=[path],
+    )
+
+
+@mcp.tool()
+async def write_files(sandbox_id: str, files: list[dict], max_workers: int = 8) -> dict:
+    """
+    Write several text files to the sandbox in one call.
+
+    Use this to scaffold a project instead of one write_file call per file.
+    Uses the SDK's multi-file write when available, otherwise concurrent
+    per-file writes. A failure on one file does not abort the others.
+
+    Args:
+        sandbox_id: The sandbox ID
+        files: File specs, each {"path": str, "content": str}
+        max_workers: Maximum number of concurrent transfers (default: 8)
+
+    Returns:
+        Per-file results in input order, each with "success" and "path" or "error"
+    """
+    # The payload goes through stdin for the CLI, so size is not bounded by argv
+    return await run_tool(
+        [
+            "files",
+            "write-many",
+            sandbox_id,
+            "-",
+            "--max-workers",
+            str(max_workers),
+        ],
+        lambda: {
+            "files": files_module.write_files(sandbox_id, files, max_workers=max_workers)
+        },
+        sandbox_id=sandbox_id,
+        touches=[f["path"] for f in files],
+        cli_stdin=json.dumps(files),
+    )
 
 
 @mcp.tool()
-def upload_file(sandbox_id: str, local_path: str, remote_path: str) -> dict:
+async def apply_patch(
+    sandbox_id: str,
+    patch: Optional[str] = None,
+    edits: Optional[list[dict]] = None,
+    cwd: str = "/home/user",
+    dry_run: bool = False,
+) -> dict:
+    """
+    Edit sandbox files in place by sending only the change.
+
+    Prefer this over read_file + write_file for changes to existing files:
+    only the diff or replacement strings are sent and only statuses come
+    back. Nothing is written unless every hunk/edit applies.
+
+    Args:
+        sandbox_id: The sandbox ID
+        patch: Unified diff (git diff / diff -u format, a/ b/ prefixes optional)
+        edits: Exact replacements instead of a diff, each
+            {"path": str, "old": str, "new": str, "all": bool}; "old" must
+            occur exactly once unless "all" is true
+        cwd: Directory relative paths are resolved against (default: /home/user)
+        dry_run: Only check whether everything would apply
+
+    Returns:
+        success plus per-file hunk statuses (patch) or per-edit statuses with
+        the line of each replacement (edits): applied (ok on dry_run),
+        not_found, ambiguous or error; when any edit fails nothing is
+        written and the matching edits report not_applied
+    """
+    if (patch is None) == (edits is None):
+        raise ValueError("Pass exactly one of patch or edits")
+
+    # The payload goes through stdin for the CLI, so size is not bounded by argv
+    args = ["files", "patch", sandbox_id]
+    if patch is not None:
+        args.append("-")
+    else:
+        args.extend(["--edits", "-"])
+    args.extend(["--cwd", cwd])
+    if dry_run:
+        args.append("--dry-run")
+
+    # A diff can reach outside cwd (absolute or ../ paths, renames), so a
+    # patch flushes the sandbox; edits name their files
+    if dry_run:
+        touches = []
+    elif patch is not None:
+        touches = [ANY_PATH]
+    else:
+        touches = [posixpath.join(cwd, e["path"]) for e in edits]
+
+    return await run_tool(
+        args,
+        lambda: files_module.apply_patch(
+            sandbox_id, patch=patch, edits=edits, cwd=cwd, dry_run=dry_run
+        ),
+        sandbox_id=sandbox_id,
+        touches=touches,
+        cli_stdin=patch if patch is not None else json.dumps(edits),
+    )
+
+
+@mcp.tool()
+async def upload_file(sandbox_id: str, local_path: str, remote_path: str) -> dict:
     """
     Upload a binary file to the sandbox.
 
@@ -318,11 +796,21 @@ def upload_file(sandbox_id: str, local_path: str, remote_path: str) -> dict:
     Returns:
         Success confirmation with file size
     """
-    return run_sbx_cli("files", "upload", sandbox_id, local_path, remote_path)
+    def upload() -> dict:
+        data = Path(local_path).read_bytes()
+        info = files_module.write_file_bytes(sandbox_id, remote_path, data)
+        return {"path": info["path"], "size": len(data)}
+
+    return await run_tool(
+        ["files", "upload", sandbox_id, local_path, remote_path],
+        upload,
+        sandbox_id=sandbox_id,
+        touches=[remote_path],
+    )
 
 
 @mcp.tool()
-def download_file(sandbox_id: str, remote_path: str, local_path: str) -> dict:
+async def download_file(sandbox_id: str, remote_path: str, local_path: str) -> dict:
     """
     Download a file from the sandbox.
 
@@ -334,11 +822,92 @@ def download_file(sandbox_id: str, remote_path: str, local_path: str) -> dict:
     Returns:
         Success confirmation with file size
     """
-    return run_sbx_cli("files", "download", sandbox_id, remote_path, local_path)
+    def download() -> dict:
+        data = files_module.read_file_bytes(sandbox_id, remote_path)
+        local_file = Path(local_path)
+        local_file.parent.mkdir(parents=True, exist_ok=True)
+        local_file.write_bytes(data)
+        return {"path": local_path, "size": len(data)}
+
+    return await run_tool(
+        ["files", "download", sandbox_id, remote_path, local_path],
+        download,
+        sandbox_id=sandbox_id,
+    )
 
 
 @mcp.tool()
-def check_file_exists(sandbox_id: str, path: str) -> dict:
+async def upload_dir(
+    sandbox_id: str,
+    local_dir: str,
+    remote_dir: str,
+    include: Optional[list[str]] = None,
+    exclude: Optional[list[str]] = None,
+) -> dict:
+    """
+    Upload a local directory to the sandbox as a single tar archive.
+
+    Much faster than upload_file per file: the archive is written in one
+    request and extracted sandbox-side.
+
+    Args:
+        sandbox_id: The sandbox ID
+        local_dir: Local directory to upload
+        remote_dir: Destination directory in sandbox (created if missing)
+        include: Only upload paths matching these globs (e.g. ["src/*", "*.py"])
+        exclude: Skip paths matching these globs (default: .git, node_modules,
+            __pycache__, .venv; pass [] to upload everything)
+
+    Returns:
+        File count, raw and compressed bytes, duration and throughput (MB/s)
+    """
+    return await run_tool(
+        ["files", "upload-dir", sandbox_id, local_dir, remote_dir]
+        + _dir_transfer_args(include, exclude),
+        lambda: files_module.upload_dir(
+            sandbox_id, local_dir, remote_dir, include=include, exclude=exclude
+        ),
+        sandbox_id=sandbox_id,
+        touches=[remote_dir],
+        heavy=True,
+    )
+
+
+@mcp.tool()
+async def download_dir(
+    sandbox_id: str,
+    remote_dir: str,
+    local_dir: str,
+    include: Optional[list[str]] = None,
+    exclude: Optional[list[str]] = None,
+) -> dict:
+    """
+    Download a sandbox directory as a single tar archive.
+
+    Args:
+        sandbox_id: The sandbox ID
+        remote_dir: Directory in sandbox to download
+        local_dir: Local destination directory (created if missing)
+        include: Only download paths matching these globs
+        exclude: Skip paths matching these globs (default: .git, node_modules,
+            __pycache__, .venv; pass [] to download everything)
+
+    Returns:
+        File count, raw and compressed bytes, duration and throughput (MB/s)
+    """
+    return await run_tool(
+        ["files", "download-dir", sandbox_id, remote_dir, local_dir]
+        + _dir_transfer_args(include, exclude),
+        lambda: files_module.download_dir(
+            sandbox_id, remote_dir, local_dir, include=include, exclude=exclude
+        ),
+        sandbox_id=sandbox_id,
+        heavy=True,
+    )
+
+
+@mcp.tool()
+async def check_file_exists(sandbox_id: str, path: str) -> dict:
     """
     Check if a file or directory exists.
 
@@ -349,11 +918,16 @@ def check_file_exists(sandbox_id: str, path: str) -> dict:
     Returns:
         Existence status (true/false)
     """
-    return run_sbx_cli("files", "exists", sandbox_id, path)
+    return await run_tool(
+        ["files", "exists", sandbox_id, path],
+        lambda: {"path": path, "exists": files_module.file_exists(sandbox_id, path)},
+        sandbox_id=sandbox_id,
+        read_key=("check_file_exists", path, None),
+    )
 
 
 @mcp.tool()
-def get_file_info(sandbox_id: str, path: str) -> dict:
+async def get_file_info(sandbox_id: str, path: str) -> dict:
     """
     Get detailed information about a file.
 
@@ -364,11 +938,71 @@ def get_file_info(sandbox_id: str, path: str) -> dict:
     Returns:
         File metadata (name, size, type, permissions)
     """
-    return run_sbx_cli("files", "info", sandbox_id, path)
+    return await run_tool(
+        ["files", "info", sandbox_id, path],
+        lambda: files_module.get_file_info(sandbox_id, path),
+        sandbox_id=sandbox_id,
+        read_key=("get_file_info", path, None),
+    )
+
+
+@mcp.tool()
+async def file_checksums(
+    sandbox_id: str,
+    paths: list[str],
+    algorithm: str = "sha256",
+    stat: bool = False,
+    include: Optional[list[str]] = None,
+    exclude: Optional[list[str]] = None,
+    max_files: int = 10000,
+) -> dict:
+    """
+    Hash many files or whole directory trees in one sandbox-side pass.
+
+    Only the digests are returned, never the contents. Compare them with
+    digests from an earlier call (or of local copies) and read or transfer
+    only the files that changed.
+
+    Args:
+        sandbox_id: The sandbox ID
+        paths: Files and/or directories to hash (directories recursively)
+        algorithm: sha256 (default), sha1, md5 or blake2b
+        stat: Also return size and mtime per file
+        include: Inside directories, only hash files whose path relative
+            to the directory, or whose name, matches one of these globs
+            (e.g. ["*.py", "src/*"]); files given directly are always hashed
+        exclude: Skip paths matching these globs (default: .git,
+            node_modules, __pycache__, .venv; pass [] to hash everything)
+        max_files: Stop after this many files (default: 10000)
+
+    Returns:
+        "files" mapping each path to its digest (or {hash, size, mtime}),
+        plus missing paths, per-file errors, count, bytes hashed and
+        truncated
+    """
+    args = ["files", "hash", sandbox_id, *paths, "--algorithm", algorithm,
+            "--max-files", str(max_files)]
+    if stat:
+        args.append("--stat")
+
+    # Not cached: the point is to see changes the server did not make
+    return await run_tool(
+        args + _dir_transfer_args(include, exclude),
+        lambda: files_module.file_checksums(
+            sandbox_id,
+            paths,
+            algorithm=algorithm,
+            stat=stat,
+            include=include,
+            exclude=exclude,
+            max_files=max_files,
+        ),
+        sandbox_id=sandbox_id,
+    )
 
 
 @mcp.tool()
-def remove_file(sandbox_id: str, path: str) -> dict:
+async def remove_file(sandbox_id: str, path: str) -> dict:
     """
     Remove a file or directory.
 
@@ -379,11 +1013,20 @@ def remove_file(sandbox_id: str, path: str) -> dict:
     Returns:
         Success confirmation
     """
-    return run_sbx_cli("files", "rm", sandbox_id, path)
+    def remove() -> dict:
+        files_module.remove_file(sandbox_id, path)
+        return {"path": path, "removed": True}
+
+    return await run_tool(
+        ["files", "rm", sandbox_id, path],
+        remove,
+        sandbox_id=sandbox_id,
+        touches=[path],
+    )
 
 
 @mcp.tool()
-def make_directory(sandbox_id: str, path: str) -> dict:
+async def make_directory(sandbox_id: str, path: str) -> dict:
     """
     Create a directory in the sandbox.
 
@@ -394,11 +1037,16 @@ def make_directory(sandbox_id: str, path: str) -> dict:
     Returns:
         Success confirmation
     """
-    return run_sbx_cli("files", "mkdir", sandbox_id, path)
+    return await run_tool(
+        ["files", "mkdir", sandbox_id, path],
+        lambda: {"path": path, "created": files_module.make_directory(sandbox_id, path)},
+        sandbox_id=sandbox_id,
+        touches=[path],
+    )
 
 
 @mcp.tool()
-def rename_file(sandbox_id: str, old_path: str, new_path: str) -> dict:
+async def rename_file(sandbox_id: str, old_path: str, new_path: str) -> dict:
     """
     Rename or move a file/directory.
 
@@ -410,7 +1058,12 @@ def rename_file(sandbox_id: str, old_path: str, new_path: str) -> dict:
     Returns:
         Success confirmation with new path
     """
-    return run_sbx_cli("files", "mv", sandbox_id, old_path, new_path)
+    return await run_tool(
+        ["files", "mv", sandbox_id, old_path, new_path],
+        lambda: files_module.rename_file(sandbox_id, old_path, new_path),
+        sandbox_id=sandbox_id,
+        touches=[old_path, new_path],
+    )
 
 
 # ========================================
@@ -419,7 +1072,7 @@ def rename_file(sandbox_id: str, old_path: str, new_path: str) -> dict:
 
 
 @mcp.tool()
-def execute_command(
+async def execute_command(
     sandbox_id: str,
     command: str,
     cwd: Optional[str] = None,
@@ -429,10 +1082,23 @@ def execute_command(
     env_vars: Optional[str] = None,
     timeout: int = 60,
     background: bool = False,
+    max_output_chars: int = 20000,
+    ctx: Context = None,
 ) -> dict:
     """
     Execute a command in the sandbox with full control.
 
+    When the client sends a progress token, output is streamed as progress
+    notifications while the command runs (coalesced to at most one per
+    second), so long installs and builds show signs of life.
+
+    Output longer than max_output_chars is compacted: stdout/stderr keep
+    their head and tail, and the full stream is written to the sandbox file
+    returned as stdout_file/stderr_file. Page it with read_file
+    (start_line/end_line) only if the kept part is not enough. With
+    compaction on, a failing command returns its non-zero exit_code and
+    output instead of raising an error.
+
     Args:
         sandbox_id: The sandbox ID
         command: Command to execute
@@ -442,10 +1108,13 @@ def execute_command(
         shell: Execute in shell context (enables pipes, redirections)
         env_vars: Environment variables as comma-separated KEY=VALUE pairs
         timeout: Command timeout in seconds (0 for unlimited)
-        background: Run command in background
+        background: Run command in background and return its pid; output is
+            buffered sandbox-side for get_process_output / wait_process
+        max_output_chars: Characters kept per stream (0 for the full output)
 
     Returns:
-        Command output with stdout, stderr, and exit code
+        Command output with stdout, stderr, and exit code, plus the byte and
+        line counts of each stream and the spill file of a compacted one
     """
     args = ["exec", sandbox_id, command]
 
@@ -469,9 +1138,517 @@ def execute_command(
 
     if background:
         args.append("--background")
+    else:
+        args.extend(["--max-output", str(max_output_chars)])
+
+    sandbox_pool.command_started(sandbox_id)
+
+    progress = None
+    if wants_progress(ctx) and not background:
+        progress = OutputProgress(ctx)
+
+    def execute() -> dict:
+        # Mirror `sbx exec`: --shell wraps the command in bash -c
+        actual_command = f'/bin/bash -c "{command}"' if shell else command
+        options = dict(
+            cwd=cwd,
+            envs=_parse_env_vars(env_vars),
+            timeout=timeout if timeout > 0 else None,
+        )
+
+        if background:
+            return cmd_module.run_command_background(
+                sandbox_id, actual_command, **options
+            )
+        # Killed in the sandbox if this call is cancelled
+        options["on_start"] = remote_started
+        options["max_output"] = max_output_chars if max_output_chars > 0 else None
+        if progress is None:
+            return cmd_module.run_command(sandbox_id, actual_command, **options)
+
+        with progress:
+            result = cmd_module.run_command(
+                sandbox_id,
+                actual_command,
+                on_stdout=progress.on_stdout,
+                on_stderr=progress.on_stderr,
+                **options,
+            )
+        return {**result, "progress_notifications": progress.notifications}
+
+    # Commands can modify anything, so cached reads for this sandbox are flushed
+    return await run_tool(
+        args,
+        execute,
+        sandbox_id=sandbox_id,
+        touches=[ANY_PATH],
+        deadline=_command_deadline([timeout]),
+        heavy=not background,
+    )
 
-    return run_sbx_cli(*args)
+
+@mcp.tool()
+async def execute_batch(
+    sandbox_id: str,
+    steps: list[dict],
+    stop_on_failure: bool = True,
+    max_output_chars: int = 2000,
+) -> dict:
+    """
+    Execute an ordered list of commands in one round trip.
+
+    Use this instead of several consecutive execute_command calls (e.g. git
+    config, install, build, test). All steps share one sandbox connection.
+
+    Args:
+        sandbox_id: The sandbox ID
+        steps: Command specs, each {"cmd": str, "cwd": str, "envs": {KEY: VALUE},
+            "timeout": seconds (0 for unlimited, default 60)}; only "cmd" is required
+        stop_on_failure: Stop at the first failing step (default: true);
+            set false to run every step
+        max_output_chars: Maximum stdout/stderr characters kept per step (tail)
+
+    Returns:
+        Per-step exit codes, durations and truncated output, plus the indices
+        of failed steps and the number of skipped steps
+    """
+    # The steps go through stdin for the CLI, so size is not bounded by argv
+    args = [
+        "exec-batch",
+        sandbox_id,
+        "-",
+        "--max-output",
+        str(max_output_chars),
+    ]
+
+    if not stop_on_failure:
+        args.append("--continue-on-failure")
+
+    sandbox_pool.command_started(sandbox_id)
+
+    return await run_tool(
+        args,
+        lambda: cmd_module.run_batch(
+            sandbox_id,
+            steps,
+            stop_on_failure=stop_on_failure,
+            max_output=max_output_chars,
+            on_start=remote_started,
+        ),
+        sandbox_id=sandbox_id,
+        touches=[ANY_PATH],
+        cli_stdin=json.dumps(steps),
+        deadline=_command_deadline([step.get("timeout", 60) or 0 for step in steps]),
+        heavy=True,
+    )
+
+
+@mcp.tool()
+async def execute_on_many(
+    command: str,
+    sandbox_ids: Optional[list[str]] = None,
+    metadata: Optional[dict[str, str]] = None,
+    cwd: Optional[str] = None,
+    env_vars: Optional[dict[str, str]] = None,
+    timeout: int = 60,
+    max_parallel: int = 8,
+    max_output_chars: int = 2000,
+) -> dict:
+    """
+    Run one command on many sandboxes concurrently (fan-out).
+
+    Use this instead of one execute_command per sandbox, e.g. git status,
+    a test run or a health check across a set of fork sandboxes. A sandbox
+    that fails or cannot be reached does not stop the others.
+
+    Args:
+        command: Command to execute
+        sandbox_ids: Sandboxes to run on
+        metadata: Select running sandboxes whose metadata contains every
+            pair, instead of giving sandbox_ids (at most 100)
+        cwd: Working directory
+        env_vars: Environment variables
+        timeout: Command timeout per sandbox in seconds (0 for unlimited)
+        max_parallel: Sandboxes running the command at once (default: 8)
+        max_output_chars: Maximum stdout/stderr characters kept per sandbox (tail)
+
+    Returns:
+        Per-sandbox exit codes, durations and truncated output, the number
+        that succeeded and the IDs that failed
+    """
+    args = ["exec-many", command, "--timeout", str(timeout)]
+    for sandbox_id in sandbox_ids or []:
+        args.extend(["--sandbox", sandbox_id])
+    for key, value in (metadata or {}).items():
+        args.extend(["--metadata", f"{key}={value}"])
+    if cwd:
+        args.extend(["--cwd", cwd])
+    for key, value in (env_vars or {}).items():
+        args.extend(["--env", f"{key}={value}"])
+    args.extend(["--parallel", str(max_parallel), "--max-output", str(max_output_chars)])
+
+    # The sandboxes run in waves of max_parallel, each up to its timeout
+    count = len(sandbox_ids) if sandbox_ids else 100
+    waves = -(-count // max(1, max_parallel))
+
+    try:
+        return await run_tool(
+            args,
+            lambda: cmd_module.run_on_many(
+                command,
+                sandbox_ids=sandbox_ids,
+                metadata=metadata,
+                cwd=cwd,
+                envs=env_vars,
+                timeout=timeout if timeout > 0 else None,
+                max_parallel=max_parallel,
+                max_output=max_output_chars,
+                on_start=remote_started,
+            ),
+            deadline=_command_deadline([timeout] * waves),
+            heavy=True,
+        )
+    finally:
+        # The command may have changed anything on any of the sandboxes
+        if result_cache is not None:
+            for sandbox_id in sandbox_ids or [None]:
+                result_cache.flush(sandbox_id)
+        if single_flight is not None:
+            if sandbox_ids:
+                for sandbox_id in sandbox_ids:
+                    single_flight.invalidate(sandbox_id)
+            else:
+                # Selected by metadata: any sandbox may have been touched
+                single_flight.invalidate_all()
+
+
+@mcp.tool()
+async def list_processes(sandbox_id: str) -> dict:
+    """
+    List running processes and exited background commands.
+
+    Args:
+        sandbox_id: The sandbox ID
+
+    Returns:
+        Processes with pid, cmd, cwd, running, exit_code, started_at and
+        buffered output_bytes (tracked is true for background commands)
+    """
+    return await run_tool(
+        ["process", "list", sandbox_id],
+        lambda: {"processes": cmd_module.list_processes(sandbox_id)},
+        sandbox_id=sandbox_id,
+    )
+
+
+@mcp.tool()
+async def get_process_output(
+    sandbox_id: str,
+    pid: int,
+    since_offset: int = 0,
+    max_bytes: int = 10000,
+) -> dict:
+    """
+    Read the output of a background command without waiting for it.
+
+    Output (stdout and stderr combined) is kept in a bounded buffer per
+    process, so poll dev servers and long builds with the returned
+    next_offset to get only what is new.
+
+    Args:
+        sandbox_id: The sandbox ID
+        pid: Process ID returned by execute_command(background=True)
+        since_offset: Byte offset to read from (-1 for the most recent output)
+        max_bytes: Maximum bytes of output returned (default: 10000)
+
+    Returns:
+        Output plus running, exit_code, next_offset, total_bytes,
+        dropped_bytes (output no longer buffered) and more
+    """
+    return await run_tool(
+        [
+            "process", "output", sandbox_id, str(pid),
+            "--since", str(since_offset), "--max-bytes", str(max_bytes),
+        ],
+        lambda: cmd_module.get_process_output(
+            sandbox_id, pid, since_offset=since_offset, max_bytes=max_bytes
+        ),
+        sandbox_id=sandbox_id,
+    )
+
+
+@mcp.tool()
+async def wait_process(
+    sandbox_id: str,
+    pid: int,
+    timeout: int = 30,
+    since_offset: int = -1,
+    max_bytes: int = 10000,
+) -> dict:
+    """
+    Wait for a background command to exit.
+
+    Args:
+        sandbox_id: The sandbox ID
+        pid: Process ID returned by execute_command(background=True)
+        timeout: Seconds to wait before returning with it still running
+        since_offset: Byte offset of the output returned (default: -1, the tail)
+        max_bytes: Maximum bytes of output returned (default: 10000)
+
+    Returns:
+        get_process_output result plus timed_out and the seconds waited
+    """
+    return await run_tool(
+        [
+            "process", "wait", sandbox_id, str(pid), "--timeout", str(timeout),
+            "--since", str(since_offset), "--max-bytes", str(max_bytes),
+        ],
+        lambda: cmd_module.wait_process(
+            sandbox_id,
+            pid,
+            timeout=timeout,
+            since_offset=since_offset,
+            max_bytes=max_bytes,
+        ),
+        sandbox_id=sandbox_id,
+        # The command may have written anything by the time it exits
+        touches=[ANY_PATH],
+        deadline=_command_deadline([timeout]),
+        heavy=True,
+    )
+
+
+@mcp.tool()
+async def kill_process(sandbox_id: str, pid: int) -> dict:
+    """
+    Kill a process in the sandbox (SIGKILL).
+
+    Args:
+        sandbox_id: The sandbox ID
+        pid: Process ID
+
+    Returns:
+        Whether the process was found and killed
+    """
+    return await run_tool(
+        ["process", "kill", sandbox_id, str(pid)],
+        lambda: {"pid": pid, "killed": cmd_module.kill_process(sandbox_id, pid)},
+        sandbox_id=sandbox_id,
+    )
+
+
+# ========================================
+# Git
+# ========================================
+
+
+@mcp.tool()
+async def clone_repo(
+    sandbox_id: str,
+    repo_url: str,
+    path: str = "/home/user/repo",
+    branch: Optional[str] = None,
+    depth: int = 0,
+    filter: Optional[str] = "blob:none",
+    sparse: Optional[list[str]] = None,
+    reference: Optional[str] = None,
+    use_mirror: bool = True,
+    timeout: int = 600,
+) -> dict:
+    """
+    Clone a git repository into the sandbox, fetching as little as possible.
+
+    Use this instead of `git clone` through execute_command. By default it
+    is a partial clone: full history, file contents only for the checked-out
+    tree (fetched on demand later). A bare mirror baked into the template at
+    /home/user/.git-mirrors/<host>/<owner>/<repo>.git is used automatically,
+    so only newer objects are downloaded.
+
+    Args:
+        sandbox_id: The sandbox ID
+        repo_url: Repository URL
+        path: Destination directory (default: /home/user/repo)
+        branch: Branch to check out; created from the default branch if the
+            remote does not have it
+        depth: Fetch only this many commits per branch (default: 0, full history)
+        filter: Partial clone filter (default: "blob:none"; null for a full clone)
+        sparse: Only check out these directories (e.g. ["apps/web"])
+        reference: Bare repository in the sandbox to borrow objects from
+        use_mirror: Use the template mirror if there is one (default: true)
+        timeout: Clone timeout in seconds (default: 600, 0 for unlimited)
+
+    Returns:
+        Checked-out branch and commit, branch_created, the mirror used,
+        bytes_fetched and duration
+    """
+    args = ["git", "clone", sandbox_id, repo_url, path,
+            "--depth", str(depth), "--timeout", str(timeout)]
+    if branch:
+        args.extend(["--branch", branch])
+    args.extend(["--filter", filter] if filter else ["--no-filter"])
+    for directory in sparse or []:
+        args.extend(["--sparse", directory])
+    if reference:
+        args.extend(["--reference", reference])
+    if not use_mirror:
+        args.append("--no-mirror")
+
+    sandbox_pool.command_started(sandbox_id)
+
+    return await run_tool(
+        args,
+        lambda: git_module.clone_repo(
+            sandbox_id,
+            repo_url,
+            path,
+            branch=branch,
+            depth=depth,
+            filter=filter,
+            sparse=sparse,
+            reference=reference,
+            use_mirror=use_mirror,
+            timeout=timeout if timeout > 0 else None,
+            on_start=remote_started,
+        ),
+        sandbox_id=sandbox_id,
+        touches=[path],
+        deadline=_command_deadline([timeout]),
+        heavy=True,
+    )
+
+
+# ========================================
+# Server Metrics
+# ========================================
+
+
+@mcp.resource("metrics://connections")
+def connection_metrics() -> dict:
+    """
+    Connection cache counters for the in-process engine.
+
+    Returns:
+        Hit/miss/eviction counters and occupancy, or {"enabled": false}
+    """
+    if connections is None:
+        return {"enabled": False}
+    return connections.cache_stats()
+
+
+@mcp.resource("metrics://cache")
+def cache_metrics() -> dict:
+    """
+    Read-through result cache counters.
+
+    Returns:
+        Hit/miss/invalidation counters and occupancy, or {"enabled": false}
+    """
+    if result_cache is None:
+        return {"enabled": False}
+    return result_cache.stats()
+
+
+@mcp.resource("metrics://coalescing")
+def coalescing_metrics() -> dict:
+    """
+    Single-flight coalescing counters for identical concurrent reads.
+
+    Returns:
+        Backend calls made (leaders), calls served by another identical call
+        in flight (coalesced, overall and per tool), or {"enabled": false}
+    """
+    if single_flight is None:
+        return {"enabled": False}
+    return single_flight.stats()
+
+
+@mcp.resource("metrics://limits")
+def limits_metrics() -> dict:
+    """
+    Per-sandbox and global in-flight limits and their queue.
+
+    Returns:
+        Configured limits, calls in flight and queued (overall and per
+        sandbox), and queue wait histograms for light and heavy calls
+    """
+    return call_limiter.stats()
+
+
+@mcp.resource("metrics://tools")
+def tool_call_metrics() -> dict:
+    """
+    Per-tool call metrics.
+
+    Returns:
+        For every tool: call/error/cache-hit counts, request and response
+        bytes, and latency histograms overall and per phase
+    """
+    return tool_metrics.snapshot()
+
+
+@mcp.resource("metrics://pool")
+def pool_metrics() -> dict:
+    """
+    Warm sandbox pool counters.
+
+    Returns:
+        Per-template occupancy, hit/miss counters and time-to-first-command
+        for pooled vs cold sandboxes
+    """
+    return sandbox_pool.stats()
+
+
+@mcp.resource("metrics://paused-pool")
+def paused_pool_metrics() -> dict:
+    """
+    Paused sandbox pool counters.
+
+    Returns:
+        Per-pool occupancy, hit/miss counters, and resume latency compared
+        with create-plus-setup latency
+    """
+    return paused_pool.stats()
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    """Liveness and memory of a shared HTTP/SSE server (not an MCP endpoint)."""
+    return JSONResponse({
+        "status": "ok",
+        "pid": os.getpid(),
+        "uptime": round(time.monotonic() - STARTED_AT, 3),
+        "rss_bytes": process_memory(),
+        "tool_calls": sum(t["calls"] for t in tool_metrics.snapshot()["tools"].values()),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="E2B Sandbox MCP Server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "sse", "streamable-http"],
+        default=os.environ.get("SBX_MCP_TRANSPORT", "stdio"),
+        help="stdio (one server per client, default) or a shared HTTP server",
+    )
+    parser.add_argument("--host", default=os.environ.get("SBX_MCP_HOST", "127.0.0.1"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.environ.get("SBX_MCP_PORT", "8765"))
+    )
+    args = parser.parse_args()
+
+    if args.transport != "stdio":
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        if args.host not in ("127.0.0.1", "localhost", "::1"):
+            # The default DNS rebinding protection only admits localhost Host headers
+            mcp.settings.transport_security = None
+            logger.warning(
+                f"Serving on {args.host}:{args.port} without authentication; "
+                "anyone who can reach it can use your E2B API key"
+            )
+
+    mcp.run(transport=args.transport)
 
 
 if __name__ == "__main__":
-    mcp.run()
+    main()
@@ -66,16 +66,29 @@ ALLOWED_TOOLS: Final[list[str]] = [
     "mcp__e2b-sandbox__create_sandbox",
     "mcp__e2b-sandbox__connect_sandbox",
     "mcp__e2b-sandbox__execute_command",
+    "mcp__e2b-sandbox__execute_batch",
+    "mcp__e2b-sandbox__list_processes",
+    "mcp__e2b-sandbox__get_process_output",
+    "mcp__e2b-sandbox__wait_process",
+    "mcp__e2b-sandbox__kill_process",
     "mcp__e2b-sandbox__write_file",
     "mcp__e2b-sandbox__read_file",
+    "mcp__e2b-sandbox__write_files",
+    "mcp__e2b-sandbox__read_files",
+    "mcp__e2b-sandbox__search_files",
+    "mcp__e2b-sandbox__apply_patch",
     "mcp__e2b-sandbox__list_files",
     "mcp__e2b-sandbox__upload_file",
     "mcp__e2b-sandbox__download_file",
+    "mcp__e2b-sandbox__upload_dir",
+    "mcp__e2b-sandbox__download_dir",
     "mcp__e2b-sandbox__make_directory",
     "mcp__e2b-sandbox__remove_file",
     "mcp__e2b-sandbox__rename_file",
     "mcp__e2b-sandbox__check_file_exists",
     "mcp__e2b-sandbox__get_file_info",
+    "mcp__e2b-sandbox__file_checksums",
+    "mcp__e2b-sandbox__clone_repo",
     "mcp__e2b-sandbox__get_host",
     "mcp__e2b-sandbox__kill_sandbox",
     "mcp__e2b-sandbox__pause_sandbox",